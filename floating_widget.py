@@ -14,6 +14,25 @@ except ImportError:
     HAS_PILLOW = False
     print("Pillow не установлен. Функции работы с изображениями будут отключены.")
 
+def filter_buttons(tabs_data, search_text):
+    """Отбирает кнопки, у которых текст или текст вывода содержит строку поиска (без учёта регистра)."""
+    search_term = search_text.lower().strip()
+    if not search_term:
+        # Если нет поискового запроса, показываем все кнопки
+        return {tid: tab_data["buttons"] for tid, tab_data in tabs_data.items()}
+
+    filtered_buttons = {}
+    for tab_id, tab_data in tabs_data.items():
+        filtered_tab_buttons = {}
+        for button_id, button_data in tab_data["buttons"].items():
+            # Фильтруем по тексту кнопки или по тексту вывода
+            if search_term in button_data.get("text", "").lower() or \
+               search_term in button_data.get("output", "").lower():
+                filtered_tab_buttons[button_id] = button_data
+        if filtered_tab_buttons:
+            filtered_buttons[tab_id] = filtered_tab_buttons
+    return filtered_buttons
+
 class FloatingWidget(tk.Toplevel):
     """
     Виджет, отображающийся поверх всех окон, с вкладками кнопок в виде контекстных меню.
@@ -24,8 +43,11 @@ class FloatingWidget(tk.Toplevel):
         super().__init__(master)
         self.app = app_instance # Ссылка на главный экземпляр приложения
         self.tabs_data = {} # Будет хранить копию данных вкладок из основного приложения
+        self.tabs_revision = None # Ревизия модели (app.model_changes), с которой синхронизирована копия
         self.filtered_buttons = {} # Отфильтрованные кнопки для отображения
         self.after_id = None # Для задержки обработки ввода в фильтре
+        self._drag_data = None # Начало перетаскивания окна (на время жеста)
+        self._resize_data = None # Начало изменения размера окна (на время жеста)
         
         self.title("Floating Buttons Widget")
         self.overrideredirect(True) # Убирает заголовок окна
@@ -96,37 +118,53 @@ class FloatingWidget(tk.Toplevel):
 
     def apply_filter(self):
         """Применяет фильтр к кнопкам на основе введенного текста."""
-        search_term = self.filter_var.get().lower().strip()
-        self.filtered_buttons = {}
-
-        if not search_term:
-            # Если нет поискового запроса, показываем все кнопки
-            self.filtered_buttons = {tid: tab_data["buttons"] for tid, tab_data in self.tabs_data.items()}
-        else:
-            for tab_id, tab_data in self.tabs_data.items():
-                filtered_tab_buttons = {}
-                for button_id, button_data in tab_data["buttons"].items():
-                    # Фильтруем по тексту кнопки или по тексту вывода
-                    if search_term in button_data.get("text", "").lower() or \
-                       search_term in button_data.get("output", "").lower():
-                        filtered_tab_buttons[button_id] = button_data
-                if filtered_tab_buttons:
-                    self.filtered_buttons[tab_id] = filtered_tab_buttons
-        
+        self.filtered_buttons = filter_buttons(self.tabs_data, self.filter_var.get())
         self.after_id = None # Сбрасываем ID задержки
 
     def update_widget_buttons(self):
         """Загружает данные кнопок из основного приложения и применяет фильтр."""
-        # Делаем глубокую копию, чтобы избежать прямого изменения app.tabs во время фильтрации
-        self.tabs_data = {
-            tid: {
-                "name": tdata["name"],
-                "buttons": {bid: {k: v for k, v in bdata.items()} for bid, bdata in tdata["buttons"].items()}
-            }
-            for tid, tdata in self.app.tabs.items()
-        }
+        model_changes = getattr(self.app, "model_changes", None)
+        changes = model_changes.changes_since(self.tabs_revision) if model_changes else None
+        if changes is None or changes.full_rebuild:
+            # Делаем глубокую копию, чтобы избежать прямого изменения app.tabs во время фильтрации
+            self.tabs_data = {tid: self._copy_tab(tdata) for tid, tdata in self.app.tabs.items()}
+        else:
+            # Переносим в копию только изменённые с прошлого обновления вкладки и кнопки
+            for change in changes:
+                if change.kind == "tab":
+                    self._apply_tab_change(change)
+                elif change.kind == "button":
+                    self._apply_button_change(change)
+        self.tabs_revision = changes.revision if changes else None
         self.apply_filter() # Повторно применяем фильтр к новым данным
 
+    @staticmethod
+    def _copy_tab(tdata):
+        return {
+            "name": tdata["name"],
+            "buttons": {bid: {k: v for k, v in bdata.items()} for bid, bdata in tdata["buttons"].items()}
+        }
+
+    def _apply_tab_change(self, change):
+        tab_data = self.app.tabs.get(change.object_id)
+        if change.op == "remove" or tab_data is None:
+            self.tabs_data.pop(change.object_id, None)
+        elif change.op == "add" or "buttons" in change.fields or change.object_id not in self.tabs_data:
+            self.tabs_data[change.object_id] = self._copy_tab(tab_data)
+        elif "name" in change.fields:
+            self.tabs_data[change.object_id]["name"] = tab_data["name"]
+
+    def _apply_button_change(self, change):
+        tab_copy = self.tabs_data.get(change.parent_id)
+        if tab_copy is None:
+            return # Вкладка скопирована целиком вместе со своими кнопками
+        tab_data = self.app.tabs.get(change.parent_id)
+        button_data = tab_data["buttons"].get(change.object_id) if tab_data is not None else None
+        if change.op == "remove" or button_data is None:
+            tab_copy["buttons"].pop(change.object_id, None)
+        else:
+            tab_copy["buttons"][change.object_id] = {k: v for k, v in button_data.items()}
+
     def show_main_tabs_menu(self):
         """Открывает первое контекстное меню с названиями вкладок."""
         main_menu = tk.Menu(self, tearoff=0)
@@ -188,14 +226,21 @@ class FloatingWidget(tk.Toplevel):
         return "break" # Предотвращаем распространение события на другие виджеты
 
     def _on_drag_motion(self, event):
+        # Окно двигается не чаще раза за кадр, по последнему событию мыши
+        self.app.event_coalescer.post(("floating_drag", id(self)), self._apply_drag, event)
+        return "break"
+
+    def _apply_drag(self, event):
+        if not self._drag_data:
+            return
         delta_x = event.x_root - self._drag_data["x"]
         delta_y = event.y_root - self._drag_data["y"]
         new_x = self.x + delta_x
         new_y = self.y + delta_y
         self.geometry(f"+{new_x}+{new_y}")
-        return "break"
 
     def _on_drag_end(self, event):
+        self.app.event_coalescer.flush(("floating_drag", id(self)))
         self.x = self.winfo_x()
         self.y = self.winfo_y()
         self.save_state()
@@ -209,6 +254,12 @@ class FloatingWidget(tk.Toplevel):
         return "break" # Предотвращаем событие перетаскивания, если нажата ручка изменения размера
 
     def _on_resize_motion(self, event):
+        self.app.event_coalescer.post(("floating_resize", id(self)), self._apply_resize, event)
+        return "break"
+
+    def _apply_resize(self, event):
+        if not self._resize_data:
+            return
         delta_x = event.x_root - self._resize_data["x"]
         delta_y = event.y_root - self._resize_data["y"]
 
@@ -218,9 +269,9 @@ class FloatingWidget(tk.Toplevel):
         self.geometry(f"{new_width}x{new_height}")
         self.width = new_width
         self.height = new_height
-        return "break"
 
     def _on_resize_end(self, event):
+        self.app.event_coalescer.flush(("floating_resize", id(self)))
         self.width = self.winfo_width()
         self.height = self.winfo_height()
         self.save_state()
@@ -254,6 +305,13 @@ class FloatingWidget(tk.Toplevel):
             except Exception as e:
                 print(f"Ошибка загрузки состояния плавающего виджета: {e}")
 
+    def reload_state(self):
+        """Применяет положение и размер, изменённые в файле вне виджета (свои записи ничего не меняют)."""
+        geometry = (self.x, self.y, self.width, self.height)
+        self.load_state()
+        if (self.x, self.y, self.width, self.height) != geometry:
+            self.geometry(f"{self.width}x{self.height}+{self.x}+{self.y}")
+
     def destroy(self):
         """Переопределяет destroy для корректной очистки и сохранения состояния."""
         self.save_state()
@@ -19,6 +19,11 @@ import tkinter.font as tkFont
 
 # Импортируем новый модуль плавающего виджета
 from floating_widget import FloatingWidget # Предполагается, что floating_widget.py находится в той же директории
+from module_config_codec import dump_config_file, read_config_file
+from module_config_storage import snapshot_config_data
+from module_data_model import ChangeLog, TabMap
+from module_config_schema import normalize_tabs
+from pnsc_utils import LOADED_TABS_MAX_BUTTONS
 
 class App: # Основной класс приложения
     CONFIG_FILE = "config.json"
@@ -28,7 +33,8 @@ class App: # Основной класс приложения
         self.master.title("PNSc - Buttons & Tabs")
         self.master.geometry("800x600")
 
-        self.tabs = {}  # Хранит вкладки и их кнопки
+        self.model_changes = ChangeLog() # Журнал изменений вкладок и кнопок (для плавающего виджета)
+        self.tabs = TabMap(log=self.model_changes)  # Хранит вкладки и их кнопки
         self.selected_tab_id = None
         self.active_button_widgets = {} # Хранит экземпляры ButtonWidget для текущей вкладки
         self.column_frames = [] # Для отслеживания фреймов, содержащих содержимое вкладок
@@ -174,28 +180,35 @@ class App: # Основной класс приложения
         if color_code:
             var.set(color_code)
 
-    def save_config(self, show_message=True):
-        """Сохраняет текущую конфигурацию вкладок и кнопок в файл."""
+    def save_config(self, show_message=True, sections=None):
+        """Сохраняет текущую конфигурацию вкладок и кнопок в файл.
+        sections принимается для совместимости с PNSc: здесь в конфиге есть только вкладки."""
         try:
-            with open(self.CONFIG_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.tabs, f, indent=4, ensure_ascii=False)
+            dump_config_file(self.CONFIG_FILE, snapshot_config_data(self.tabs))
             if show_message:
                 self._show_messagebox("info", "Сохранение", "Конфигурация успешно сохранена.")
         except Exception as e:
             self._show_messagebox("error", "Ошибка сохранения", f"Не удалось сохранить конфигурацию: {e}")
 
+    def record_change(self, op, **fields):
+        """Журнала изменений здесь нет: любое изменение сохраняет конфигурацию целиком."""
+        self.save_config(show_message=False)
+
     def _load_config(self):
         """Загружает конфигурацию вкладок и кнопок из файла."""
         if os.path.exists(self.CONFIG_FILE):
             try:
-                with open(self.CONFIG_FILE, "r", encoding="utf-8") as f:
-                    self.tabs = json.load(f)
+                # Файл хранит только вкладки, без версии схемы: значения по умолчанию заполняются при каждой загрузке
+                tabs = read_config_file(self.CONFIG_FILE)
+                normalize_tabs(tabs, self.default_button_color)
+                self.tabs = TabMap(tabs, log=self.model_changes)
             except json.JSONDecodeError as e:
                 self._show_messagebox("error", "Ошибка загрузки", f"Не удалось прочитать файл конфигурации: {e}")
-                self.tabs = {}
+                self.tabs = TabMap(log=self.model_changes)
             except Exception as e:
                 self._show_messagebox("error", "Ошибка загрузки", f"Не удалось загрузить конфигурацию: {e}")
-                self.tabs = {}
+                self.tabs = TabMap(log=self.model_changes)
+            self.model_changes.invalidate()
 
 # --- Класс ButtonWidget (без изменений от предоставленного) ---
 class ButtonWidget:
@@ -208,24 +221,8 @@ class ButtonWidget:
         self.button_id = button_id
         self.data = button_data
         self.icon_photo = None
-
-        self.data.setdefault('x', 10)
-        self.data.setdefault('y', 10)
-        self.data.setdefault('width', 100)
-        self.data.setdefault('height', 30)
-        self.data.setdefault('color', self.app.default_button_color)
-        self.data.setdefault('text_color', 'black')
-        self.data.setdefault('font_size', 10)
-        self.data.setdefault('font_family', 'Arial')
-        self.data.setdefault('font_style', '')
-        self.data.setdefault('new_line', False)
-        self.data.setdefault('clear_text', False)
-        self.data.setdefault('icon', '')
-        self.data.setdefault('output', '') # Убедимся, что 'output' всегда есть
-        # Grid settings for the button itself, overriding tab settings if desired
-        self.data.setdefault('snap_to_grid', True) 
-        self.data.setdefault('grid_size_x', 10)
-        self.data.setdefault('grid_size_y', 10)
+        # Значения по умолчанию (включая настройки сетки) заполнены при загрузке конфига
+        # (module_config_schema.normalize_tabs) или при создании кнопки
 
         self.button = tk.Button(canvas,
                                 command=self._handle_click_or_edit,
@@ -256,7 +253,7 @@ class ButtonWidget:
         self.button.bind("<Button-3>", lambda event: self.app.show_button_context_menu(event, self.tab_id, self.button_id))
 
     def _bind_drag_events(self):
-        self._drag_data = {"x": 0, "y": 0}
+        self._drag_data = {}
         self.button.bind("<Button-1>", self._on_drag_start)
         self.button.bind("<B1-Motion>", self._on_drag_motion)
         self.button.bind("<ButtonRelease-1>", self._on_drag_end)
@@ -264,21 +261,25 @@ class ButtonWidget:
     def _on_drag_start(self, event):
         if not self.app.edit_mode_active.get():
             return
-        self._drag_data["x"] = event.x
-        self._drag_data["y"] = event.y
+        # Размер холста запоминается на весь жест, положение считается от начала жеста
+        self._drag_data = {"x_root": event.x_root, "y_root": event.y_root,
+                           "x": self.data.get('x', 0), "y": self.data.get('y', 0),
+                           "canvas_width": self.canvas.winfo_width(), "canvas_height": self.canvas.winfo_height()}
 
     def _on_drag_motion(self, event):
         if not self.app.edit_mode_active.get():
             return
-        
-        x1, y1 = self.canvas.coords(self.canvas_item)
-        delta_x = event.x - self._drag_data["x"]
-        delta_y = event.y - self._drag_data["y"]
-        new_x = x1 + delta_x
-        new_y = y1 + delta_y
-        
-        canvas_width = self.canvas.winfo_width()
-        canvas_height = self.canvas.winfo_height()
+        # Применяется не чаще раза за кадр и только последнее движение мыши
+        self.app.event_coalescer.post(("button_drag", self.button_id), self._apply_drag, event)
+
+    def _apply_drag(self, event):
+        drag = self._drag_data
+        if not drag:
+            return
+        self._move_to(drag["x"] + event.x_root - drag["x_root"], drag["y"] + event.y_root - drag["y_root"],
+                      drag["canvas_width"], drag["canvas_height"])
+
+    def _move_to(self, new_x, new_y, canvas_width, canvas_height):
         current_width = self.data.get('width', 100)
         current_height = self.data.get('height', 30)
 
@@ -302,13 +303,19 @@ class ButtonWidget:
 
     def _on_drag_end(self, event):
         if self.app.edit_mode_active.get():
-            # Сохраняем настройки, включая новые координаты
-            self.app.save_config(show_message=False)
+            self.app.event_coalescer.flush(("button_drag", self.button_id))
+            self._drag_data = {}
+            # Записываем в журнал только новые координаты
+            self._record_geometry()
+
+    def _record_geometry(self):
+        geometry = {key: self.data[key] for key in ('x', 'y', 'width', 'height')}
+        self.app.record_change("button_geometry", tab_id=self.tab_id, button_id=self.button_id, geometry=geometry)
 
     def _bind_resize_events(self):
         self._resize_handle = tk.Frame(self.button, bg="gray", width=8, height=8, cursor="sizing")
         self._resize_handle.place(relx=1.0, rely=1.0, anchor=tk.SE)
-        self._resize_data = {"width": 0, "height": 0, "start_x": 0, "start_y": 0}
+        self._resize_data = {}
         self._resize_handle.bind("<Button-1>", self._on_resize_start)
         self._resize_handle.bind("<B1-Motion>", self._on_resize_motion)
         self._resize_handle.bind("<ButtonRelease-1>", self._on_resize_end)
@@ -316,24 +323,28 @@ class ButtonWidget:
     def _on_resize_start(self, event):
         if not self.app.edit_mode_active.get():
             return
-        self._resize_data["start_x"] = event.x
-        self._resize_data["start_y"] = event.y
-        self._resize_data["width"] = self.data['width']
-        self._resize_data["height"] = self.data['height']
+        # Экранные координаты: ручка сдвигается вместе с углом кнопки
+        self._resize_data = {"x_root": event.x_root, "y_root": event.y_root,
+                             "width": self.data['width'], "height": self.data['height']}
         
         return "break"
 
     def _on_resize_motion(self, event):
         if not self.app.edit_mode_active.get():
             return
-        
-        delta_w = event.x - self._resize_data["start_x"]
-        delta_h = event.y - self._resize_data["start_y"]
+        self.app.event_coalescer.post(("button_resize", self.button_id), self._apply_resize, event)
+
+    def _apply_resize(self, event):
+        resize = self._resize_data
+        if not resize:
+            return
+        delta_w = event.x_root - resize["x_root"]
+        delta_h = event.y_root - resize["y_root"]
         min_width = 30
         min_height = 20
         
-        new_width = max(min_width, self._resize_data["width"] + delta_w)
-        new_height = max(min_height, self._resize_data["height"] + delta_h)
+        new_width = max(min_width, resize["width"] + delta_w)
+        new_height = max(min_height, resize["height"] + delta_h)
         
         # Привязка размера к сетке, если включено
         snap_enabled = self.data.get('snap_to_grid', True)
@@ -351,16 +362,14 @@ class ButtonWidget:
         self.data['width'] = new_width
         self.data['height'] = new_height
         self.canvas.itemconfig(self.canvas_item, width=new_width, height=new_height)
-        self.button.update_idletasks()
-        self._resize_handle.place(relx=1.0, rely=1.0, anchor=tk.SE)
         
     def _on_resize_end(self, event):
         if self.app.edit_mode_active.get():
-            # После изменения размера, повторно применяем логику перетаскивания, чтобы убедиться, что координаты
-            # привязаны к сетке, если это необходимо. Передаем фиктивное событие, чтобы оно рассматривалось как событие окончания.
-            # Это важно для привязки верхнего левого угла после изменения размера.
-            self._on_drag_motion(event) 
-            self.app.save_config(show_message=False)
+            self.app.event_coalescer.flush(("button_resize", self.button_id))
+            self._resize_data = {}
+            # После изменения размера левый верхний угол снова привязывается к сетке и границам холста
+            self._move_to(self.data.get('x', 0), self.data.get('y', 0), self.canvas.winfo_width(), self.canvas.winfo_height())
+            self._record_geometry()
 
     def update_icon_and_text(self):
         icon_path = self.data.get('icon')
@@ -419,6 +428,8 @@ class ButtonWidget:
                 self.button.config(cursor="")
 
     def destroy(self):
+        self.app.event_coalescer.cancel(("button_drag", self.button_id))
+        self.app.event_coalescer.cancel(("button_resize", self.button_id))
         self.canvas.delete(self.canvas_item)
         self.button.destroy()
 
@@ -460,7 +471,7 @@ class ButtonTabManager:
                 self.app.update_tab_display()
                 self.app.selected_tab_id = tab_id
                 self.app.switch_tab(tab_id)
-                self.app.save_config(show_message=False)
+                self.app.save_config(show_message=False, sections=("tabs",))
                 # Если плавающий виджет открыт, обновляем его данные
                 if self.app.floating_widget_instance and self.app.floating_widget_instance.winfo_exists():
                     self.app.floating_widget_instance.update_widget_buttons()
@@ -534,17 +545,9 @@ class ButtonTabManager:
 
         current_buttons_canvas = self.app.tab_widgets[self.app.selected_tab_id]["buttons_canvas"]
 
-        # Получаем настройки сетки для текущей вкладки (с дефолтами, если не заданы)
-        tab_settings = self.app.tabs[tab_id]
-        tab_snap_to_grid = tab_settings.get('snap_to_grid', True)
-        tab_grid_size_x = tab_settings.get('grid_size_x', 10)
-        tab_grid_size_y = tab_settings.get('grid_size_y', 10)
-
+        # Кнопки вкладки загружаются с диска при первом открытии
+        self.app.tabs.touch(tab_id)
         for button_id, button_data in self.app.tabs[tab_id]["buttons"].items():
-            # Если у кнопки нет собственных настроек сетки, используем настройки вкладки
-            button_data.setdefault('snap_to_grid', tab_snap_to_grid)
-            button_data.setdefault('grid_size_x', tab_grid_size_x)
-            button_data.setdefault('grid_size_y', tab_grid_size_y)
             widget = ButtonWidget(self.app, self, current_buttons_canvas, tab_id, button_id, button_data)
             self.app.active_button_widgets[button_id] = widget
 
@@ -560,6 +563,19 @@ class ButtonTabManager:
         current_buttons_canvas.update_idletasks()
         current_buttons_canvas.config(scrollregion=current_buttons_canvas.bbox("all"))
 
+        self._unload_idle_tabs()
+
+    def _unload_idle_tabs(self):
+        """Выгружает давно не открывавшиеся вкладки, если загружено больше LOADED_TABS_MAX_BUTTONS кнопок."""
+        tabs = self.app.tabs
+        if tabs.loader is None or tabs.loaded_buttons_count() <= LOADED_TABS_MAX_BUTTONS:
+            return
+        # Выгружаемые вкладки должны быть на диске: дописываем секцию вкладок и дожидаемся записи
+        self.app.save_config(show_message=False, sections=("tabs",))
+        if self.app.save_scheduler.flush():
+            return # Ошибку записи покажет следующее сохранение, вкладки остаются в памяти
+        tabs.unload_idle(LOADED_TABS_MAX_BUTTONS, keep=self.app.selected_tab_id)
+
 
     def show_tab_context_menu(self, event, tab_id):
         context_menu = tk.Menu(self.app.master, tearoff=0)
@@ -630,7 +646,7 @@ class ButtonTabManager:
             current_data['grid_size_y'] = grid_size_y_var.get()
             
             self.app.update_tab_display() # Это заново создаст виджеты кнопок и применит новые настройки сетки
-            self.app.save_config(show_message=False)
+            self.app.save_config(show_message=False, sections=("tabs",))
             
             # Если плавающий виджет открыт, обновляем его данные
             if self.app.floating_widget_instance and self.app.floating_widget_instance.winfo_exists():
@@ -650,7 +666,7 @@ class ButtonTabManager:
             del self.app.tabs[tab_id]
             self.app.selected_tab_id = None
             self.app.update_tab_display()
-            self.app.save_config(show_message=False)
+            self.app.save_config(show_message=False, sections=("tabs",))
             
             # Если плавающий виджет открыт, обновляем его данные
             if self.app.floating_widget_instance and self.app.floating_widget_instance.winfo_exists():
@@ -815,7 +831,7 @@ class ButtonTabManager:
                 "grid_size_y": grid_size_y_create_var.get()
             }
             self.app.switch_tab(tab_id)
-            self.app.save_config(show_message=False)
+            self.app.save_config(show_message=False, sections=("tabs",))
             
             # Если плавающий виджет открыт, обновляем его данные
             if self.app.floating_widget_instance and self.app.floating_widget_instance.winfo_exists():
@@ -1000,7 +1016,7 @@ class ButtonTabManager:
             if button_id in self.app.active_button_widgets:
                 self.app.active_button_widgets[button_id].update_style()
 
-            self.app.save_config(show_message=False)
+            self.app.save_config(show_message=False, sections=("tabs",))
 
             # Если плавающий виджет открыт, обновляем его данные
             if self.app.floating_widget_instance and self.app.floating_widget_instance.winfo_exists():
@@ -1029,7 +1045,7 @@ class ButtonTabManager:
                 del self.app.active_button_widgets[button_id]
 
             del self.app.tabs[tab_id]["buttons"][button_id]
-            self.app.save_config(show_message=False)
+            self.app.save_config(show_message=False, sections=("tabs",))
             
             # Если плавающий виджет открыт, обновляем его данные
             if self.app.floating_widget_instance and self.app.floating_widget_instance.winfo_exists():
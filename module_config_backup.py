@@ -0,0 +1,205 @@
+
+# module_config_backup.py
+#
+# Резервные копии конфигов в configs/.backups/<имя>/. Копия - это файлы конфига по секциям
+# (в том же виде, что пишет write_config) вместе с базой работ SQLite, если она есть:
+#   objects/<sha256>             - содержимое файлов; одинаковые файлы хранятся один раз,
+#   snapshots/<время>-<причина>.json - состав копии: путь файла -> хэш содержимого.
+# Копия, которая ничем не отличается от предыдущей, не создаётся. Запись копий и удаление
+# старых (BACKUP_KEEP_LAST, BACKUP_KEEP_DAYS) выполняются в фоновом потоке.
+#
+# Список копий и восстановление:
+#   python module_config_backup.py configs/<имя>                      # список копий
+#   python module_config_backup.py configs/<имя> <копия> [куда]       # восстановить в новый каталог
+
+import os
+import sys
+import queue
+import shutil
+import hashlib
+import tempfile
+import threading
+from datetime import datetime, date
+
+from pnsc_utils import BACKUP_KEEP_LAST, BACKUP_KEEP_DAYS
+from module_config_codec import dump_config_file, read_config_file
+from module_config_sections import is_sectioned_config
+from module_config_storage import write_config, read_tab_buttons
+from module_job_store import copy_job_db
+from module_note_blobs import load_note_texts
+
+BACKUPS_DIR = ".backups"
+OBJECTS_DIR = "objects"
+SNAPSHOTS_DIR = "snapshots"
+JOB_DB_FILE = "jobs.sqlite3"
+
+
+def backup_dir_for(config_path):
+    """Каталог копий конфига: configs/.backups/<имя> (и для каталога, и для старого файла <имя>.json)."""
+    config_dir, name = os.path.split(os.path.normpath(config_path))
+    if not is_sectioned_config(config_path):
+        name = os.path.splitext(name)[0]
+    return os.path.join(config_dir, BACKUPS_DIR, name)
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def list_snapshots(backup_dir):
+    """Копии конфига от старых к новым. Каждая - словарь с name, created, reason и files."""
+    snapshots_dir = os.path.join(backup_dir, SNAPSHOTS_DIR)
+    if not os.path.isdir(snapshots_dir):
+        return []
+    snapshots = []
+    for file_name in sorted(os.listdir(snapshots_dir)):
+        name, ext = os.path.splitext(file_name)
+        if ext != ".json":
+            continue
+        try:
+            snapshot = read_config_file(os.path.join(snapshots_dir, file_name))
+        except (OSError, ValueError):
+            continue # Недописанная копия (сбой во время записи) не учитывается
+        snapshot["name"] = name
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def create_snapshot(config_path, config_data, reason, db_path=None):
+    """
+    Записывает копию конфига из снимка данных config_data (snapshot_config_data) и базы работ db_path.
+    Кнопки невыгруженных вкладок берутся из файлов конфига: для них файлы на диске актуальны.
+    Возвращает имя копии или None, если состояние не изменилось с прошлой копии.
+    """
+    backup_dir = backup_dir_for(config_path)
+    objects_dir = os.path.join(backup_dir, OBJECTS_DIR)
+    os.makedirs(objects_dir, exist_ok=True)
+    os.makedirs(os.path.join(backup_dir, SNAPSHOTS_DIR), exist_ok=True)
+
+    for tab_id, tab_data in config_data.get("tabs", {}).items():
+        if "buttons" not in tab_data:
+            tab_data["buttons"] = read_tab_buttons(config_path, tab_id)
+    # Незагруженные большие тексты заметок - из хранилища текстов конфига (в копию они попадут в её blobs/)
+    load_note_texts(config_path, config_data.get("notes", {}).values())
+
+    files = {}
+    staging_dir = tempfile.mkdtemp(prefix="staging-", dir=backup_dir)
+    try:
+        write_config(staging_dir, config_data)
+        if db_path and os.path.exists(db_path):
+            copy_job_db(db_path, os.path.join(staging_dir, JOB_DB_FILE))
+        for root, _, file_names in os.walk(staging_dir):
+            for file_name in file_names:
+                path = os.path.join(root, file_name)
+                digest = _file_hash(path)
+                files[os.path.relpath(path, staging_dir).replace(os.sep, "/")] = digest
+                object_path = os.path.join(objects_dir, digest)
+                if not os.path.exists(object_path):
+                    os.replace(path, object_path)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    snapshots = list_snapshots(backup_dir)
+    if snapshots and snapshots[-1]["files"] == files:
+        return None
+    now = datetime.now()
+    name = f"{now:%Y%m%d-%H%M%S-%f}-{reason}"
+    dump_config_file(os.path.join(backup_dir, SNAPSHOTS_DIR, f"{name}.json"),
+                     {"created": now.isoformat(timespec="seconds"), "reason": reason, "files": files})
+    return name
+
+
+def prune_snapshots(backup_dir, keep_last=BACKUP_KEEP_LAST, keep_days=BACKUP_KEEP_DAYS):
+    """
+    Удаляет копии сверх политики хранения: остаются keep_last последних копий
+    и последняя копия каждого из keep_days последних дней. Затем удаляются файлы,
+    на которые не ссылается ни одна копия. Возвращает имена удалённых копий.
+    """
+    snapshots = list_snapshots(backup_dir)
+    keep = {snapshot["name"] for snapshot in snapshots[-keep_last:]} if keep_last > 0 else set()
+    if keep_days > 0:
+        last_of_day = {}
+        for snapshot in snapshots:
+            last_of_day[date.fromisoformat(snapshot["created"][:10])] = snapshot["name"]
+        keep.update(last_of_day[day] for day in sorted(last_of_day)[-keep_days:])
+
+    removed, referenced = [], set()
+    for snapshot in snapshots:
+        if snapshot["name"] in keep:
+            referenced.update(snapshot["files"].values())
+        else:
+            os.remove(os.path.join(backup_dir, SNAPSHOTS_DIR, f"{snapshot['name']}.json"))
+            removed.append(snapshot["name"])
+    objects_dir = os.path.join(backup_dir, OBJECTS_DIR)
+    if os.path.isdir(objects_dir):
+        for digest in os.listdir(objects_dir):
+            if digest not in referenced:
+                os.remove(os.path.join(objects_dir, digest))
+    return removed
+
+
+def restore_snapshot(backup_dir, name, target_path):
+    """Восстанавливает копию name в новый каталог конфига target_path (существующий не перезаписывается)."""
+    if os.path.exists(target_path):
+        raise FileExistsError(f"Каталог уже существует: {target_path}")
+    snapshot = read_config_file(os.path.join(backup_dir, SNAPSHOTS_DIR, f"{name}.json"))
+    for relpath, digest in snapshot["files"].items():
+        path = os.path.join(target_path, *relpath.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(os.path.join(backup_dir, OBJECTS_DIR, digest), path)
+    return target_path
+
+
+class ConfigBackups:
+    """
+    Фоновый поток резервного копирования.
+
+    backup() только ставит снимок данных в очередь; запись копии и удаление старых копий
+    выполняются в рабочем потоке, поэтому интерфейс не ждёт. Ошибки копирования
+    не мешают работе и выводятся в консоль.
+    """
+
+    def __init__(self, keep_last=BACKUP_KEEP_LAST, keep_days=BACKUP_KEEP_DAYS):
+        self.keep_last = keep_last
+        self.keep_days = keep_days
+        self._tasks = queue.Queue()
+        self._worker = threading.Thread(target=self._worker_loop, name="pnsc-config-backup", daemon=True)
+        self._worker.start()
+
+    def backup(self, config_path, config_data, reason, db_path=None):
+        """config_data должен быть независимой копией (snapshot_config_data): его читает другой поток."""
+        self._tasks.put((config_path, config_data, reason, db_path))
+
+    def shutdown(self):
+        """Дожидается записи уже поставленных копий и останавливает поток."""
+        self._tasks.put(None)
+        self._worker.join()
+
+    def _worker_loop(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            config_path, config_data, reason, db_path = task
+            try:
+                create_snapshot(config_path, config_data, reason, db_path)
+                prune_snapshots(backup_dir_for(config_path), self.keep_last, self.keep_days)
+            except Exception as e:
+                print(f"Ошибка резервного копирования конфига {config_path}: {e}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Использование: python module_config_backup.py configs/<имя> [копия [куда]]")
+        sys.exit(1)
+    source_dir = backup_dir_for(sys.argv[1])
+    if len(sys.argv) == 2:
+        for item in list_snapshots(source_dir):
+            print(f"{item['name']:<48}{item['reason']:<20}{len(item['files']):>6} файлов")
+    else:
+        target = sys.argv[3] if len(sys.argv) > 3 else f"{os.path.normpath(sys.argv[1])}-{sys.argv[2]}"
+        print(f"Копия восстановлена в {restore_snapshot(source_dir, sys.argv[2], target)}")
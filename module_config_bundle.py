@@ -0,0 +1,280 @@
+
+# module_config_bundle.py
+#
+# Пакет конфига для переноса на другое рабочее место: один zip-архив с файлами конфига
+# (как их пишет write_config, вместе с базой работ SQLite) и всеми изображениями, на которые
+# ссылаются кнопки (icon) и заметки (bg_image):
+#   bundle.json          - описание пакета: имя конфига, изображения и размеры их показа;
+#   config/...           - файлы конфига, пути к изображениям заменены ссылками asset:<файл>;
+#   assets/<sha256>.<ext> - изображения, каждое содержимое один раз (по хэшу исходного файла).
+# Изображение, которое везде показывается мельче оригинала, уменьшается до наибольшего
+# используемого размера (BUNDLE_PRESCALE_IMAGES). При импорте изображения раскладываются
+# в общую папку configs/.assets/ (одинаковые файлы разных пакетов хранятся один раз),
+# а ссылки в конфиге заменяются путями к ним. Архив читается по файлам, целиком в память не загружается.
+#
+#   python module_config_bundle.py export configs/<имя> <пакет.zip>
+#   python module_config_bundle.py import <пакет.zip> [папка конфигов]
+
+import io
+import os
+import json
+import sys
+import shutil
+import zipfile
+import hashlib
+import tempfile
+from datetime import datetime
+
+from pnsc_utils import HAS_PILLOW, BUNDLE_PRESCALE_IMAGES
+from module_config_sections import is_sectioned_config
+from module_config_storage import write_config, load_config_file, read_tab_buttons, snapshot_config_data
+from module_config_schema import normalize_config
+from module_job_store import job_db_path_for, copy_job_db
+from module_note_blobs import load_note_texts
+
+if HAS_PILLOW:
+    from pnsc_utils import Image
+
+BUNDLE_FORMAT = 1
+BUNDLE_MANIFEST = "bundle.json"
+BUNDLE_CONFIG_DIR = "config"
+BUNDLE_ASSETS_DIR = "assets"
+ASSETS_DIR = ".assets" # Общая папка изображений импортированных пакетов: configs/.assets/
+ASSET_PREFIX = "asset:"
+ICON_MIN_SIZE = 16 # Как в ButtonWidget.update_icon_and_text: иконка - квадрат по меньшей стороне кнопки
+ICON_PADDING = 10
+DEFAULT_BUTTON_COLOR = "SystemButtonFace"
+
+
+def assets_dir_for(config_dir):
+    return os.path.join(config_dir, ASSETS_DIR)
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _icon_size(button_data):
+    return min(max(ICON_MIN_SIZE, button_data.get("width", 0) - ICON_PADDING),
+               max(ICON_MIN_SIZE, button_data.get("height", 0) - ICON_PADDING))
+
+
+def _image_refs(config_data):
+    """(словарь, ключ, размер показа) для каждой ссылки на изображение в кнопках и заметках."""
+    for tab_data in config_data.get("tabs", {}).values():
+        for button_data in tab_data.get("buttons", {}).values():
+            if button_data.get("icon"):
+                size = _icon_size(button_data)
+                yield button_data, "icon", (size, size)
+    for note_data in config_data.get("notes", {}).values():
+        if note_data.get("bg_image"):
+            yield note_data, "bg_image", (note_data.get("width", 0), note_data.get("height", 0))
+
+
+def _prescaled(path, size):
+    """Байты изображения, уменьшенного до size, или None, если уменьшать не нужно или нельзя."""
+    if not (HAS_PILLOW and BUNDLE_PRESCALE_IMAGES):
+        return None
+    try:
+        with Image.open(path) as img:
+            target = (min(size[0], img.width), min(size[1], img.height))
+            if target == img.size or min(target) <= 0:
+                return None
+            image_format = img.format
+            scaled = img.resize(target, Image.LANCZOS)
+        if image_format == "JPEG" and scaled.mode not in ("RGB", "L"):
+            scaled = scaled.convert("RGB")
+        buffer = io.BytesIO()
+        scaled.save(buffer, format=image_format)
+    except Exception as e:
+        print(f"Изображение {path} не уменьшено: {e}")
+        return None
+    data = buffer.getvalue()
+    return data if data and len(data) < os.path.getsize(path) else None
+
+
+def export_bundle(config_path, bundle_path, config_data=None, db_path=None):
+    """
+    Записывает пакет конфига. config_data - снимок данных (snapshot_config_data) или None -
+    тогда конфиг читается с диска. Возвращает (число изображений, список ненайденных файлов).
+    """
+    if config_data is None:
+        config_data = load_config_file(config_path)
+        normalize_config(config_data, config_data.get("button_color", DEFAULT_BUTTON_COLOR))
+    else:
+        config_data = snapshot_config_data(config_data)
+    if db_path is None and config_data.get("job_store") == "sqlite":
+        db_path = job_db_path_for(config_path)
+    for tab_id, tab_data in config_data.get("tabs", {}).items():
+        if "buttons" not in tab_data:
+            tab_data["buttons"] = read_tab_buttons(config_path, tab_id)
+    load_note_texts(config_path, config_data.get("notes", {}).values())
+
+    assets, hashes, missing = {}, {}, []
+    for record, key, size in _image_refs(config_data):
+        path = record[key]
+        if path.startswith(ASSET_PREFIX):
+            continue
+        if not os.path.isfile(path):
+            missing.append(path)
+            continue
+        if path not in hashes:
+            hashes[path] = _file_hash(path)
+        asset_name = hashes[path] + os.path.splitext(path)[1].lower()
+        asset = assets.setdefault(asset_name, {"source": path, "size": [0, 0], "uses": 0})
+        asset["size"] = [max(asset["size"][0], size[0]), max(asset["size"][1], size[1])]
+        asset["uses"] += 1
+        record[key] = ASSET_PREFIX + asset_name
+
+    name = os.path.basename(os.path.normpath(config_path))
+    if not is_sectioned_config(config_path):
+        name = os.path.splitext(name)[0]
+    manifest = {"format": BUNDLE_FORMAT, "name": name, "created": datetime.now().isoformat(timespec="seconds"),
+                "assets": {asset_name: {"size": asset["size"], "uses": asset["uses"]}
+                           for asset_name, asset in assets.items()},
+                "missing": sorted(set(missing))}
+
+    staging_dir = tempfile.mkdtemp(prefix="pnsc_bundle_")
+    tmp_path = f"{bundle_path}.tmp"
+    try:
+        write_config(staging_dir, config_data)
+        if db_path and os.path.exists(db_path):
+            copy_job_db(db_path, job_db_path_for(staging_dir))
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as bundle:
+            bundle.writestr(BUNDLE_MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=2))
+            for root, _, file_names in os.walk(staging_dir):
+                for file_name in file_names:
+                    path = os.path.join(root, file_name)
+                    relpath = os.path.relpath(path, staging_dir).replace(os.sep, "/")
+                    bundle.write(path, f"{BUNDLE_CONFIG_DIR}/{relpath}")
+            for asset_name, asset in assets.items():
+                arcname = f"{BUNDLE_ASSETS_DIR}/{asset_name}"
+                data = _prescaled(asset["source"], asset["size"])
+                if data is None:
+                    bundle.write(asset["source"], arcname) # Файл копируется в архив по частям
+                else:
+                    bundle.writestr(arcname, data)
+        os.replace(tmp_path, bundle_path)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(assets), manifest["missing"]
+
+
+def _safe_member_path(target_dir, relpath):
+    """Путь файла архива внутри target_dir; имена с .., \\, буквой диска и абсолютные пути отклоняются."""
+    parts = [part for part in relpath.split("/") if part not in ("", ".")]
+    if (not parts or ".." in parts or "\\" in relpath or os.path.isabs(relpath)
+            or any(":" in part for part in parts)):
+        raise ValueError(f"Недопустимое имя файла в пакете: {relpath}")
+    target_dir = os.path.abspath(target_dir)
+    path = os.path.normpath(os.path.join(target_dir, *parts))
+    if os.path.commonpath([target_dir, path]) != target_dir:
+        raise ValueError(f"Недопустимое имя файла в пакете: {relpath}")
+    return path
+
+
+def _is_safe_config_name(name):
+    """Имя конфига - одна часть пути внутри папки конфигов (не служебная, без разделителей и диска)."""
+    if not isinstance(name, str) or not name.strip() or name.startswith(".") or ":" in name:
+        return False
+    if os.sep in name or (os.altsep and os.altsep in name) or "/" in name or "\\" in name:
+        return False
+    return not os.path.isabs(name) and name != ".."
+
+
+def _safe_config_name(name, bundle_path):
+    """Имя нового конфига: имя из пакета, а если оно недопустимо - имя файла пакета."""
+    if _is_safe_config_name(name):
+        return name
+    fallback = os.path.splitext(os.path.basename(bundle_path))[0]
+    if _is_safe_config_name(fallback):
+        return fallback
+    raise ValueError(f"Недопустимое имя конфига в пакете: {name}")
+
+
+def _extract_member(bundle, member, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with bundle.open(member) as src, open(path, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def _unique_config_path(config_dir, name):
+    path, n = os.path.join(config_dir, name), 2
+    while os.path.exists(path) or os.path.exists(f"{path}.json"):
+        path, n = os.path.join(config_dir, f"{name}-{n}"), n + 1
+    return path
+
+
+def import_bundle(bundle_path, config_dir, name=None):
+    """
+    Распаковывает пакет в новый конфиг configs/<имя> (при совпадении имени добавляется номер)
+    и заменяет ссылки на изображения путями в configs/.assets/. Возвращает путь к конфигу.
+    """
+    with zipfile.ZipFile(bundle_path) as bundle:
+        manifest = _read_manifest(bundle)
+        if manifest.get("format") != BUNDLE_FORMAT:
+            raise ValueError(f"Неподдерживаемая версия пакета: {manifest.get('format')}")
+        config_name = _safe_config_name(name or manifest.get("name"), bundle_path)
+        config_path = _unique_config_path(config_dir, config_name)
+        assets_dir = assets_dir_for(config_dir)
+        try:
+            for member in bundle.infolist():
+                if member.is_dir():
+                    continue
+                folder, _, relpath = member.filename.partition("/")
+                if folder == BUNDLE_CONFIG_DIR:
+                    _extract_member(bundle, member, _safe_member_path(config_path, relpath))
+                elif folder == BUNDLE_ASSETS_DIR:
+                    path = _safe_member_path(assets_dir, relpath)
+                    if not os.path.exists(path): # Изображение из другого пакета уже распаковано
+                        _extract_member(bundle, member, path)
+            _resolve_assets(config_path, assets_dir)
+        except Exception:
+            shutil.rmtree(config_path, ignore_errors=True)
+            raise
+    return config_path
+
+
+def _resolve_assets(config_path, assets_dir):
+    """Заменяет ссылки asset:<файл> в конфиге абсолютными путями изображений."""
+    config_data = load_config_file(config_path)
+    for tab_id, tab_data in config_data.get("tabs", {}).items():
+        tab_data["buttons"] = read_tab_buttons(config_path, tab_id)
+    changed = False
+    for record, key, _ in _image_refs(config_data):
+        if record[key].startswith(ASSET_PREFIX):
+            record[key] = os.path.abspath(os.path.join(assets_dir, record[key][len(ASSET_PREFIX):]))
+            changed = True
+    if changed:
+        write_config(config_path, config_data)
+
+
+def _read_manifest(bundle):
+    with bundle.open(BUNDLE_MANIFEST) as f:
+        return json.load(f)
+
+
+def read_bundle_manifest(bundle_path):
+    """Описание пакета (имя, изображения, ненайденные при экспорте файлы) без распаковки."""
+    with zipfile.ZipFile(bundle_path) as bundle:
+        return _read_manifest(bundle)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("export", "import"):
+        print("Использование: python module_config_bundle.py export configs/<имя> <пакет.zip>\n"
+              "               python module_config_bundle.py import <пакет.zip> [папка конфигов]")
+        sys.exit(1)
+    if sys.argv[1] == "export":
+        count, not_found = export_bundle(sys.argv[2], sys.argv[3])
+        print(f"Пакет записан: {sys.argv[3]}, изображений: {count}")
+        for missing_path in not_found:
+            print(f"Не найдено изображение: {missing_path}")
+    else:
+        print(f"Конфиг импортирован: {import_bundle(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else 'configs')}")
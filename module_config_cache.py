@@ -0,0 +1,137 @@
+
+# module_config_cache.py
+
+import os
+import sys
+import marshal
+from collections import OrderedDict
+
+from pnsc_utils import CONFIG_CACHE_ENTRIES, CONFIG_CACHE_MAX_BYTES
+from module_config_sections import (CONFIG_SECTIONS, is_sectioned_config, section_file_path, manifest_path_for,
+                                    tabs_dir_for)
+from module_config_journal import journal_path_for
+
+# Снимок для быстрого запуска: разобранный конфиг в формате marshal в каталоге конфига.
+# Формат marshal зависит от версии Python, поэтому она записывается в заголовок снимка.
+WARM_START_FILE = "warm_start.marshal"
+WARM_START_FORMAT = 1
+
+
+def config_signature(config_path):
+    """
+    Отпечаток файлов конфига: (имя, mtime_ns, размер) для снимка по секциям (вместе с файлами
+    кнопок вкладок) или однофайлового конфига и журнала. Любая запись на диск меняет отпечаток.
+    """
+    if is_sectioned_config(config_path):
+        paths = [section_file_path(config_path, section) for section in CONFIG_SECTIONS]
+        paths.append(manifest_path_for(config_path))
+        tabs_dir = tabs_dir_for(config_path)
+        if os.path.isdir(tabs_dir):
+            paths.extend(os.path.join(tabs_dir, name) for name in sorted(os.listdir(tabs_dir)))
+    else:
+        paths = [config_path]
+    paths.append(journal_path_for(config_path))
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signature.append((os.path.relpath(path, os.path.dirname(config_path)), stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class ConfigCache:
+    """
+    LRU-кэш разобранных конфигов для быстрого переключения между ними.
+
+    Перед сменой конфига приложение кладёт в кэш состояние текущего (уже записанное на диск),
+    при возврате к нему take() отдаёт это состояние без чтения и разбора файлов -
+    если отпечаток файлов (config_signature) не изменился. Запись забирается из кэша целиком,
+    поэтому копировать данные не нужно: приложение вернёт их при следующей смене конфига.
+    """
+
+    def __init__(self, max_entries=CONFIG_CACHE_ENTRIES, max_bytes=CONFIG_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict() # путь -> (отпечаток, размер, данные конфига)
+        self._bytes = 0
+
+    @staticmethod
+    def _key(config_path):
+        return os.path.normcase(os.path.abspath(config_path))
+
+    def put(self, config_path, config_data):
+        """Запоминает данные конфига, совпадающие с его файлами на диске."""
+        key = self._key(config_path)
+        self._discard(key)
+        signature = config_signature(config_path)
+        size = sum(file_size for _, _, file_size in signature)
+        if not signature or self.max_entries <= 0 or size > self.max_bytes:
+            return
+        self._entries[key] = (signature, size, config_data)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+
+    def take(self, config_path):
+        """Забирает данные конфига из кэша или возвращает None, если их нет или файлы изменились."""
+        entry = self._discard(self._key(config_path))
+        if entry is not None and entry[0] == config_signature(config_path):
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        return None
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._bytes}
+
+
+# --- СНИМОК ДЛЯ БЫСТРОГО ЗАПУСКА ---
+
+def warm_start_path_for(config_path):
+    return os.path.join(config_path, WARM_START_FILE)
+
+
+def write_warm_start(config_path, config_data):
+    """
+    Сохраняет разобранный конфиг (уже дополненный значениями по умолчанию) вместе с отпечатком
+    его файлов. Вызывается при выходе, когда все изменения записаны на диск.
+    """
+    if not is_sectioned_config(config_path):
+        return
+    raw = marshal.dumps((WARM_START_FORMAT, sys.version, config_signature(config_path), config_data))
+    path = warm_start_path_for(config_path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(raw)
+    os.replace(tmp_path, path)
+
+
+def read_warm_start(config_path):
+    """Данные конфига из снимка или None, если снимка нет, он повреждён или файлы конфига с тех пор менялись."""
+    if not is_sectioned_config(config_path):
+        return None
+    try:
+        with open(warm_start_path_for(config_path), "rb") as f:
+            snapshot_format, python_version, signature, config_data = marshal.loads(f.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if snapshot_format != WARM_START_FORMAT or python_version != sys.version:
+        return None
+    if signature != config_signature(config_path):
+        return None
+    return config_data
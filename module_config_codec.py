@@ -0,0 +1,99 @@
+
+# module_config_codec.py
+
+import os
+import sys
+import json
+import gzip
+import time
+
+from pnsc_utils import CONFIG_CODEC, CONFIG_GZIP
+
+# --- НЕОБЯЗАТЕЛЬНЫЙ БЫСТРЫЙ JSON (orjson) ---
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    orjson = None
+    HAS_ORJSON = False
+
+# "pretty" - JSON с отступами (прежний формат), "compact" - JSON без пробелов,
+# "fast" - orjson, если установлен, иначе тот же "compact" через стандартный json
+CONFIG_CODECS = ("pretty", "compact", "fast")
+GZIP_MAGIC = b"\x1f\x8b"
+GZIP_LEVEL = 6
+
+
+def encode_config(config_data, codec=CONFIG_CODEC, compress=CONFIG_GZIP):
+    """Сериализует данные конфига в байты выбранным кодеком."""
+    if codec == "fast" and HAS_ORJSON:
+        raw = orjson.dumps(config_data)
+    elif codec == "pretty":
+        raw = json.dumps(config_data, indent=4, ensure_ascii=False).encode("utf-8")
+    else:
+        raw = json.dumps(config_data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if compress:
+        raw = gzip.compress(raw, compresslevel=GZIP_LEVEL)
+    return raw
+
+
+def decode_config(raw):
+    """Разбирает байты конфига. Сжатие gzip определяется по сигнатуре, любой вариант JSON читается одинаково."""
+    if raw[:len(GZIP_MAGIC)] == GZIP_MAGIC:
+        raw = gzip.decompress(raw)
+    if HAS_ORJSON:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def dump_config_file(path, config_data, codec=CONFIG_CODEC, compress=CONFIG_GZIP):
+    """Атомарно записывает конфиг: сначала во временный файл, затем подменяет основной."""
+    raw = encode_config(config_data, codec, compress)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(raw)
+    os.replace(tmp_path, path)
+    return len(raw)
+
+
+def read_config_file(path):
+    with open(path, "rb") as f:
+        return decode_config(f.read())
+
+
+# --- БЕНЧМАРК КОДЕКОВ ---
+
+def benchmark_codecs(config_data, repeat=5):
+    """Сравнивает кодеки: лучшее время записи и чтения (мс) и размер в байтах."""
+    results = []
+    for codec in CONFIG_CODECS:
+        for compress in (False, True):
+            dump_times, load_times = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                raw = encode_config(config_data, codec, compress)
+                dump_times.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                decode_config(raw)
+                load_times.append(time.perf_counter() - start)
+            results.append({
+                "codec": codec + ("+gzip" if compress else ""),
+                "dump_ms": min(dump_times) * 1000,
+                "load_ms": min(load_times) * 1000,
+                "bytes": len(raw),
+            })
+    return results
+
+
+if __name__ == "__main__":
+    # Использование: python module_config_codec.py [путь_к_конфигу]
+    if len(sys.argv) > 1:
+        from module_config_storage import load_config_file
+        data = load_config_file(sys.argv[1])
+    else:
+        from pnsc_benchmark import SIZES, make_synthetic_config
+        data = make_synthetic_config(**SIZES["medium"])
+    print(f"orjson: {'установлен' if HAS_ORJSON else 'не установлен (fast = compact)'}")
+    print(f"{'Кодек':<16}{'Запись, мс':>12}{'Чтение, мс':>12}{'Байт':>12}")
+    for row in benchmark_codecs(data):
+        print(f"{row['codec']:<16}{row['dump_ms']:>12.2f}{row['load_ms']:>12.2f}{row['bytes']:>12}")
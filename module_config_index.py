@@ -0,0 +1,161 @@
+
+# module_config_index.py
+#
+# Индекс конфигов configs/.index.json: краткие сведения о каждом конфиге (число вкладок, кнопок,
+# заметок и работ, время последней работы, последнего открытия и сохранения, размер файлов).
+# Индекс обновляется при каждой записи конфига и при его открытии, поэтому окно выбора конфига
+# и запуск программы не разбирают файлы всех конфигов: список сортируется по давности
+# использования, а при запуске открывается последний использованный конфиг.
+
+import os
+import time
+import sqlite3
+from datetime import datetime
+
+from module_config_codec import dump_config_file, read_config_file
+from module_config_sections import is_sectioned_config, list_config_names
+from module_config_lock import ConfigLock
+from module_config_cache import config_signature
+from module_config_journal import journal_record_section
+from module_config_storage import read_tab_buttons
+from module_job_store import job_db_path_for
+
+INDEX_FILE = ".index.json"
+INDEX_FORMAT = 1
+
+
+def index_path_for(config_dir):
+    return os.path.join(config_dir, INDEX_FILE)
+
+
+def config_name_of(config_path):
+    """Имя конфига по пути: каталог configs/<имя> или старый файл configs/<имя>.json."""
+    name = os.path.basename(os.path.normpath(config_path))
+    return name if is_sectioned_config(config_path) else os.path.splitext(name)[0]
+
+
+def read_config_index(config_dir):
+    """Сведения о конфигах {имя: запись}. Повреждённый или устаревший индекс считается пустым."""
+    try:
+        index = read_config_file(index_path_for(config_dir))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(index, dict) or index.get("format") != INDEX_FORMAT:
+        return {}
+    return index.get("configs", {})
+
+
+def _jobs_summary(config_path, config_data):
+    """(число работ, время последней работы) из данных конфига или из базы SQLite."""
+    if config_data.get("job_store") == "sqlite":
+        db_path = job_db_path_for(config_path)
+        if not os.path.exists(db_path):
+            return 0, None
+        conn = sqlite3.connect(db_path)
+        try:
+            return tuple(conn.execute("SELECT COUNT(*), MAX(timestamp) FROM jobs").fetchone())
+        finally:
+            conn.close()
+    jobs = config_data.get("completed_jobs", [])
+    timestamps = [job["timestamp"] for job in jobs if isinstance(job.get("timestamp"), (int, float))]
+    return len(jobs), max(timestamps, default=None)
+
+
+def summarize_config(config_path, entry, config_data=None, records=()):
+    """
+    Обновляет запись индекса по снимку конфига (в нём могут быть не все секции) и по записям
+    журнала. Кнопки считаются по загруженным вкладкам; у остальных остаётся прежнее число,
+    а если его нет - кнопки читаются из файла вкладки.
+    """
+    if config_data:
+        if "tabs" in config_data:
+            old_counts = entry.get("tab_buttons", {})
+            tab_buttons = {}
+            for tab_id, tab_data in config_data["tabs"].items():
+                if "buttons" in tab_data:
+                    tab_buttons[tab_id] = len(tab_data["buttons"])
+                elif tab_id in old_counts:
+                    tab_buttons[tab_id] = old_counts[tab_id]
+                else:
+                    tab_buttons[tab_id] = len(read_tab_buttons(config_path, tab_id))
+            entry["tabs"] = len(tab_buttons)
+            entry["tab_buttons"] = tab_buttons
+            entry["buttons"] = sum(tab_buttons.values())
+        if "notes" in config_data:
+            entry["notes"] = len(config_data["notes"])
+        if "completed_jobs" in config_data or "job_store" in config_data:
+            entry["jobs"], entry["last_job"] = _jobs_summary(config_path, config_data)
+    for record in records:
+        # Журнал меняет только содержимое записей; число меняется лишь у работ
+        if journal_record_section(record) != "jobs":
+            continue
+        if record["op"] == "job_append":
+            entry["jobs"] = entry.get("jobs", 0) + 1
+            timestamp = record["job"].get("timestamp")
+            if isinstance(timestamp, (int, float)):
+                entry["last_job"] = max(entry.get("last_job") or timestamp, timestamp)
+        elif record["op"] == "job_delete":
+            entry["jobs"] = max(entry.get("jobs", 0) - 1, 0)
+    return entry
+
+
+def _files_size(config_path):
+    size = sum(file_size for _, _, file_size in config_signature(config_path))
+    db_path = job_db_path_for(config_path)
+    if os.path.exists(db_path):
+        size += os.path.getsize(db_path)
+    return size
+
+
+def update_config_index(config_path, config_data=None, records=(), opened=False):
+    """
+    Обновляет запись конфига в индексе его папки (после записи конфига или при открытии).
+    Индекс - только подсказка для окна выбора, поэтому ошибки не прерывают сохранение.
+    """
+    config_dir = os.path.dirname(os.path.normpath(config_path)) or "."
+    index_path = index_path_for(config_dir)
+    try:
+        # Индекс общий для всех конфигов папки и всех экземпляров PNSc
+        with ConfigLock(index_path):
+            index = read_config_index(config_dir)
+            name = config_name_of(config_path)
+            entry = summarize_config(config_path, dict(index.get(name, {})), config_data, records)
+            now = time.time()
+            if opened:
+                entry["opened"] = now
+            else:
+                entry["saved"] = now
+            entry["size"] = _files_size(config_path)
+            index[name] = entry
+            existing = set(list_config_names(config_dir))
+            index = {key: value for key, value in index.items() if key in existing or key == name}
+            dump_config_file(index_path, {"format": INDEX_FORMAT, "configs": index})
+    except Exception as e:
+        print(f"Ошибка обновления индекса конфигов {index_path}: {e}")
+
+
+def recent_config_names(config_dir, index=None):
+    """Имена конфигов папки: сначала недавно открытые или сохранённые, затем остальные по алфавиту."""
+    index = read_config_index(config_dir) if index is None else index
+
+    def last_used(name):
+        entry = index.get(name, {})
+        return max(entry.get("opened") or 0, entry.get("saved") or 0)
+
+    return sorted(list_config_names(config_dir), key=lambda name: -last_used(name))
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%d.%m.%Y %H:%M") if timestamp else "-"
+
+
+def describe_config(entry):
+    """Краткое описание конфига для окна выбора."""
+    if not entry:
+        return "Сведений пока нет: конфиг ещё не открывался в этой версии."
+    size_kb = entry.get("size", 0) / 1024
+    return (f"Вкладок: {entry.get('tabs', 0)}, кнопок: {entry.get('buttons', 0)}, "
+            f"заметок: {entry.get('notes', 0)}, работ: {entry.get('jobs', 0)}\n"
+            f"Последняя работа: {_format_time(entry.get('last_job'))}\n"
+            f"Открыт: {_format_time(entry.get('opened'))}, сохранён: {_format_time(entry.get('saved'))}\n"
+            f"Размер: {size_kb:.1f} КБ")
@@ -0,0 +1,250 @@
+
+# module_config_journal.py
+
+import os
+import json
+import uuid
+import threading
+
+from pnsc_utils import JOURNAL_COMPACT_BYTES
+from module_config_sections import CONFIG_SECTIONS, is_sectioned_config
+from module_note_blobs import NOTE_BLOB_KEY
+
+# Секция конфига, которую меняет каждая операция журнала
+RECORD_SECTIONS = {
+    "note_text": "notes",
+    "note_geometry": "notes",
+    "button_geometry": "tabs",
+    "job_append": "jobs",
+    "job_edit": "jobs",
+    "job_delete": "jobs",
+    "types_set": "types",
+}
+
+
+def journal_path_for(config_path):
+    """Журнал лежит в каталоге конфига (configs/<имя>/journal.jsonl),
+    у старого однофайлового конфига - рядом с ним (configs/<имя>.journal)."""
+    if is_sectioned_config(config_path):
+        return os.path.join(config_path, "journal.jsonl")
+    return os.path.splitext(config_path)[0] + ".journal"
+
+
+def journal_record_section(record):
+    return RECORD_SECTIONS.get(record.get("op"))
+
+
+def journal_marker_offsets(marker):
+    """Смещения маркера по секциям. Маркер {"id", "offset"} относится ко всем секциям сразу."""
+    if "offsets" in marker:
+        return dict(marker["offsets"])
+    return {section: marker.get("offset", 0) for section in CONFIG_SECTIONS}
+
+
+def journal_record_key(record):
+    """Ключ для объединения записей: более новая запись с тем же ключом заменяет старую."""
+    op = record["op"]
+    if op in ("note_text", "note_geometry"):
+        return (op, record["note_id"])
+    if op == "button_geometry":
+        return (op, record["tab_id"], record["button_id"])
+    if op in ("job_append", "job_edit", "job_delete"):
+        job_id = record["job"]["job_id"] if op == "job_append" else record["job_id"]
+        return (op, job_id)
+    return (op,)
+
+
+def apply_journal_record(config_data, record, job_index=None):
+    """Применяет одну запись журнала к данным конфига.
+    Все операции идемпотентны, поэтому повторное применение безопасно."""
+    op = record.get("op")
+    if op == "note_text":
+        note = config_data.get("notes", {}).get(record["note_id"])
+        if note is not None:
+            note["text"] = record["text"]
+            note.pop(NOTE_BLOB_KEY, None) # Текст в журнале новее вынесенного в хранилище
+    elif op == "note_geometry":
+        note = config_data.get("notes", {}).get(record["note_id"])
+        if note is not None:
+            note.update(record["geometry"])
+    elif op == "button_geometry":
+        tab = config_data.get("tabs", {}).get(record["tab_id"])
+        button = tab.get("buttons", {}).get(record["button_id"]) if tab else None
+        if button is not None:
+            button.update(record["geometry"])
+    elif op in ("job_append", "job_edit", "job_delete"):
+        jobs = config_data.setdefault("completed_jobs", [])
+        if job_index is None:
+            job_index = {job.get("job_id"): job for job in jobs}
+        if op == "job_append":
+            job = record["job"]
+            if job["job_id"] not in job_index:
+                jobs.append(job)
+                job_index[job["job_id"]] = job
+        elif op == "job_edit":
+            job = job_index.get(record["job_id"])
+            if job is not None:
+                job.update(record["fields"])
+        else:
+            job = job_index.pop(record["job_id"], None)
+            if job is not None:
+                jobs.remove(job)
+    elif op == "types_set":
+        config_data["device_types"] = list(record["device_types"])
+        config_data["work_types"] = list(record["work_types"])
+
+
+class ConfigJournal:
+    """
+    Журнал изменений конфига (write-ahead log) в формате JSON Lines.
+
+    Первая строка - заголовок {"journal_id", "base"}, далее по одной записи на строку.
+    Позиция записи - логическое смещение: base + смещение от конца заголовка.
+    Логические смещения не меняются при уплотнении, поэтому снимок может хранить
+    отдельный маркер для каждой секции конфига: всё до смещения N уже учтено в файле секции.
+    Уплотнение отбрасывает записи, уже вошедшие во все секции.
+    Методы append/position/compact вызываются из рабочего потока сохранения под блокировкой
+    конфига (ConfigLock). Журнал может дописывать и уплотнять другой экземпляр PNSc,
+    поэтому перед каждой операцией заголовок и размер перечитываются из файла.
+    """
+
+    def __init__(self, config_path, reset=False):
+        self.config_path = config_path
+        self.path = journal_path_for(config_path)
+        self._lock = threading.Lock()
+        self.journal_id = None
+        self.base = 0 # Логическое смещение первой записи после заголовка
+        self.header_size = 0
+        self.size = 0 # Размер файла журнала в байтах
+        if reset or not self._read_header():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.journal_id = str(uuid.uuid4())
+            self._rewrite(0, b"")
+
+    def _read_header(self):
+        try:
+            with open(self.path, "rb") as f:
+                header_line = f.readline()
+                header = json.loads(header_line)
+                self.journal_id = header["journal_id"]
+                self.header_size = len(header_line)
+                # У журналов без base логическое смещение совпадает со смещением в файле
+                self.base = header.get("base", self.header_size)
+                f.seek(0, os.SEEK_END)
+                self.size = f.tell()
+            return True
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+
+    def _rewrite(self, base, tail):
+        """Атомарно пересоздаёт журнал, начиная с логического смещения base."""
+        header = (json.dumps({"journal_id": self.journal_id, "base": base}) + "\n").encode("utf-8")
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header + tail)
+        os.replace(tmp_path, self.path)
+        self.base = base
+        self.header_size = len(header)
+        self.size = len(header) + len(tail)
+
+    def _refresh(self):
+        if not self._read_header():
+            self._rewrite(self.base, b"") # Журнал удалён или испорчен извне: начинаем с того же смещения
+        else:
+            self._drop_torn_tail()
+
+    def _drop_torn_tail(self):
+        """
+        Обрезает недописанную последнюю строку, оставшуюся после аварийного завершения,
+        иначе следующая запись продолжит её и не прочитается при накатывании.
+        Вызывается под блокировкой конфига перед каждой операцией, поэтому чужую
+        незавершённую запись не задевает.
+        """
+        if self.size <= self.header_size:
+            return
+        with open(self.path, "r+b") as f:
+            end = self.size
+            while end > self.header_size:
+                start = max(self.header_size, end - 4096)
+                f.seek(start)
+                chunk = f.read(end - start)
+                newline = chunk.rfind(b"\n")
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end < self.size:
+                f.truncate(end)
+                self.size = end
+
+    def position(self):
+        """Маркер текущего конца журнала для сохранения вместе со снимком."""
+        with self._lock:
+            self._refresh()
+            return {"id": self.journal_id, "offset": self.base + self.size - self.header_size}
+
+    def append(self, records):
+        with self._lock:
+            self._refresh()
+            data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+            with open(self.path, "ab") as f:
+                f.write(data)
+            self.size += len(data)
+
+    def needs_compaction(self):
+        return self.size > JOURNAL_COMPACT_BYTES
+
+    def compact(self, offset):
+        """Отбрасывает записи до логического смещения offset (они уже есть во всех секциях)."""
+        with self._lock:
+            self._refresh()
+            if offset <= self.base:
+                return
+            with open(self.path, "rb") as f:
+                f.seek(self.header_size + offset - self.base)
+                tail = f.read()
+            self._rewrite(offset, tail)
+
+
+def read_journal_records(config_path, marker):
+    """Возвращает записи журнала, ещё не вошедшие в файлы своих секций по маркеру marker."""
+    path = journal_path_for(config_path)
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, "rb") as f:
+        header_line = f.readline()
+        try:
+            header = json.loads(header_line)
+        except ValueError:
+            return []
+        offsets = {}
+        if marker and header.get("journal_id") == marker.get("id"):
+            offsets = journal_marker_offsets(marker)
+        position = header.get("base", len(header_line))
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Недописанная строка после аварийного завершения: следующая запись начинается с новой строки
+                position += len(line)
+                continue
+            if position >= offsets.get(journal_record_section(record), 0):
+                records.append(record)
+            position += len(line)
+    return records
+
+
+def apply_journal_records(config_data, records):
+    """Применяет записи журнала по порядку."""
+    if not records:
+        return config_data
+    job_index = {job.get("job_id"): job for job in config_data.get("completed_jobs", [])}
+    for record in records:
+        apply_journal_record(config_data, record, job_index)
+    return config_data
+
+
+def replay_journal(config_data, config_path, marker):
+    """Накатывает журнал поверх последнего снимка конфига."""
+    return apply_journal_records(config_data, read_journal_records(config_path, marker))
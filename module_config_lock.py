@@ -0,0 +1,90 @@
+
+# module_config_lock.py
+#
+# Рекомендательная блокировка конфига между процессами: несколько рабочих мест (или экземпляров
+# PNSc) могут открывать конфиги из одной общей папки. Запись снимка и журнала выполняется
+# только под блокировкой (fcntl.flock в Linux/macOS, msvcrt.locking в Windows).
+
+import os
+import time
+
+from pnsc_utils import CONFIG_LOCK_TIMEOUT_S
+from module_config_sections import is_sectioned_config
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+LOCK_FILE = ".lock"
+LOCK_RETRY_S = 0.01
+
+
+def lock_path_for(config_path):
+    """Файл блокировки: configs/<имя>/.lock, у старого однофайлового конфига - configs/<имя>.lock."""
+    if is_sectioned_config(config_path):
+        return os.path.join(config_path, LOCK_FILE)
+    return os.path.splitext(config_path)[0] + ".lock"
+
+
+def _try_lock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    elif msvcrt is not None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ConfigLock:
+    """
+    Исключительная блокировка конфига (with ConfigLock(path): ...).
+    Если за timeout секунд блокировку не удалось получить, выбрасывается TimeoutError.
+    """
+
+    def __init__(self, config_path, timeout=CONFIG_LOCK_TIMEOUT_S):
+        self.path = lock_path_for(config_path)
+        self.timeout = timeout
+        self._file = None
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        f = open(self.path, "a+b")
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                _try_lock(f)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    f.close()
+                    raise TimeoutError(f"Конфиг заблокирован другим экземпляром PNSc: {self.path}")
+                time.sleep(LOCK_RETRY_S)
+        self._file = f
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            _unlock(self._file)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
@@ -0,0 +1,198 @@
+
+# module_config_merge.py
+#
+# Слияние изменений нескольких экземпляров PNSc, работающих с одним конфигом (общая папка configs).
+# Перед записью снимка под блокировкой (module_config_lock) SaveScheduler проверяет отпечаток
+# файлов конфига. Если после нашей последней загрузки или записи файлы менял кто-то другой,
+# снимок сливается с данными на диске по id записей (вкладки, кнопки, заметки, работы):
+#   - запись, которую мы добавили или изменили, берётся из нашего снимка;
+#   - запись, которую мы удалили, не возвращается;
+#   - остальные записи берутся с диска (так сохраняются чужие добавления, правки и удаления).
+# Локальные изменения берутся из журнала изменений модели (LocalChangeTracker).
+#
+# Проверка на нескольких процессах:
+#   python module_config_merge.py [процессов] [работ_на_процесс]
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import multiprocessing
+
+from module_config_sections import CONFIG_SECTIONS
+from module_config_storage import load_config_file, read_tab_buttons, write_config
+from module_data_model import KIND_SECTIONS
+from module_note_blobs import notes_equal
+
+# Виды объектов модели, которые сливаются по id
+MERGE_KINDS = ("tab", "button", "note", "job")
+
+STRESS_PAUSE_S = 0.05 # Наибольшая пауза между сохранениями в проверке на нескольких процессах
+
+
+class LocalChangeTracker:
+    """
+    Какие объекты изменены в этом экземпляре с последней записи их секции.
+    take(sections) вызывается в потоке Tk при снятии снимка секций и возвращает
+    {вид: {id: "add" | "update" | "remove"}} или None, если изменения неизвестны
+    (модель заменена целиком после загрузки конфига).
+    """
+
+    def __init__(self, change_log):
+        self.change_log = change_log
+        self._revisions = {section: change_log.revision for section in CONFIG_SECTIONS}
+
+    def mark_synced(self):
+        """Данные в памяти совпадают с файлами (конфиг загружен или перечитан)."""
+        for section in self._revisions:
+            self._revisions[section] = self.change_log.revision
+
+    def take(self, sections=None):
+        local = {kind: {} for kind in MERGE_KINDS}
+        for section in (sections if sections is not None else CONFIG_SECTIONS):
+            change_set = self.change_log.changes_since(self._revisions[section])
+            self._revisions[section] = change_set.revision
+            if change_set.full_rebuild:
+                return None
+            for change in change_set:
+                if change.kind in local and KIND_SECTIONS[change.kind] == section:
+                    local[change.kind][change.object_id] = change.op
+        return local
+
+
+def merge_records(ours, theirs, local):
+    """
+    Сливает словари записей по id. local - {id: op} наших изменений или None (неизвестны:
+    наши записи важнее, чужие добавления сохраняются). Порядок: наши записи, затем новые чужие.
+    """
+    merged = {}
+    for object_id, record in ours.items():
+        op = local.get(object_id) if local is not None else "update"
+        if op in ("add", "update"):
+            merged[object_id] = record # Запись добавили или изменили мы
+        elif object_id in theirs:
+            merged[object_id] = theirs[object_id] # Мы запись не меняли: берём версию с диска
+        # Иначе запись удалил другой экземпляр
+    for object_id, record in theirs.items():
+        if object_id not in ours and (local is None or local.get(object_id) != "remove"):
+            merged[object_id] = record # Добавил другой экземпляр (удалённые нами не возвращаются)
+    return merged
+
+
+def _merge_tabs(config_path, ours, theirs, local):
+    tabs = merge_records(ours, theirs, local and local["tab"])
+    for tab_id, tab_data in tabs.items():
+        our_tab = ours.get(tab_id)
+        if our_tab is None or "buttons" not in our_tab:
+            continue # Кнопки вкладки не загружены: её файл на диске не перезаписывается
+        tab_data = tabs[tab_id] = dict(tab_data)
+        theirs_buttons = read_tab_buttons(config_path, tab_id)
+        tab_data["buttons"] = merge_records(our_tab["buttons"], theirs_buttons, local and local["button"])
+    return tabs
+
+
+def merge_config_data(config_path, config_data, local):
+    """
+    Сливает снимок config_data (на месте) с конфигом на диске. Вызывается под блокировкой конфига.
+    Возвращает True, если в результат попали чужие изменения (их нужно применить в памяти).
+    """
+    if not os.path.exists(config_path):
+        return False
+    theirs = load_config_file(config_path)
+    merged_any = False
+    if "tabs" in config_data:
+        tabs = _merge_tabs(config_path, config_data["tabs"], theirs.get("tabs", {}), local)
+        merged_any = merged_any or tabs != config_data["tabs"]
+        config_data["tabs"] = tabs
+    if "notes" in config_data:
+        notes = merge_records(config_data["notes"], theirs.get("notes", {}), local and local["note"])
+        ours = config_data["notes"]
+        # Заметка, текст которой мы загрузили из хранилища текстов, не считается чужим изменением
+        merged_any = merged_any or notes.keys() != ours.keys() or \
+            any(not notes_equal(note, ours[note_id]) for note_id, note in notes.items())
+        config_data["notes"] = notes
+    if "completed_jobs" in config_data:
+        ours = {job.get("job_id"): job for job in config_data["completed_jobs"]}
+        jobs = merge_records(ours, {job.get("job_id"): job for job in theirs.get("completed_jobs", [])},
+                             local and local["job"])
+        merged_any = merged_any or jobs != ours
+        config_data["completed_jobs"] = list(jobs.values())
+    return merged_any
+
+
+# --- ПРОВЕРКА НА НЕСКОЛЬКИХ ПРОЦЕССАХ ---
+
+class _NoTk:
+    """Заменитель окна Tk для SaveScheduler в процессе без интерфейса: запись только через flush()."""
+
+    def after(self, delay_ms, func):
+        return None
+
+    def after_cancel(self, after_id):
+        pass
+
+
+def _stress_worker(config_path, worker, jobs_count):
+    from module_config_cache import config_signature
+    from module_config_storage import SaveScheduler, snapshot_config_data
+    signature = config_signature(config_path)
+    jobs = load_config_file(config_path).get("completed_jobs", [])
+    added = {}
+
+    def collect(sections):
+        return config_path, snapshot_config_data({"completed_jobs": jobs})
+
+    def changes(sections):
+        local = {kind: {} for kind in MERGE_KINDS}
+        local["job"] = dict(added)
+        added.clear()
+        return local
+
+    scheduler = SaveScheduler(_NoTk(), collect, merge_func=merge_config_data, changes_func=changes)
+    scheduler.set_synced(config_path, signature)
+    for n in range(jobs_count):
+        job_id = f"{worker}-{n}"
+        jobs.append({"job_id": job_id, "timestamp": time.time(), "device_name": f"Процесс {worker}"})
+        added[job_id] = "add"
+        scheduler.mark_dirty(("jobs",))
+        error = scheduler.flush()
+        if error:
+            raise error
+        time.sleep(random.uniform(0, STRESS_PAUSE_S)) # Между сохранениями пользователь работает
+    scheduler.shutdown()
+
+
+def run_stress(processes=4, jobs_per_process=25, work_dir=None):
+    """
+    Несколько процессов одновременно добавляют работы в один конфиг, каждый - со своей записью
+    и слиянием. work_dir - папка для конфига (None - временная, удаляется после проверки).
+    Возвращает (число потерянных работ, число работ в конфиге).
+    """
+    temporary = work_dir is None
+    if temporary:
+        work_dir = tempfile.mkdtemp(prefix="pnsc_merge_")
+    try:
+        config_path = os.path.join(work_dir, "shared")
+        write_config(config_path, {"completed_jobs": []})
+        workers = [multiprocessing.Process(target=_stress_worker, args=(config_path, worker, jobs_per_process))
+                   for worker in range(processes)]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+        job_ids = {job["job_id"] for job in load_config_file(config_path).get("completed_jobs", [])}
+    finally:
+        if temporary:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    expected = {f"{worker}-{n}" for worker in range(processes) for n in range(jobs_per_process)}
+    return len(expected - job_ids), len(job_ids)
+
+
+if __name__ == "__main__":
+    process_count = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    jobs_each = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+    lost, total = run_stress(process_count, jobs_each)
+    print(f"Процессов: {process_count}, работ: {total}, потеряно: {lost}")
+    sys.exit(1 if lost else 0)
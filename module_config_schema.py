@@ -0,0 +1,171 @@
+
+# module_config_schema.py
+#
+# Версии схемы конфига и их нормализация. Значения по умолчанию заполняются один раз
+# при загрузке конфига старой версии, после чего конфиг помечается текущей версией
+# (schema_version) и пересохраняется. Виджеты вкладок, кнопок и заметок доверяют данным
+# и сами значения по умолчанию не подставляют.
+#
+# При разреженной записи (CONFIG_SPARSE) поля, равные значениям по умолчанию, в файлы не попадают
+# (strip_defaults) и возвращаются при чтении (hydrate_*), поэтому в памяти конфиг всегда полный.
+
+import copy
+import uuid
+
+CONFIG_SCHEMA_VERSION = 1
+
+# Значения по умолчанию верхнего уровня конфига
+CONFIG_DEFAULTS = {
+    "tabs": {},
+    "notes": {},
+    "device_types": [],
+    "work_types": [],
+    "text_area_content": "",
+    "global_author": "",
+}
+# Кнопок среди значений по умолчанию нет: вкладка без ключа buttons загружается по требованию
+TAB_DEFAULTS = {
+    "name": "",
+    "snap_to_grid": True,
+    "grid_size_x": 10,
+    "grid_size_y": 10,
+}
+# Цвет кнопки зависит от приложения (default_button_color), настройки сетки наследуются от вкладки
+BUTTON_DEFAULTS = {
+    "text": "",
+    "output": "",
+    "x": 10,
+    "y": 10,
+    "width": 100,
+    "height": 30,
+    "text_color": "black",
+    "font_size": 10,
+    "font_family": "Arial",
+    "font_style": "",
+    "new_line": False,
+    "clear_text": False,
+    "icon": "",
+}
+BUTTON_GRID_KEYS = ("snap_to_grid", "grid_size_x", "grid_size_y")
+NOTE_DEFAULTS = {
+    "text": "Новая заметка",
+    "x": 10,
+    "y": 10,
+    "width": 200,
+    "height": 150,
+    "bg_color": "#ffffcc",
+    "text_color": "#000000",
+    "font_size": 10,
+    "font_family": "Arial",
+    "bg_image": "",
+    "note_name": "Заметка",
+    "board": "", # Доска заметки (module_note_boards), "" - основная доска
+}
+
+
+def _fill_defaults(data, defaults):
+    for key, value in defaults.items():
+        if key not in data:
+            data[key] = copy.copy(value)
+
+
+def strip_defaults(data, defaults):
+    """Копия data без полей, равных значениям по умолчанию (с тем же типом: False не заменяет 0)."""
+    return {key: value for key, value in data.items()
+            if key not in defaults or type(value) is not type(defaults[key]) or value != defaults[key]}
+
+
+def button_defaults_for(tab_data, button_color=None):
+    """Значения по умолчанию кнопок вкладки: общие, цвет приложения и настройки сетки вкладки."""
+    defaults = dict(BUTTON_DEFAULTS)
+    if button_color is not None:
+        defaults["color"] = button_color
+    for key in BUTTON_GRID_KEYS:
+        defaults[key] = tab_data.get(key, TAB_DEFAULTS[key])
+    return defaults
+
+
+def hydrate_buttons(buttons, defaults):
+    """Возвращает кнопкам поля, опущенные при разреженной записи (strip_defaults)."""
+    for button_data in buttons.values():
+        _fill_defaults(button_data, defaults)
+    return buttons
+
+
+def hydrate_tabs(tabs):
+    for tab_data in tabs.values():
+        _fill_defaults(tab_data, TAB_DEFAULTS)
+
+
+def normalize_tabs(tabs, button_color):
+    """
+    Заполняет недостающие настройки вкладок и кнопок (кнопка без своих настроек сетки берёт их у вкладки).
+    Кнопки ещё не загруженных вкладок пропускаются: они приводятся к текущей схеме при чтении
+    (migrate_tab_buttons в read_tab_buttons).
+    """
+    for tab_data in tabs.values():
+        _fill_defaults(tab_data, TAB_DEFAULTS)
+        if "buttons" in tab_data:
+            hydrate_buttons(tab_data["buttons"], button_defaults_for(tab_data, button_color))
+
+
+def normalize_notes(notes):
+    for note_data in notes.values():
+        _fill_defaults(note_data, NOTE_DEFAULTS)
+
+
+def normalize_jobs(jobs):
+    """Выдаёт job_id работам из старых конфигов: по нему на работу ссылаются таблица и журнал."""
+    for job in jobs:
+        if "job_id" not in job:
+            job["job_id"] = str(uuid.uuid4())
+
+
+def _migrate_to_v1(config_data, button_color):
+    """Версия 1: все значения по умолчанию заполнены, у каждой работы есть job_id."""
+    _fill_defaults(config_data, CONFIG_DEFAULTS)
+    normalize_tabs(config_data["tabs"], button_color)
+    normalize_notes(config_data["notes"])
+    normalize_jobs(config_data.get("completed_jobs", []))
+
+
+def _migrate_buttons_to_v1(buttons, defaults):
+    """Версия 1 для кнопок вкладки, прочитанных из tabs/<id>.json: все поля заполнены."""
+    hydrate_buttons(buttons, defaults)
+
+
+# Шаги миграции по порядку: (версия, приведение данных конфига, приведение кнопок одной вкладки).
+# Шаг конфига обрабатывает только загруженные вкладки; кнопки остальных вкладок лежат в своих файлах
+# со своей версией схемы и приводятся вторым шагом при чтении (migrate_tab_buttons).
+MIGRATIONS = (
+    (1, _migrate_to_v1, _migrate_buttons_to_v1),
+)
+
+
+def normalize_config(config_data, button_color):
+    """
+    Приводит загруженный конфиг к текущей версии схемы.
+    Возвращает True, если данные изменились и конфиг нужно пересохранить целиком.
+    """
+    version = config_data.get("schema_version", 0)
+    if version >= CONFIG_SCHEMA_VERSION:
+        return False
+    for target_version, migrate, _ in MIGRATIONS:
+        if version < target_version:
+            migrate(config_data, button_color)
+    config_data["schema_version"] = CONFIG_SCHEMA_VERSION
+    return True
+
+
+def migrate_tab_buttons(buttons, version, defaults):
+    """
+    Приводит кнопки вкладки, записанные в файл версией схемы version, к текущей версии.
+    defaults - значения по умолчанию кнопок этой вкладки (button_defaults_for). Возвращает True,
+    если кнопки приводились: файл вкладки будет перезаписан текущей версией при её сохранении.
+    """
+    if version >= CONFIG_SCHEMA_VERSION:
+        return False
+    for target_version, _, migrate_buttons in MIGRATIONS:
+        if version < target_version:
+            migrate_buttons(buttons, defaults)
+    return True
@@ -0,0 +1,80 @@
+
+# module_config_sections.py
+
+import os
+
+# Раскладка конфига по секциям: configs/<имя>/<секция>.json.
+# Каждая секция хранит перечисленные ключи общего словаря конфига.
+CONFIG_SECTIONS = {
+    "tabs": ("tabs", "button_color"),
+    "notes": ("notes", "note_boards", "active_note_board"),
+    "jobs": ("completed_jobs", "job_store"),
+    "types": ("device_types", "work_types"),
+    "text_area": ("text_area_content",),
+    "user": ("global_author",),
+    "meta": ("schema_version",),
+}
+# Манифест конфига: версия раскладки и маркеры журнала по секциям
+MANIFEST_FILE = "manifest.json"
+# 2 - кнопки каждой вкладки лежат в отдельном файле tabs/<id вкладки>.json,
+# а в tabs.json остаются только названия и настройки вкладок;
+# 3 - поля, равные значениям по умолчанию, могут быть опущены (CONFIG_SPARSE)
+SECTIONS_FORMAT_VERSION = 3
+TABS_DIR = "tabs"
+
+
+def is_sectioned_config(config_path):
+    """Конфиг по секциям - это каталог; старый однофайловый конфиг - файл .json."""
+    return not config_path.endswith(".json")
+
+
+def section_file_path(config_path, section):
+    return os.path.join(config_path, f"{section}.json")
+
+
+def manifest_path_for(config_path):
+    return os.path.join(config_path, MANIFEST_FILE)
+
+
+def tabs_dir_for(config_path):
+    return os.path.join(config_path, TABS_DIR)
+
+
+def tab_file_path(config_path, tab_id):
+    return os.path.join(config_path, TABS_DIR, f"{tab_id}.json")
+
+
+def resolve_config_path(config_dir, name):
+    """Путь к конфигу по имени: каталог секций, а если его нет - старый файл <имя>.json."""
+    sectioned_path = os.path.join(config_dir, name)
+    legacy_path = f"{sectioned_path}.json"
+    if os.path.exists(manifest_path_for(sectioned_path)) or not os.path.isfile(legacy_path):
+        return sectioned_path
+    return legacy_path
+
+
+def list_config_names(config_dir):
+    """Имена всех конфигов в папке: каталоги с манифестом и старые файлы .json."""
+    names = set()
+    for entry in os.listdir(config_dir):
+        if entry.startswith("."):
+            continue # Служебные файлы папки: индекс конфигов, резервные копии
+        path = os.path.join(config_dir, entry)
+        if os.path.isdir(path) and os.path.exists(manifest_path_for(path)):
+            names.add(entry)
+        elif entry.endswith(".json") and os.path.isfile(path):
+            names.add(entry[:-len(".json")])
+    return sorted(names)
+
+
+def select_config_sections(config_data, sections):
+    """Оставляет в данных конфига только ключи перечисленных секций (None - все секции)."""
+    if sections is None:
+        return config_data
+    keys = {key for section in sections for key in CONFIG_SECTIONS[section]}
+    return {key: value for key, value in config_data.items() if key in keys}
+
+
+def config_sections_of(config_data):
+    """Секции, данные которых присутствуют в словаре конфига."""
+    return [section for section, keys in CONFIG_SECTIONS.items() if any(key in config_data for key in keys)]
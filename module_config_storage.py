@@ -0,0 +1,483 @@
+
+# module_config_storage.py
+
+import os
+import threading
+from collections import deque
+
+from pnsc_utils import SAVE_COALESCE_MS, CONFIG_SPARSE
+from module_config_codec import dump_config_file, read_config_file
+from module_config_sections import (CONFIG_SECTIONS, SECTIONS_FORMAT_VERSION, is_sectioned_config,
+                                    section_file_path, manifest_path_for, config_sections_of,
+                                    tabs_dir_for, tab_file_path)
+from module_config_journal import (replay_journal, read_journal_records, apply_journal_records,
+                                   journal_record_section, journal_marker_offsets)
+from module_config_schema import (CONFIG_SCHEMA_VERSION, TAB_DEFAULTS, NOTE_DEFAULTS, strip_defaults,
+                                  button_defaults_for, hydrate_buttons, hydrate_tabs, normalize_notes,
+                                  migrate_tab_buttons)
+from module_job_store import job_db_path_for, copy_job_db
+from module_config_lock import ConfigLock
+from module_config_cache import config_signature
+from module_records import Record
+from module_note_blobs import externalize_note_texts, collect_blob_garbage
+
+
+def snapshot_config_data(data):
+    """Делает независимую копию JSON-данных конфига для записи в другом потоке.
+    Скаляры неизменяемы, поэтому копируются только словари и списки; записи превращаются в словари."""
+    if isinstance(data, Record):
+        return {key: snapshot_config_data(value) for key, value in data.items()}
+    if isinstance(data, dict):
+        return {key: snapshot_config_data(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [snapshot_config_data(value) for value in data]
+    return data
+
+
+def write_config_file(path, config_data):
+    """Атомарно записывает файл конфига кодеком из настроек (CONFIG_CODEC, CONFIG_GZIP)."""
+    dump_config_file(path, config_data)
+
+
+def read_manifest(config_path):
+    return read_config_file(manifest_path_for(config_path))
+
+
+def read_tab_buttons(config_path, tab_id, tab_data=None, button_color=None):
+    """
+    Кнопки одной вкладки конфига по секциям (вкладка загружается при первом обращении).
+    Кнопки из файла старой версии схемы приводятся к текущей (migrate_tab_buttons). Значения
+    по умолчанию берутся из файла вкладки, а у файлов, записанных без них, - из настроек вкладки
+    tab_data и цвета кнопок button_color.
+    """
+    path = tab_file_path(config_path, tab_id)
+    if not os.path.exists(path):
+        return {}
+    tab_file = read_config_file(path)
+    buttons = tab_file.get("buttons", {})
+    defaults = tab_file.get("defaults")
+    if defaults is not None:
+        hydrate_buttons(buttons, defaults)
+    else:
+        defaults = button_defaults_for(tab_data or {}, button_color)
+    migrate_tab_buttons(buttons, tab_file.get("schema_version", 0), defaults)
+    return buttons
+
+
+def _write_tab_files(config_path, tabs, button_color=None):
+    """
+    Кнопки загруженных вкладок пишутся в отдельные файлы, файлы удалённых вкладок удаляются.
+    Вкладки без кнопок в данных не загружались - их файлы не меняются.
+    Кнопки в памяти всегда приведены к текущей схеме, поэтому файл помечается CONFIG_SCHEMA_VERSION.
+    Значения по умолчанию кнопок записываются в файл вкладки (defaults): файл читается и приводится
+    к новой схеме без tabs.json, даже если сетка вкладки изменилась позже. При CONFIG_SPARSE поля кнопок,
+    равные этим значениям, опускаются.
+    Возвращает данные для tabs.json: названия и настройки вкладок без кнопок.
+    """
+    tabs_dir = tabs_dir_for(config_path)
+    os.makedirs(tabs_dir, exist_ok=True)
+    index = {}
+    for tab_id, tab_data in tabs.items():
+        index[tab_id] = {key: value for key, value in tab_data.items() if key != "buttons"}
+        if "buttons" in tab_data:
+            defaults = button_defaults_for(tab_data, button_color)
+            buttons = tab_data["buttons"]
+            if CONFIG_SPARSE:
+                buttons = {button_id: strip_defaults(button_data, defaults) for button_id, button_data in buttons.items()}
+            tab_file = {"schema_version": CONFIG_SCHEMA_VERSION, "defaults": defaults, "buttons": buttons}
+            write_config_file(tab_file_path(config_path, tab_id), tab_file)
+        if CONFIG_SPARSE:
+            index[tab_id] = strip_defaults(index[tab_id], TAB_DEFAULTS)
+    for file_name in os.listdir(tabs_dir):
+        tab_id, ext = os.path.splitext(file_name)
+        if ext == ".json" and tab_id not in index:
+            os.remove(os.path.join(tabs_dir, file_name))
+    return index
+
+
+def write_config(path, config_data, journal_position=None):
+    """
+    Записывает снимок конфига. Для конфига по секциям пишутся только секции,
+    данные которых есть в config_data, затем манифест с маркерами журнала.
+    Возвращает маркер журнала {"id", "offsets"} или None.
+    """
+    if not is_sectioned_config(path):
+        marker = None
+        if journal_position:
+            marker = {"id": journal_position["id"],
+                      "offsets": {section: journal_position["offset"] for section in CONFIG_SECTIONS}}
+            config_data["journal"] = marker
+        write_config_file(path, config_data)
+        return marker
+
+    os.makedirs(path, exist_ok=True)
+    try:
+        manifest = read_manifest(path)
+    except (OSError, ValueError):
+        manifest = {}
+    sections = config_sections_of(config_data)
+    referenced_blobs = None
+    for section in sections:
+        section_data = {key: config_data[key] for key in CONFIG_SECTIONS[section] if key in config_data}
+        if section == "tabs" and "tabs" in section_data:
+            section_data["tabs"] = _write_tab_files(path, section_data["tabs"], section_data.get("button_color"))
+        elif section == "notes" and "notes" in section_data:
+            # Большие тексты - в отдельные файлы blobs/<хэш>.txt, в notes.json - ссылки и превью
+            section_data["notes"], referenced_blobs = externalize_note_texts(path, section_data["notes"])
+            if CONFIG_SPARSE:
+                section_data["notes"] = {note_id: strip_defaults(note_data, NOTE_DEFAULTS)
+                                         for note_id, note_data in section_data["notes"].items()}
+        write_config_file(section_file_path(path, section), section_data)
+
+    marker = None
+    if journal_position:
+        # Маркеры незаписанных секций остаются прежними: их записи журнала ещё не учтены
+        old_marker = manifest.get("journal")
+        offsets = {}
+        if old_marker and old_marker.get("id") == journal_position["id"]:
+            offsets = journal_marker_offsets(old_marker)
+        for section in CONFIG_SECTIONS:
+            offsets.setdefault(section, 0)
+        for section in sections:
+            offsets[section] = journal_position["offset"]
+        marker = {"id": journal_position["id"], "offsets": offsets}
+    write_config_file(manifest_path_for(path), {"format": SECTIONS_FORMAT_VERSION, "journal": marker})
+    if referenced_blobs is not None:
+        # Секция notes записана целиком: тексты, на которые она не ссылается, больше не нужны
+        collect_blob_garbage(path, referenced_blobs)
+    return marker
+
+
+def load_config_file(path):
+    """
+    Читает снимок конфига (по секциям или однофайловый) и накатывает поверх него журнал изменений.
+    Кнопки вкладок конфига по секциям не читаются (см. read_tab_buttons), кроме вкладок,
+    к которым относятся ещё не учтённые в снимке записи журнала.
+    """
+    if not is_sectioned_config(path):
+        config_data = read_config_file(path)
+        marker = config_data.pop("journal", None)
+        return replay_journal(config_data, path, marker)
+    manifest = read_manifest(path)
+    config_data = {}
+    for section in CONFIG_SECTIONS:
+        section_path = section_file_path(path, section)
+        if os.path.exists(section_path):
+            config_data.update(read_config_file(section_path))
+    # Поля, опущенные при разреженной записи, возвращаются сразу (кнопки - в read_tab_buttons)
+    hydrate_tabs(config_data.get("tabs", {}))
+    normalize_notes(config_data.get("notes", {}))
+    records = read_journal_records(path, manifest.get("journal"))
+    tabs = config_data.get("tabs", {})
+    for record in records:
+        tab = tabs.get(record.get("tab_id"))
+        if tab is not None and "buttons" not in tab:
+            tab["buttons"] = read_tab_buttons(path, record["tab_id"])
+    return apply_journal_records(config_data, records)
+
+
+def import_legacy_config(legacy_path):
+    """
+    Переводит однофайловый конфиг configs/<имя>.json в каталог configs/<имя>/.
+    Сам файл не трогается; база работ SQLite (если есть) копируется в каталог.
+    Секции записывает вызывающий код полным сохранением. Возвращает путь к каталогу.
+    """
+    config_path = os.path.splitext(legacy_path)[0]
+    os.makedirs(config_path, exist_ok=True)
+    legacy_db_path = job_db_path_for(legacy_path)
+    if os.path.exists(legacy_db_path) and not os.path.exists(job_db_path_for(config_path)):
+        copy_job_db(legacy_db_path, job_db_path_for(config_path))
+    return config_path
+
+
+class SaveScheduler:
+    """
+    Планировщик сохранения конфига.
+
+    mark_dirty(sections) лишь помечает секции конфига изменёнными (None - все секции).
+    Не чаще одного раза за delay_ms в потоке Tk собирается снимок изменённых секций
+    (collect_func(sections) возвращает (path, data) или None), а сериализация и запись
+    на диск (write_func) выполняются в рабочем потоке.
+
+    add_record() копит мелкие изменения для журнала (journal_func возвращает текущий
+    ConfigJournal): вместо снимка в журнал дописываются только они.
+    add_pending() откладывает дорогое снятие данных (текст заметки) до самой записи:
+    функции вызываются в потоке Tk перед снимком и сами добавляют записи журнала.
+    После записи снимка журнал уплотняется до самого старого маркера секций.
+    on_written(merged, written) вызывается в потоке Tk, когда всё накопленное записано на диск;
+    written - {путь конфига: отпечаток файлов}, снятый сразу после своей записи ещё под блокировкой
+    (по нему наблюдатель за файлами отличает свои записи от чужих, сделанных после них).
+
+    Конфиг могут одновременно открывать несколько экземпляров PNSc (общая папка конфигов),
+    поэтому запись идёт под блокировкой ConfigLock. Если файлы конфига изменились после
+    set_synced() или нашей прошлой записи, снимок перед записью сливается с диском:
+    merge_func(path, data, local) с локальными изменениями local = changes_func(sections)
+    (см. module_config_merge). merged=True в on_written - в записанный конфиг попали чужие изменения.
+    После каждой записи рабочий поток вызывает index_func(path, config_data, records)
+    (сведения о конфиге для окна выбора, см. module_config_index).
+    """
+
+    POLL_INTERVAL_MS = 50
+
+    def __init__(self, master, collect_func, write_func=write_config, delay_ms=SAVE_COALESCE_MS, on_error=None, journal_func=None,
+                 on_written=None, merge_func=None, changes_func=None, index_func=None):
+        self.master = master
+        self.collect_func = collect_func
+        self.write_func = write_func
+        self.delay_ms = delay_ms
+        self.on_error = on_error # Вызывается в потоке Tk при ошибке фоновой записи
+        self.journal_func = journal_func
+        self.on_written = on_written
+        self.merge_func = merge_func
+        self.changes_func = changes_func
+        self.index_func = index_func
+
+        self._dirty = False
+        self._dirty_sections = set() # None - изменены все секции
+        self.generation = 0 # Растёт с каждым изменением, переданным на запись (копии по расписанию сверяют его)
+        self._records = {} # Ключ объединения -> запись журнала (в порядке первого добавления)
+        self._pending = {} # Ключ -> функция, снимающая отложенное изменение (add_pending)
+        self._after_id = None
+        self._poll_id = None
+        self._closed = False
+
+        # Общее состояние с рабочим потоком (под self._cond)
+        self._cond = threading.Condition()
+        self._tasks = deque() # ("snapshot", path, data, journal) или ("records", journal, records), по порядку
+        self._busy = False # Рабочий поток сейчас выполняет задачу
+        self._stopping = False
+        self._compaction_requested = False
+        self._errors = []
+        self._synced = {} # Путь конфига -> отпечаток файлов после нашей последней загрузки или записи
+        self._merged = False # В записанный снимок попали чужие изменения
+        self._written = {} # Путь конфига -> отпечаток файлов сразу после нашей записи (для on_written)
+
+        self._worker = threading.Thread(target=self._worker_loop, name="pnsc-config-writer", daemon=True)
+        self._worker.start()
+
+    def mark_dirty(self, sections=None):
+        """Помечает секции конфига изменёнными и планирует отложенную запись снимка."""
+        if sections is None:
+            self._dirty_sections = None
+        elif self._dirty_sections is not None:
+            self._dirty_sections.update(sections)
+        self._dirty = True
+        self.generation += 1
+        self._schedule()
+
+    def add_record(self, key, record):
+        """Добавляет запись журнала; запись с тем же ключом заменяет предыдущую."""
+        self._records[key] = record
+        self.generation += 1
+        self._schedule()
+
+    def add_pending(self, key, func):
+        """Планирует запись, но данные снимает func() только перед ней (повторный вызов с тем же ключом ничего не добавляет)."""
+        self._pending[key] = func
+        self.generation += 1
+        self._schedule()
+
+    def run_pending(self):
+        """Снимает все отложенные изменения сейчас (перед чтением данных в обход записи, например для копии)."""
+        pending, self._pending = self._pending, {}
+        for func in pending.values():
+            func()
+
+    def flush(self):
+        """Синхронно дописывает все накопленные изменения. Возвращает ошибку записи или None."""
+        self._cancel_timer()
+        self._dispatch()
+        with self._cond:
+            while self._tasks or self._busy:
+                self._cond.wait()
+            self._compaction_requested = False
+        error = self._take_error()
+        merged = self._take_merged()
+        written = self._take_written()
+        if not error and self.on_written:
+            self.on_written(merged, written)
+        return error
+
+    def set_synced(self, path, signature):
+        """Данные в памяти соответствуют файлам конфига с отпечатком signature (снятым до их чтения)."""
+        with self._cond:
+            self._synced[path] = signature
+
+    def is_idle(self):
+        """Нет ни отложенных изменений, ни незаконченной фоновой записи."""
+        if self._dirty or self._records or self._pending:
+            return False
+        with self._cond:
+            return not self._tasks and not self._busy
+
+    def shutdown(self):
+        """Гарантированно сбрасывает изменения на диск и останавливает рабочий поток."""
+        error = self.flush()
+        self._closed = True
+        if self._poll_id is not None:
+            try:
+                self.master.after_cancel(self._poll_id)
+            except Exception:
+                pass
+            self._poll_id = None
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._worker.join()
+        return error
+
+    # --- Внутренняя логика ---
+
+    def _schedule(self):
+        if self._after_id is None and not self._closed:
+            self._after_id = self.master.after(self.delay_ms, self._on_timer)
+
+    def _cancel_timer(self):
+        if self._after_id is not None:
+            try:
+                self.master.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _on_timer(self):
+        self._after_id = None
+        self._dispatch()
+        if self._poll_id is None:
+            self._poll_id = self.master.after(self.POLL_INTERVAL_MS, self._poll_result)
+
+    def _dispatch(self):
+        """Снимает снимок (или забирает записи журнала) в потоке Tk и передаёт рабочему потоку."""
+        self.run_pending()
+        journal = self.journal_func() if self.journal_func else None
+        if self._dirty and self._dirty_sections == set():
+            self._dirty = False # Ни одна секция не изменилась: достаточно дописать журнал
+        if self._dirty:
+            sections = self._dirty_sections
+            if sections is not None:
+                # Изменения, ещё не попавшие в журнал, войдут в снимок своих секций
+                sections = sections | {journal_record_section(record) for record in self._records.values()}
+                sections.discard(None)
+            self._dirty = False
+            self._dirty_sections = set()
+            self._records = {}
+            snapshot = self.collect_func(sections)
+            if snapshot is None:
+                return
+            path, config_data = snapshot
+            local = self.changes_func(sections) if self.changes_func else None
+            with self._cond:
+                self._tasks.append(("snapshot", path, config_data, journal, local))
+                self._cond.notify_all()
+        elif self._records:
+            records = list(self._records.values())
+            self._records = {}
+            if journal is None:
+                return
+            with self._cond:
+                self._tasks.append(("records", journal, records))
+                self._cond.notify_all()
+
+    def _poll_result(self):
+        """Ждёт окончания фоновой записи, чтобы сообщить об ошибке в потоке Tk."""
+        self._poll_id = None
+        with self._cond:
+            in_progress = bool(self._tasks) or self._busy
+            compaction_requested = self._compaction_requested
+            self._compaction_requested = False
+        if compaction_requested:
+            # Журнал разросся: сворачиваем его в новый полный снимок всех секций
+            self.mark_dirty()
+        if in_progress:
+            self._poll_id = self.master.after(self.POLL_INTERVAL_MS, self._poll_result)
+            return
+        error = self._take_error()
+        merged = self._take_merged()
+        written = self._take_written()
+        if error and self.on_error:
+            self.on_error(error)
+        elif not error and self.on_written:
+            self.on_written(merged, written)
+
+    def _take_error(self):
+        with self._cond:
+            if not self._errors:
+                return None
+            error = self._errors[-1]
+            self._errors = []
+            return error
+
+    def _take_merged(self):
+        with self._cond:
+            merged, self._merged = self._merged, False
+            return merged
+
+    def _take_written(self):
+        with self._cond:
+            written, self._written = self._written, {}
+            return written
+
+    def _is_synced(self, path):
+        """Файлы конфига не менялись другими экземплярами с нашей последней записи."""
+        with self._cond:
+            known = self._synced.get(path)
+        return known is not None and known == config_signature(path)
+
+    def _mark_synced(self, path, was_synced):
+        """Запоминает отпечаток файлов сразу после своей записи (вызывается под блокировкой конфига)."""
+        signature = config_signature(path)
+        with self._cond:
+            self._written[path] = signature
+            if was_synced:
+                self._synced[path] = signature
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._tasks and not self._stopping:
+                    self._cond.wait()
+                if not self._tasks:
+                    return
+                task = self._tasks.popleft()
+                self._busy = True
+            try:
+                self._run_task(task)
+            except Exception as e:
+                with self._cond:
+                    self._errors.append(e)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _run_task(self, task):
+        if task[0] == "snapshot":
+            _, path, config_data, journal, local = task
+            with ConfigLock(path):
+                merged = False
+                if self.merge_func and not self._is_synced(path):
+                    # Другой экземпляр PNSc записал конфиг: сливаем наш снимок с его изменениями
+                    merged = self.merge_func(path, config_data, local)
+                # Позиция снимается в рабочем потоке: все ранее поставленные записи уже в журнале
+                marker = self.write_func(path, config_data, journal.position() if journal else None)
+                if marker and journal and marker["id"] == journal.journal_id:
+                    journal.compact(min(marker["offsets"].values()))
+                # Пока чужие изменения не применены в памяти, следующий снимок тоже сливается с диском
+                self._mark_synced(path, not merged)
+            if merged:
+                with self._cond:
+                    self._merged = True
+            if self.index_func:
+                self.index_func(path, config_data)
+        else:
+            _, journal, records = task
+            with ConfigLock(journal.config_path):
+                # Чужие изменения при дописывании журнала не сливаются: их учтёт следующий снимок
+                was_synced = self._is_synced(journal.config_path)
+                journal.append(records)
+                self._mark_synced(journal.config_path, was_synced)
+            if self.index_func:
+                self.index_func(journal.config_path, records=records)
+            if journal.needs_compaction():
+                with self._cond:
+                    self._compaction_requested = True
@@ -0,0 +1,280 @@
+
+# module_config_watcher.py
+#
+# Наблюдение за файлами конфига и горячая перезагрузка изменений, сделанных вне приложения
+# (правка вручную, синхронизация папки). Если установлен watchdog, о записи в файлы сообщает
+# система (inotify, ReadDirectoryChangesW и т. п.), иначе отпечатки файлов опрашиваются
+# раз в CONFIG_WATCH_INTERVAL_MS. Изменённый конфиг сравнивается с данными в памяти,
+# и в интерфейс применяются только изменившиеся вкладки, кнопки, заметки и работы.
+
+import os
+import threading
+
+from pnsc_utils import CONFIG_WATCH_INTERVAL_MS
+from module_config_cache import config_signature
+from module_config_schema import normalize_config
+from module_config_storage import load_config_file, read_tab_buttons
+from module_records import Record
+from module_note_blobs import notes_equal
+
+# --- НЕОБЯЗАТЕЛЬНЫЕ СИСТЕМНЫЕ УВЕДОМЛЕНИЯ (watchdog) ---
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    HAS_WATCHDOG = True
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+    HAS_WATCHDOG = False
+
+
+def file_signature(path):
+    """Отпечаток одного файла: (mtime_ns, размер) или None, если файла нет."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class _ChangeFlag(FileSystemEventHandler):
+    """Обработчик watchdog: из потока наблюдателя только поднимает флаг для потока Tk."""
+
+    def __init__(self, event):
+        super().__init__()
+        self.event = event
+
+    def on_any_event(self, event):
+        self.event.set()
+
+
+class ConfigWatcher:
+    """
+    Следит за файлами и вызывает callback в потоке Tk, когда их отпечаток меняется.
+
+    watch(key, path_func, signature_func, callback) - path_func() возвращает текущий путь
+    (конфиг может смениться), signature_func(path) - его отпечаток. Смена пути изменением
+    не считается. accept(key, path, signature) принимает отпечаток, снятый сразу после собственной
+    записи, как известный: чужая запись, сделанная после неё, отпечаток изменит и будет замечена.
+    Пока busy_func() истинна (идёт своя запись), проверки откладываются.
+    """
+
+    EVENT_POLL_MS = 250 # Как часто поток Tk проверяет флаг уведомлений watchdog
+
+    def __init__(self, master, busy_func=None, interval_ms=CONFIG_WATCH_INTERVAL_MS):
+        self.master = master
+        self.busy_func = busy_func
+        self.interval_ms = interval_ms
+        self._targets = {} # key -> {"path_func", "signature_func", "callback", "path", "signature"}
+        self._after_id = None
+        self._changed = threading.Event()
+        self._observer = None
+        self._watched_dirs = set()
+        if HAS_WATCHDOG:
+            try:
+                self._observer = Observer()
+                self._observer.daemon = True
+                self._observer.start()
+            except Exception as e:
+                print(f"Системные уведомления о файлах недоступны, используется опрос: {e}")
+                self._observer = None
+
+    def watch(self, key, path_func, signature_func, callback):
+        target = {"path_func": path_func, "signature_func": signature_func, "callback": callback,
+                  "path": None, "signature": None}
+        self._targets[key] = target
+        self._sync_target(target)
+        self._schedule()
+
+    def accept(self, key, path, signature):
+        target = self._targets.get(key)
+        if target is not None and target["path"] == path:
+            target["signature"] = signature
+
+    def stop(self):
+        if self._after_id is not None:
+            try:
+                self.master.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+
+    # --- Внутренняя логика ---
+
+    def _sync_target(self, target):
+        path = target["path_func"]()
+        target["path"] = path
+        target["signature"] = target["signature_func"](path) if path else None
+        if path:
+            self._observe_dir(path)
+
+    def _observe_dir(self, path):
+        """Подписывается на уведомления о каталоге файла (или самого каталога конфига)."""
+        if self._observer is None:
+            return
+        directory = os.path.abspath(path if os.path.isdir(path) else os.path.dirname(path) or ".")
+        if directory in self._watched_dirs or not os.path.isdir(directory):
+            return
+        self._observer.schedule(_ChangeFlag(self._changed), directory, recursive=os.path.isdir(path))
+        self._watched_dirs.add(directory)
+        self._changed.set() # Записи до подписки не должны потеряться
+
+    def _schedule(self):
+        if self._after_id is None:
+            delay = self.EVENT_POLL_MS if self._observer is not None else self.interval_ms
+            self._after_id = self.master.after(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._after_id = None
+        try:
+            self._check()
+        finally:
+            self._schedule()
+
+    def _check(self):
+        for target in self._targets.values():
+            if target["path_func"]() != target["path"]:
+                self._sync_target(target) # Открыт другой конфиг - это не изменение файлов
+        if self._observer is not None and not self._changed.is_set():
+            return
+        if self.busy_func and self.busy_func():
+            return # Своя запись ещё идёт: файлы проверяются после неё
+        self._changed.clear()
+        for target in list(self._targets.values()):
+            path = target["path"]
+            if not path:
+                continue
+            signature = target["signature_func"](path)
+            if signature == target["signature"]:
+                continue
+            target["signature"] = signature
+            try:
+                target["callback"]()
+            except Exception as e:
+                print(f"Ошибка применения изменений файла {path}: {e}")
+
+
+def _plain(value):
+    return value.to_dict() if isinstance(value, Record) else value
+
+
+def _update_fields(target, new_data, skip=()):
+    """Записывает в target только отличающиеся поля new_data и удаляет лишние. Возвращает True при изменениях."""
+    changed = False
+    for key in [key for key in target.keys() if key not in new_data and key not in skip]:
+        del target[key]
+        changed = True
+    for key, value in new_data.items():
+        if key not in skip and _plain(target.get(key)) != value:
+            target[key] = value
+            changed = True
+    return changed
+
+
+class ConfigReloadManager:
+    """Применяет к открытому конфигу изменения его файлов, сделанные вне приложения."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def start_config_watch(self):
+        """Запускает наблюдение за текущим конфигом и файлом плавающего виджета."""
+        from floating_widget import FloatingWidget
+        app = self.app
+        app.config_watcher = ConfigWatcher(app.master, busy_func=lambda: not app.save_scheduler.is_idle())
+        app.config_watcher.watch("config", lambda: app.current_config_path, config_signature,
+                                 self.reload_config_changes)
+        app.config_watcher.watch("floating_widget", lambda: FloatingWidget.CONFIG_FILE, file_signature,
+                                 self._reload_floating_widget_state)
+
+    def reload_config_changes(self):
+        """Перечитывает конфиг с диска и применяет только отличия от данных в памяти."""
+        app = self.app
+        signature = config_signature(app.current_config_path)
+        config_data = load_config_file(app.current_config_path)
+        normalize_config(config_data, app.default_button_color)
+
+        tabs_changed, current_tab_changed = self._reload_tabs(config_data.get("tabs", {}))
+        app.reload_note_boards(config_data)
+        self._reload_notes(config_data.get("notes", {}))
+        jobs_changed = app.job_store.sync_jobs(config_data.get("completed_jobs", []))
+        # Теперь память совпадает с файлами: следующая запись не сливается с диском без нужды
+        app.local_changes.mark_synced()
+        app.save_scheduler.set_synced(app.current_config_path, signature)
+
+        if tabs_changed:
+            if current_tab_changed or app.selected_tab_id not in app.tabs:
+                app.update_tab_display()
+            if app.floating_widget_instance and app.floating_widget_instance.winfo_exists():
+                app.floating_widget_instance.update_widget_buttons()
+        if jobs_changed:
+            app.update_work_table_display()
+
+    def _reload_tabs(self, new_tabs):
+        """
+        Применяет изменения вкладок и кнопок. Кнопки сравниваются только у загруженных вкладок:
+        остальные и так прочитаются с диска при открытии. Возвращает (число изменённых вкладок,
+        изменилась ли открытая вкладка или список вкладок).
+        """
+        app = self.app
+        changed, layout_changed = 0, False
+        for tab_id in [tab_id for tab_id in app.tabs if tab_id not in new_tabs]:
+            del app.tabs[tab_id]
+            changed, layout_changed = changed + 1, True
+        for tab_id, new_tab in new_tabs.items():
+            tab = app.tabs.get(tab_id)
+            if tab is None:
+                app.tabs[tab_id] = new_tab
+                changed, layout_changed = changed + 1, True
+                continue
+            tab_changed = _update_fields(tab, new_tab, skip=("buttons",))
+            layout_changed = layout_changed or tab_changed
+            if tab.loaded:
+                new_buttons = new_tab.get("buttons")
+                if new_buttons is None:
+                    new_buttons = read_tab_buttons(app.current_config_path, tab_id, new_tab, app.default_button_color)
+                buttons_changed = self._reload_buttons(tab["buttons"], new_buttons)
+                if buttons_changed and tab_id == app.selected_tab_id:
+                    layout_changed = True
+                tab_changed = tab_changed or buttons_changed
+            changed += tab_changed
+        return changed, layout_changed
+
+    @staticmethod
+    def _reload_buttons(buttons, new_buttons):
+        changed = False
+        for button_id in [button_id for button_id in buttons if button_id not in new_buttons]:
+            del buttons[button_id]
+            changed = True
+        for button_id, new_button in new_buttons.items():
+            button = buttons.get(button_id)
+            if button is None:
+                buttons[button_id] = new_button
+                changed = True
+            else:
+                changed = _update_fields(button, new_button) or changed
+        return changed
+
+    def _reload_notes(self, new_notes):
+        """Пересоздаёт только добавленные, удалённые и изменённые заметки."""
+        app = self.app
+        changed = 0
+        # Сравниваются записи всех досок, а не только заметки активной доски
+        for note_id in [note_id for note_id in app.note_records if note_id not in new_notes]:
+            app.reload_note(note_id, None)
+            changed += 1
+        for note_id, note_data in new_notes.items():
+            record = app.note_records.get(note_id)
+            # Загруженный в заметку большой текст равен ссылке на него в файле
+            if record is None or not notes_equal(record.to_dict(), note_data):
+                app.reload_note(note_id, note_data)
+                changed += 1
+        return changed
+
+    def _reload_floating_widget_state(self):
+        widget = self.app.floating_widget_instance
+        if widget and widget.winfo_exists():
+            widget.reload_state()
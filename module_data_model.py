@@ -0,0 +1,326 @@
+
+# module_data_model.py
+#
+# Модель данных с отслеживанием изменений на уровне полей.
+# Вкладки остаются словарями, кнопки, заметки и таймеры - компактными записями module_records
+# с тем же интерфейсом (data['x'] = ... работает как раньше), но каждое изменение
+# попадает в общий журнал ChangeLog. Представления запрашивают у журнала ChangeSet -
+# изменения с момента своей последней синхронизации - и применяют только их.
+
+from collections import namedtuple, OrderedDict
+
+from module_config_sections import CONFIG_SECTIONS
+from module_records import ButtonRecord, TimerRecord
+
+_MISSING = object()
+
+# Одно изменение объекта модели: op - "add", "update" или "remove",
+# fields - изменённые поля (для "update"), parent_id - id вкладки для кнопки
+Change = namedtuple("Change", ["kind", "object_id", "parent_id", "op", "fields"])
+
+# Секция конфига, в которой хранится объект каждого вида (таймеры в конфиг не входят).
+# Изменения работ отмечают сами хранилища работ (module_job_store), вид "job".
+KIND_SECTIONS = {"tab": "tabs", "button": "tabs", "note": "notes", "job": "jobs", "timer": None}
+
+
+class ChangeSet:
+    """Изменения модели с ревизии since до revision."""
+
+    def __init__(self, revision, changes=(), full_rebuild=False):
+        self.revision = revision
+        self.changes = list(changes)
+        self.full_rebuild = full_rebuild # Изменения неизвестны (загружен другой конфиг): нужно перестроить всё
+
+    def __bool__(self):
+        return self.full_rebuild or bool(self.changes)
+
+    def __iter__(self):
+        return iter(self.changes)
+
+    def of_kind(self, kind):
+        return [change for change in self.changes if change.kind == kind]
+
+    def sections(self):
+        """Секции конфига, затронутые изменениями (None - все секции)."""
+        if self.full_rebuild:
+            return None
+        sections = {KIND_SECTIONS[change.kind] for change in self.changes}
+        sections.discard(None)
+        return [section for section in CONFIG_SECTIONS if section in sections]
+
+
+class ChangeLog:
+    """
+    Журнал изменений модели. Для каждого объекта хранится ревизия последнего изменения,
+    ревизия добавления, признак удаления и ревизии изменённых полей, поэтому
+    несколько потребителей могут независимо забирать изменения со своей ревизии.
+    """
+
+    def __init__(self):
+        self.revision = 0
+        self._rebuild_revision = 0 # Потребители с более старой ревизией перестраиваются целиком
+        self._entries = {} # (kind, object_id) -> запись
+
+    def record(self, kind, object_id, op, fields=(), parent_id=None):
+        self.revision += 1
+        revision = self.revision
+        key = (kind, object_id)
+        entry = self._entries.get(key)
+        if entry is None or op == "add":
+            entry = {"parent_id": parent_id, "added": revision if op == "add" else 0, "removed": False, "fields": {}}
+            self._entries[key] = entry
+        entry["revision"] = revision
+        if op == "remove":
+            entry["removed"] = True
+        else:
+            entry["removed"] = False
+            for field in fields:
+                entry["fields"][field] = revision
+
+    def invalidate(self):
+        """Вся модель заменена (загрузка или создание конфига): изменения до этого момента не отслеживаются."""
+        self.revision += 1
+        self._rebuild_revision = self.revision
+        self._entries = {}
+
+    def changes_since(self, since):
+        """ChangeSet с изменениями после ревизии since (None - потребитель ещё не синхронизирован)."""
+        if since is None or since < self._rebuild_revision:
+            return ChangeSet(self.revision, full_rebuild=True)
+        changes = []
+        for (kind, object_id), entry in self._entries.items():
+            if entry["revision"] <= since:
+                continue
+            if entry["removed"]:
+                if entry["added"] > since:
+                    continue # Объект появился и исчез после since - потребитель его не видел
+                changes.append(Change(kind, object_id, entry["parent_id"], "remove", ()))
+            elif entry["added"] > since:
+                changes.append(Change(kind, object_id, entry["parent_id"], "add", ()))
+            else:
+                fields = tuple(field for field, revision in entry["fields"].items() if revision > since)
+                changes.append(Change(kind, object_id, entry["parent_id"], "update", fields))
+        return ChangeSet(self.revision, changes)
+
+
+class TrackedModel(dict):
+    """Словарь-объект модели: записи в поля попадают в ChangeLog."""
+
+    KIND = None
+    CHILDREN = {} # Поле -> класс вложенной коллекции (например, кнопки вкладки)
+
+    # Значения по умолчанию на уровне класса нужны, пока объект восстанавливается (pickle)
+    object_id = None
+    parent_id = None
+    _log = None
+
+    def __init__(self, data=(), object_id=None, parent_id=None, log=None):
+        super().__init__()
+        self.object_id = object_id
+        self.parent_id = parent_id
+        self._log = log
+        for key, value in dict(data).items():
+            dict.__setitem__(self, key, self._wrap_field(key, value))
+
+    def _wrap_field(self, key, value):
+        child_class = self.CHILDREN.get(key)
+        if child_class is not None and not (isinstance(value, child_class) and value._log is self._log
+                                            and value.parent_id == self.object_id):
+            return child_class(value, parent_id=self.object_id, log=self._log)
+        return value
+
+    def _changed(self, fields):
+        if self._log is not None:
+            self._log.record(self.KIND, self.object_id, "update", fields, self.parent_id)
+
+    def __setitem__(self, key, value):
+        value = self._wrap_field(key, value)
+        old = self.get(key, _MISSING)
+        dict.__setitem__(self, key, value)
+        if old is _MISSING or old is not value and old != value:
+            self._changed((key,))
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._changed((key,))
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def pop(self, key, *default):
+        had_key = key in self
+        value = dict.pop(self, key, *default)
+        if had_key:
+            self._changed((key,))
+        return value
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        self._changed((key,))
+        return key, value
+
+    def clear(self):
+        fields = tuple(self)
+        dict.clear(self)
+        if fields:
+            self._changed(fields)
+
+
+class ModelMap(dict):
+    """Коллекция объектов модели по id: добавление и удаление попадают в ChangeLog."""
+
+    MODEL = TrackedModel
+
+    parent_id = None
+    _log = None
+
+    def __init__(self, data=(), parent_id=None, log=None):
+        super().__init__()
+        self.parent_id = parent_id
+        self._log = log
+        for object_id, value in dict(data).items():
+            dict.__setitem__(self, object_id, self._wrap(object_id, value))
+
+    def _wrap(self, object_id, value):
+        if (isinstance(value, self.MODEL) and value._log is self._log
+                and value.object_id == object_id and value.parent_id == self.parent_id):
+            return value
+        return self.MODEL(value, object_id=object_id, parent_id=self.parent_id, log=self._log)
+
+    def _record(self, object_id, op):
+        if self._log is not None:
+            self._log.record(self.MODEL.KIND, object_id, op, parent_id=self.parent_id)
+
+    def __setitem__(self, object_id, value):
+        dict.__setitem__(self, object_id, self._wrap(object_id, value))
+        self._record(object_id, "add")
+
+    def __delitem__(self, object_id):
+        dict.__delitem__(self, object_id)
+        self._record(object_id, "remove")
+
+    def update(self, *args, **kwargs):
+        for object_id, value in dict(*args, **kwargs).items():
+            self[object_id] = value
+
+    def setdefault(self, object_id, default=None):
+        if object_id not in self:
+            self[object_id] = default if default is not None else {}
+        return dict.__getitem__(self, object_id)
+
+    def pop(self, object_id, *default):
+        had_key = object_id in self
+        value = dict.pop(self, object_id, *default)
+        if had_key:
+            self._record(object_id, "remove")
+        return value
+
+    def popitem(self):
+        object_id, value = dict.popitem(self)
+        self._record(object_id, "remove")
+        return object_id, value
+
+    def clear(self):
+        object_ids = list(self)
+        dict.clear(self)
+        for object_id in object_ids:
+            self._record(object_id, "remove")
+
+
+# --- Объекты модели ---
+
+class ButtonMap(ModelMap):
+    MODEL = ButtonRecord
+
+
+class Tab(TrackedModel):
+    """
+    Вкладка. Кнопки вкладки, которых нет в данных, загружаются при первом обращении
+    tab['buttons'] через loader и могут быть снова выгружены (unload).
+    """
+
+    KIND = "tab"
+    CHILDREN = {"buttons": ButtonMap}
+    loader = None
+
+    def __missing__(self, key):
+        if key != "buttons" or self.loader is None:
+            raise KeyError(key)
+        buttons = self._wrap_field(key, self.loader(self.object_id))
+        dict.__setitem__(self, key, buttons)
+        return buttons
+
+    @property
+    def loaded(self):
+        return dict.__contains__(self, "buttons")
+
+    def unload(self):
+        """Освобождает кнопки вкладки. Они должны быть записаны на диск: изменением это не считается."""
+        if self.loader is not None:
+            dict.pop(self, "buttons", None)
+
+
+class TabMap(ModelMap):
+    """Вкладки по id. loader(tab_id) читает кнопки вкладки, которая ещё не загружена (None - всё в памяти)."""
+
+    MODEL = Tab
+
+    def __init__(self, data=(), parent_id=None, log=None, loader=None):
+        self.loader = loader
+        self._recent = OrderedDict() # Загруженные вкладки: от давно открывавшихся к недавним
+        super().__init__(data, parent_id, log)
+
+    def _wrap(self, object_id, value):
+        tab = super()._wrap(object_id, value)
+        tab.loader = self._load_buttons if self.loader is not None else None
+        return tab
+
+    def _load_buttons(self, tab_id):
+        buttons = self.loader(tab_id)
+        self.touch(tab_id)
+        return buttons
+
+    def touch(self, tab_id):
+        """Отмечает вкладку как только что открытую."""
+        self._recent[tab_id] = True
+        self._recent.move_to_end(tab_id)
+
+    def load_all(self):
+        for tab in self.values():
+            tab["buttons"] # Обращение к кнопкам загружает их (Tab.__missing__)
+
+    def loaded_buttons_count(self):
+        return sum(len(dict.__getitem__(tab, "buttons")) for tab in self.values() if tab.loaded)
+
+    def unload_idle(self, max_buttons, keep=None):
+        """Выгружает давно не открывавшиеся вкладки (кроме keep), пока загружено больше max_buttons кнопок."""
+        if self.loader is None:
+            return []
+        count = self.loaded_buttons_count()
+        # Вкладки, загруженные вместе с конфигом, ни разу не открывались - они выгружаются первыми
+        order = [tab_id for tab_id in self if tab_id not in self._recent] + list(self._recent)
+        unloaded = []
+        for tab_id in order:
+            if count <= max_buttons:
+                break
+            tab = self.get(tab_id)
+            if tab is None:
+                self._recent.pop(tab_id, None)
+                continue
+            if tab_id == keep or not tab.loaded:
+                continue
+            count -= len(dict.__getitem__(tab, "buttons"))
+            tab.unload()
+            self._recent.pop(tab_id, None)
+            unloaded.append(tab_id)
+        return unloaded
+
+
+class TimerMap(ModelMap):
+    MODEL = TimerRecord
@@ -0,0 +1,52 @@
+
+# module_event_coalescer.py
+#
+# Объединение частых событий перемещения, изменения размера и <Configure>. Обработчик события
+# только запоминает его (post); для каждой цели хранится лишь последнее событие, и все
+# накопленные события применяются не чаще одного раза за кадр (EVENT_COALESCE_INTERVAL_MS).
+# Промежуточные события мыши не нужны: положение считается от начала жеста по x_root/y_root.
+# При отпускании кнопки мыши flush(key) сразу применяет последнее событие жеста.
+
+import time
+
+from pnsc_utils import EVENT_COALESCE_INTERVAL_MS
+
+
+class EventCoalescer:
+    """Откладывает обработчики событий до следующего кадра, оставляя одно последнее событие на цель."""
+
+    def __init__(self, master, interval_ms=EVENT_COALESCE_INTERVAL_MS):
+        self.master = master
+        self.interval_ms = interval_ms
+        self._pending = {} # key -> (обработчик, событие); порядок - порядок первых событий
+        self._after_id = None
+        self._last_flush = 0.0
+
+    def post(self, key, handler, event=None):
+        """Запоминает событие цели key; обработчик handler(event) будет вызван в ближайшем кадре."""
+        self._pending[key] = (handler, event)
+        if self._after_id is None:
+            elapsed_ms = (time.monotonic() - self._last_flush) * 1000
+            delay = max(0, int(self.interval_ms - elapsed_ms))
+            self._after_id = self.master.after(delay, self._flush_all)
+
+    def flush(self, key):
+        """Сразу применяет отложенное событие key (конец жеста)."""
+        pending = self._pending.pop(key, None)
+        if pending is not None:
+            handler, event = pending
+            handler(event)
+
+    def cancel(self, key):
+        self._pending.pop(key, None)
+
+    def _flush_all(self):
+        self._after_id = None
+        self._last_flush = time.monotonic()
+        pending, self._pending = self._pending, {}
+        for handler, event in pending.values():
+            try:
+                handler(event)
+            except Exception as e:
+                # Ошибка одной цели (например, виджет уже уничтожен) не мешает остальным
+                print(f"Ошибка обработки события: {e}")
@@ -0,0 +1,148 @@
+
+# module_image_pipeline.py
+#
+# Фоновые изображения заметок. Каждый файл декодируется один раз (большие фото сразу уменьшаются
+# до NOTE_IMAGE_MAX_SIDE) и хранится вместе с уровнями, уменьшенными вдвое, вдвое и т. д.
+# Пока заметку тянут за угол, изображение быстро пересчитывается из ближайшего уровня
+# (BILINEAR) прямо в потоке Tk; качественное уменьшение (LANCZOS) выполняется в рабочем потоке,
+# когда размер уже выбран, и результат возвращается в поток Tk через after().
+
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+from pnsc_utils import HAS_PILLOW, NOTE_IMAGE_CACHE_SOURCES, NOTE_IMAGE_MAX_SIDE
+
+if HAS_PILLOW:
+    from pnsc_utils import Image
+
+MIN_LEVEL_SIDE = 32 # Уровни мельче этого не строятся
+
+
+class _Source:
+    """Декодированное изображение и его уровни (каждый следующий вдвое меньше)."""
+
+    def __init__(self, path):
+        img = Image.open(path)
+        img.draft("RGB", (NOTE_IMAGE_MAX_SIDE, NOTE_IMAGE_MAX_SIDE)) # JPEG сразу декодируется в меньшем размере
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+        img.thumbnail((NOTE_IMAGE_MAX_SIDE, NOTE_IMAGE_MAX_SIDE), Image.LANCZOS)
+        img.load()
+        self.levels = [img]
+        while min(img.size) // 2 >= MIN_LEVEL_SIDE:
+            img = img.reduce(2)
+            self.levels.append(img)
+
+    def level_for(self, size, factor=1):
+        """Самый мелкий уровень, который не меньше size * factor (или самый крупный)."""
+        for img in reversed(self.levels):
+            if img.width >= size[0] * factor and img.height >= size[1] * factor:
+                return img
+        return self.levels[0]
+
+
+class NoteImagePipeline:
+    """
+    Кэш декодированных изображений и рабочий поток качественного масштабирования.
+
+    preview(path, size) - быстрый результат в потоке Tk или None, если файл ещё не декодирован.
+    render(key, path, size, callback) - ставит качественное масштабирование в очередь;
+    callback(image, error) вызывается в потоке Tk только для последнего запроса с этим key.
+    """
+
+    POLL_INTERVAL_MS = 30
+
+    def __init__(self, master, max_sources=NOTE_IMAGE_CACHE_SOURCES):
+        self.master = master
+        self.max_sources = max_sources
+        self._sources = OrderedDict() # (path, mtime_ns, размер файла) -> _Source
+        self._lock = threading.Lock()
+        self._latest = {} # key -> номер последнего запроса
+        self._serial = 0
+        self._tasks = queue.Queue()
+        self._results = queue.Queue()
+        self._poll_id = None
+        self._worker = threading.Thread(target=self._worker_loop, name="pnsc-note-images", daemon=True)
+        self._worker.start()
+
+    def preview(self, path, size):
+        source = self._cached(path)
+        if source is None:
+            return None
+        return source.level_for(size).resize(size, Image.BILINEAR)
+
+    def render(self, key, path, size, callback):
+        self._serial += 1
+        self._latest[key] = self._serial
+        self._tasks.put((key, self._serial, path, size, callback))
+        if self._poll_id is None:
+            self._poll_id = self.master.after(self.POLL_INTERVAL_MS, self._poll_results)
+
+    def cancel(self, key):
+        """Результаты уже поставленных запросов key больше не нужны (заметка удалена)."""
+        self._latest.pop(key, None)
+
+    def shutdown(self):
+        self._tasks.put(None)
+        self._worker.join()
+
+    # --- Внутренняя логика ---
+
+    @staticmethod
+    def _source_key(path):
+        stat = os.stat(path)
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def _cached(self, path):
+        try:
+            source_key = self._source_key(path)
+        except OSError:
+            return None
+        with self._lock:
+            source = self._sources.get(source_key)
+            if source is not None:
+                self._sources.move_to_end(source_key)
+            return source
+
+    def _load(self, path):
+        """Декодирует файл (в рабочем потоке), если его ещё нет в кэше."""
+        source_key = self._source_key(path)
+        with self._lock:
+            source = self._sources.get(source_key)
+        if source is None:
+            source = _Source(path)
+            with self._lock:
+                self._sources[source_key] = source
+                while len(self._sources) > self.max_sources:
+                    self._sources.popitem(last=False)
+        return source
+
+    def _worker_loop(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            key, serial, path, size, callback = task
+            if self._latest.get(key) != serial:
+                continue # Уже запрошен другой размер
+            try:
+                # Уровень не меньше удвоенного размера: LANCZOS из него почти не отличается от оригинала
+                image, error = self._load(path).level_for(size, factor=2).resize(size, Image.LANCZOS), None
+            except Exception as e:
+                image, error = None, e
+            self._results.put((key, serial, callback, image, error))
+
+    def _poll_results(self):
+        self._poll_id = None
+        while True:
+            try:
+                key, serial, callback, image, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if self._latest.get(key) == serial:
+                del self._latest[key]
+                callback(image, error)
+        if self._latest:
+            self._poll_id = self.master.after(self.POLL_INTERVAL_MS, self._poll_results)
@@ -0,0 +1,308 @@
+
+# module_job_store.py
+
+import os
+import json
+import uuid
+import sqlite3
+
+from pnsc_utils import JOB_STORE_BACKEND, CONFIG_DIR_SHARED
+from module_config_sections import is_sectioned_config
+from module_records import JOB_FIELDS, JobRecord
+
+# Поля записи о работе, для которых в SQLite заведены отдельные столбцы (те же, что у JobRecord).
+# Остальные поля (если появятся) сохраняются в столбце extra в виде JSON.
+JOB_COLUMNS = JOB_FIELDS
+# Столбцы, по которым можно фильтровать и сортировать (для них построены индексы)
+INDEXED_COLUMNS = ("job_id", "timestamp", "device_name", "device_type", "work_type", "author")
+
+
+def job_db_path_for(config_path):
+    """База работ лежит в каталоге конфига (configs/<имя>/jobs.sqlite3),
+    у старого однофайлового конфига - рядом с ним (configs/<имя>.jobs.sqlite3)."""
+    if is_sectioned_config(config_path):
+        return os.path.join(config_path, "jobs.sqlite3")
+    return os.path.splitext(config_path)[0] + ".jobs.sqlite3"
+
+
+def is_shared_path(path):
+    """База в общей папке конфигов: CONFIG_DIR_SHARED или сетевой путь Windows (\\\\сервер\\папка)."""
+    return CONFIG_DIR_SHARED or os.path.abspath(path).startswith(("\\\\", "//"))
+
+
+def _remove_db(db_path):
+    """Удаляет файл базы вместе с файлами журналов SQLite."""
+    for path in (db_path, f"{db_path}-wal", f"{db_path}-shm", f"{db_path}-journal"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def copy_job_db(src, dst_db_path):
+    """Копирует базу работ (путь или открытое соединение) через backup API SQLite."""
+    _remove_db(dst_db_path)
+    os.makedirs(os.path.dirname(dst_db_path) or ".", exist_ok=True)
+    source = sqlite3.connect(src) if isinstance(src, str) else src
+    target = sqlite3.connect(dst_db_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        if source is not src:
+            source.close()
+
+
+def _record_job_change(changes, job_id, op, fields=()):
+    """Отмечает изменение работы в журнале изменений модели (module_data_model.ChangeLog)."""
+    if changes is not None:
+        changes.record("job", job_id, op, fields)
+
+
+def _check_columns(order_by, filters):
+    for column in ([order_by] if order_by else []) + list(filters):
+        if column not in INDEXED_COLUMNS:
+            raise ValueError(f"Неизвестный столбец таблицы работ: {column}")
+
+
+class JsonJobStore:
+    """
+    Хранилище работ внутри JSON-конфига (список completed_jobs).
+
+    Работы хранятся компактными записями JobRecord, поиск по job_id идёт через словарь,
+    изменения пишутся в журнал конфига через record_func (см. App.record_change)
+    и в журнал изменений модели changes.
+    """
+
+    backend = "json"
+    migrated = False
+
+    def __init__(self, jobs, record_func, changes=None):
+        self.jobs = [job if isinstance(job, JobRecord) else JobRecord(job) for job in jobs]
+        self.record_func = record_func
+        self.changes = changes
+        self._index = {job.get("job_id"): job for job in self.jobs}
+
+    def count(self):
+        return len(self.jobs)
+
+    def get(self, job_id):
+        return self._index.get(job_id)
+
+    def iter_jobs(self, order_by=None, descending=False, **filters):
+        _check_columns(order_by, filters)
+        jobs = [job for job in self.jobs if all(job.get(k) == v for k, v in filters.items())]
+        if order_by:
+            default = 0 if order_by == "timestamp" else ""
+            jobs.sort(key=lambda job: job.get(order_by, default), reverse=descending)
+        return iter(jobs)
+
+    def add(self, job):
+        job = JobRecord(job)
+        self.jobs.append(job)
+        self._index[job.get("job_id")] = job
+        self.record_func("job_append", job=job)
+        _record_job_change(self.changes, job.get("job_id"), "add")
+
+    def update(self, job_id, fields):
+        job = self._index.get(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        self.record_func("job_edit", job_id=job_id, fields=fields)
+        _record_job_change(self.changes, job_id, "update", fields)
+
+    def delete(self, job_id):
+        job = self._index.pop(job_id, None)
+        if job is None:
+            return
+        self.jobs.remove(job)
+        self.record_func("job_delete", job_id=job_id)
+        _record_job_change(self.changes, job_id, "remove")
+
+    def sync_jobs(self, jobs):
+        """
+        Приводит работы к списку jobs, изменённому вне приложения (без записи в журнал конфига:
+        изменения уже на диске). Возвращает число добавленных, изменённых и удалённых работ.
+        """
+        new_index = {job.get("job_id"): job for job in jobs}
+        changed = 0
+        for job_id in [job_id for job_id in self._index if job_id not in new_index]:
+            self.jobs.remove(self._index.pop(job_id))
+            _record_job_change(self.changes, job_id, "remove")
+            changed += 1
+        for job_id, job_data in new_index.items():
+            job = self._index.get(job_id)
+            if job is None:
+                job = JobRecord(job_data)
+                self.jobs.append(job)
+                self._index[job_id] = job
+                _record_job_change(self.changes, job_id, "add")
+                changed += 1
+            elif job.to_dict() != job_data:
+                fields = tuple(key for key in set(job.keys()) | set(job_data) if job.get(key) != job_data.get(key))
+                job.clear()
+                job.update(job_data)
+                _record_job_change(self.changes, job_id, "update", fields)
+                changed += 1
+        return changed
+
+    def export_to_config(self, config_data):
+        """Кладёт работы в данные конфига перед записью."""
+        config_data["completed_jobs"] = self.jobs
+
+    def relocate(self, config_path):
+        pass # Работы и так сохраняются вместе с конфигом
+
+    def close(self):
+        pass
+
+
+class SqliteJobStore:
+    """
+    Хранилище работ в SQLite-базе рядом с конфигом.
+
+    Каждое изменение сразу фиксируется в базе, поэтому работы не попадают
+    ни в JSON-конфиг, ни в его журнал. Соединение используется только из потока Tk.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, db_path, reset=False, changes=None):
+        self.db_path = db_path
+        self.changes = changes
+        self.migrated = False # Выставляется, если в базу перенесены работы из JSON-конфига
+        if reset:
+            _remove_db(db_path)
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = self._connect(db_path)
+
+    @staticmethod
+    def _connect(db_path):
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        if is_shared_path(db_path):
+            # WAL держит индекс в общей памяти (-shm), которая на сетевом диске не разделяется между
+            # машинами: базу в общей папке защищают только обычный журнал и блокировки файла
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.execute("PRAGMA synchronous=FULL")
+        else:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    timestamp REAL,
+                    device_name TEXT,
+                    device_type TEXT,
+                    work_type TEXT,
+                    time_worked REAL,
+                    declared_time REAL,
+                    author TEXT,
+                    note TEXT,
+                    extra TEXT
+                )""")
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_job_id ON jobs(job_id)")
+            for column in INDEXED_COLUMNS[1:]:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_jobs_{column} ON jobs({column})")
+        return conn
+
+    @staticmethod
+    def _row_values(job):
+        extra = {k: v for k, v in job.items() if k not in JOB_COLUMNS}
+        return tuple(job.get(column) for column in JOB_COLUMNS) + (json.dumps(extra, ensure_ascii=False) if extra else None,)
+
+    @staticmethod
+    def _row_to_job(row):
+        # Пустые столбцы не превращаются в ключи, чтобы job.get(..., default) работал как со списком из JSON
+        job = {column: row[column] for column in JOB_COLUMNS if row[column] is not None}
+        if row["extra"]:
+            job.update(json.loads(row["extra"]))
+        return job
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def get(self, job_id):
+        row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def iter_jobs(self, order_by=None, descending=False, **filters):
+        """Работы в порядке добавления либо отсортированные по индексированному столбцу."""
+        _check_columns(order_by, filters)
+        sql = "SELECT * FROM jobs"
+        if filters:
+            sql += " WHERE " + " AND ".join(f"{column} = ?" for column in filters)
+        sql += f" ORDER BY {order_by or 'seq'}" + (" DESC" if descending else "")
+        for row in self._conn.execute(sql, tuple(filters.values())):
+            yield self._row_to_job(row)
+
+    def add(self, job):
+        placeholders = ", ".join("?" * (len(JOB_COLUMNS) + 1))
+        with self._conn:
+            self._conn.execute(f"INSERT INTO jobs ({', '.join(JOB_COLUMNS)}, extra) VALUES ({placeholders})", self._row_values(job))
+        _record_job_change(self.changes, job.get("job_id"), "add")
+
+    def update(self, job_id, fields):
+        job = self.get(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        assignments = ", ".join(f"{column} = ?" for column in JOB_COLUMNS[1:])
+        with self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments}, extra = ? WHERE job_id = ?", self._row_values(job)[1:] + (job_id,))
+        _record_job_change(self.changes, job_id, "update", fields)
+
+    def delete(self, job_id):
+        with self._conn:
+            self._conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        _record_job_change(self.changes, job_id, "remove")
+
+    def import_jobs(self, jobs):
+        """Переносит работы из JSON-конфига. Повторный перенос тех же job_id ничего не меняет."""
+        placeholders = ", ".join("?" * (len(JOB_COLUMNS) + 1))
+        rows = []
+        for job in jobs:
+            if not job.get("job_id"):
+                job = dict(job, job_id=str(uuid.uuid4()))
+            rows.append(self._row_values(job))
+        with self._conn:
+            self._conn.executemany(f"INSERT OR IGNORE INTO jobs ({', '.join(JOB_COLUMNS)}, extra) VALUES ({placeholders})", rows)
+
+    def sync_jobs(self, jobs):
+        return 0 # Работы читаются из базы напрямую, в файлах конфига их нет
+
+    def export_to_config(self, config_data):
+        # В конфиге остаётся только отметка, что работы лежат в базе
+        config_data["job_store"] = self.backend
+
+    def relocate(self, config_path):
+        """Копирует базу под новое имя конфига (Сохранить как...) и переключается на копию."""
+        db_path = job_db_path_for(config_path)
+        if db_path == self.db_path:
+            return
+        copy_job_db(self._conn, db_path)
+        self._conn.close()
+        self.db_path = db_path
+        self._conn = self._connect(db_path)
+
+    def close(self):
+        self._conn.close()
+
+
+def open_job_store(config_path, config_data, record_func, reset=False, backend=JOB_STORE_BACKEND, changes=None):
+    """
+    Открывает хранилище работ для загруженного конфига.
+
+    Конфиг, уже переведённый на SQLite ("job_store": "sqlite"), всегда открывается с базой.
+    Если выбран бэкенд sqlite, работы из completed_jobs переносятся в базу,
+    а у хранилища выставляется migrated - конфиг нужно пересохранить без них.
+    """
+    if config_data.get("job_store") == "sqlite" or backend == "sqlite":
+        store = SqliteJobStore(job_db_path_for(config_path), reset=reset, changes=changes)
+        jobs = config_data.get("completed_jobs")
+        if jobs or config_data.get("job_store") != "sqlite":
+            store.import_jobs(jobs or [])
+            store.migrated = True
+        return store
+    return JsonJobStore(config_data.get("completed_jobs", []), record_func, changes)
@@ -0,0 +1,148 @@
+
+# module_note_blobs.py
+#
+# Хранилище больших текстов заметок: configs/<имя>/blobs/<sha256>.txt. Текст заметки длиннее
+# NOTE_BLOB_MIN_CHARS при записи секции notes выносится в файл, имя которого - хэш содержимого
+# (одинаковые тексты хранятся один раз). В notes.json остаются ссылка text_blob и начало текста
+# (превью длиной NOTE_BLOB_PREVIEW_CHARS) в поле text, поэтому запись других секций и
+# изменения других заметок больше не переписывают большие тексты.
+#
+# В памяти заметка с полем text_blob ещё не загружена: в text лежит превью. Текст читается
+# при построении виджетов заметки (load_note_text); пока он не изменён, заметка снова пишется
+# той же ссылкой. Файлы, на которые после записи секции notes никто не ссылается дольше
+# NOTE_BLOB_GC_GRACE_S, удаляются в потоке записи (collect_blob_garbage).
+
+import os
+import time
+import hashlib
+
+from pnsc_utils import NOTE_BLOB_MIN_CHARS, NOTE_BLOB_PREVIEW_CHARS, NOTE_BLOB_GC_GRACE_S
+
+BLOBS_DIR = "blobs"
+BLOB_EXT = ".txt"
+NOTE_BLOB_KEY = "text_blob"
+
+
+def blobs_dir_for(config_path):
+    return os.path.join(config_path, BLOBS_DIR)
+
+
+def blob_path(config_path, digest):
+    return os.path.join(blobs_dir_for(config_path), digest + BLOB_EXT)
+
+
+def text_digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def is_note_text_loaded(note_data):
+    return note_data.get(NOTE_BLOB_KEY) is None
+
+
+def write_blob(config_path, text):
+    """Записывает текст в хранилище (если такого содержимого ещё нет) и возвращает его хэш."""
+    digest = text_digest(text)
+    path = blob_path(config_path, digest)
+    if os.path.exists(path):
+        os.utime(path) # Текст снова используется: сборщик мусора его не тронет
+        return digest
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    return digest
+
+
+def read_blob(config_path, digest):
+    with open(blob_path(config_path, digest), encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def note_text(config_path, note_data):
+    """Полный текст заметки; вынесенный текст читается из хранилища, но в заметку не подставляется."""
+    digest = note_data.get(NOTE_BLOB_KEY)
+    if digest is None:
+        return note_data.get("text", "")
+    return read_blob(config_path, digest)
+
+
+def load_note_text(config_path, note_data):
+    """
+    Подставляет в заметку вынесенный текст вместо превью. Это загрузка, а не изменение заметки,
+    поэтому у записи модели (NoteRecord) изменение не попадает в журнал.
+    Если файла нет, в заметке остаются превью и ссылка, и возвращается False.
+    """
+    digest = note_data.get(NOTE_BLOB_KEY)
+    if digest is None:
+        return True
+    try:
+        text = read_blob(config_path, digest)
+    except OSError as e:
+        print(f"Не удалось прочитать текст заметки {digest}: {e}")
+        return False
+    if hasattr(note_data, "attach_text"):
+        note_data.attach_text(text)
+    else:
+        note_data["text"] = text
+        del note_data[NOTE_BLOB_KEY]
+    return True
+
+
+def load_note_texts(config_path, notes):
+    """Загружает тексты всех заметок (перед записью конфига в другое место: копия, пакет, "Сохранить как")."""
+    for note_data in notes:
+        load_note_text(config_path, note_data)
+
+
+def externalize_note_texts(config_path, notes):
+    """
+    Данные секции notes для записи: большие тексты заменены ссылками на файлы хранилища.
+    Возвращает (заметки, хэши всех текстов, на которые ссылаются заметки).
+    """
+    result, referenced = {}, set()
+    for note_id, note_data in notes.items():
+        digest = note_data.get(NOTE_BLOB_KEY)
+        text = note_data.get("text", "")
+        if digest is None and len(text) >= NOTE_BLOB_MIN_CHARS:
+            digest = write_blob(config_path, text)
+            note_data = dict(note_data, text=text[:NOTE_BLOB_PREVIEW_CHARS], **{NOTE_BLOB_KEY: digest})
+        if digest is not None:
+            referenced.add(digest)
+        result[note_id] = note_data
+    return result, referenced
+
+
+def comparable_note(note_data):
+    """Заметка для сравнения: вынесенный и загруженный большой текст дают одинаковый результат."""
+    fields = dict(note_data.items())
+    digest = fields.pop(NOTE_BLOB_KEY, None)
+    text = fields.pop("text", "")
+    if digest is None and len(text) >= NOTE_BLOB_MIN_CHARS:
+        digest = text_digest(text)
+    fields["text"] = (NOTE_BLOB_KEY, digest) if digest is not None else text
+    return fields
+
+
+def notes_equal(a, b):
+    return a == b or comparable_note(a) == comparable_note(b)
+
+
+def collect_blob_garbage(config_path, referenced, grace_s=NOTE_BLOB_GC_GRACE_S):
+    """Удаляет файлы хранилища, на которые не ссылается ни одна заметка и которые не менялись grace_s секунд."""
+    blobs_dir = blobs_dir_for(config_path)
+    if not os.path.isdir(blobs_dir):
+        return 0
+    removed, deadline = 0, time.time() - grace_s
+    for file_name in os.listdir(blobs_dir):
+        digest, ext = os.path.splitext(file_name)
+        if ext != BLOB_EXT or digest in referenced:
+            continue
+        path = os.path.join(blobs_dir, file_name)
+        try:
+            if os.path.getmtime(path) < deadline:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass # Файл удалил другой экземпляр
+    return removed
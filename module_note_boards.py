@@ -0,0 +1,169 @@
+
+# module_note_boards.py
+#
+# Доски заметок: заметки разложены по именованным доскам (например, по заказчикам или сменам),
+# которые переключаются кнопками над холстом заметок, как вкладки кнопок.
+# Данные всех заметок хранятся записями в app.note_records (id -> NoteRecord), а NoteWidget
+# строятся только для заметок активной доски (app.notes). Доска заметки - поле board;
+# пустая строка - основная доска, она есть всегда. Заметка с неизвестной доской
+# (доску удалил другой экземпляр) показывается на основной.
+# Названия досок и активная доска хранятся в секции notes: note_boards, active_note_board.
+
+import uuid
+
+from pnsc_utils import tk
+from module_notes import NoteWidget
+from module_records import NoteRecord
+
+DEFAULT_NOTE_BOARD = ""
+DEFAULT_NOTE_BOARD_NAME = "Заметки"
+
+
+def normalize_note_boards(boards):
+    """Доски из конфига (None - досок нет) с основной доской на первом месте."""
+    result = {DEFAULT_NOTE_BOARD: {"name": DEFAULT_NOTE_BOARD_NAME}}
+    for board_id, board_data in (boards or {}).items():
+        result[board_id] = dict(board_data)
+    return result
+
+
+class NoteBoardManager:
+    """Переключение, создание, переименование и удаление досок заметок."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def note_board_of(self, note_data):
+        board_id = note_data.get('board', DEFAULT_NOTE_BOARD)
+        return board_id if board_id in self.app.note_boards else DEFAULT_NOTE_BOARD
+
+    def load_note_boards(self, config_data):
+        """Заметки и доски загруженного конфига; виджеты строятся только для активной доски."""
+        app = self.app
+        app.note_boards = normalize_note_boards(config_data.get("note_boards"))
+        app.note_records = {note_id: NoteRecord(note_data, object_id=note_id, log=app.model_changes)
+                            for note_id, note_data in config_data.get("notes", {}).items()}
+        self.switch_note_board(config_data.get("active_note_board", DEFAULT_NOTE_BOARD))
+
+    def reload_note_boards(self, config_data):
+        """Применяет доски, изменённые вне приложения. Возвращает True, если список досок изменился."""
+        app = self.app
+        boards = normalize_note_boards(config_data.get("note_boards"))
+        if boards == app.note_boards:
+            return False
+        app.note_boards = boards
+        self.switch_note_board(app.active_note_board)
+        return True
+
+    def switch_note_board(self, board_id):
+        app = self.app
+        if board_id not in app.note_boards:
+            board_id = DEFAULT_NOTE_BOARD
+        # Сначала очищаются границы заметок: удаление каждой заметки не пересчитывает область прокрутки
+        app.notes_viewport.clear()
+        for note_widget in app.notes.values():
+            note_widget.destroy()
+        app.notes.clear()
+        app.active_note_board = board_id
+        app.notes_canvas.xview_moveto(0)
+        app.notes_canvas.yview_moveto(0)
+        for note_id, record in app.note_records.items():
+            if self.note_board_of(record) == board_id:
+                app.notes[note_id] = NoteWidget(app, app.notes_canvas, note_id, record)
+        self.update_note_board_display()
+
+    def move_note_to_board(self, note_id, board_id):
+        """Переносит заметку на другую доску: виджет строится или убирается по активной доске."""
+        app = self.app
+        record = app.note_records[note_id]
+        record['board'] = board_id
+        note_widget = app.notes.get(note_id)
+        if board_id == app.active_note_board and note_widget is None:
+            app.notes[note_id] = NoteWidget(app, app.notes_canvas, note_id, record)
+        elif board_id != app.active_note_board and note_widget is not None:
+            app.notes.pop(note_id).destroy()
+
+    def update_note_board_display(self):
+        app = self.app
+        for widget in app.note_boards_bar.winfo_children():
+            widget.destroy()
+        for board_id, board_data in app.note_boards.items():
+            active = board_id == app.active_note_board
+            board_button = tk.Button(app.note_boards_bar, text=board_data['name'],
+                                     command=lambda bid=board_id: self._on_board_selected(bid),
+                                     relief=tk.SUNKEN if active else tk.RAISED, bg="#a0a0a0" if active else "#d0d0d0")
+            board_button.pack(side=tk.LEFT, padx=2, pady=2)
+            board_button.bind("<Button-3>", lambda event, bid=board_id: self._show_note_board_menu(event, bid))
+        tk.Button(app.note_boards_bar, text="+", command=self.create_note_board_dialog,
+                  relief=tk.FLAT, bg="#c0c0c0").pack(side=tk.LEFT, padx=2, pady=2)
+
+    def create_note_board_dialog(self):
+        def add_board(name):
+            board_id = str(uuid.uuid4())
+            self.app.note_boards[board_id] = {"name": name}
+            self._on_board_selected(board_id)
+        self._board_name_dialog("Создание доски", "", add_board)
+
+    # --- Внутренняя логика ---
+
+    def _on_board_selected(self, board_id):
+        if board_id != self.app.active_note_board:
+            self.switch_note_board(board_id)
+        else:
+            self.update_note_board_display()
+        self.app.save_config(show_message=False, sections=("notes",))
+
+    def _show_note_board_menu(self, event, board_id):
+        menu = tk.Menu(self.app.master, tearoff=0)
+        menu.add_command(label="Переименовать доску", command=lambda: self._rename_note_board(board_id))
+        if board_id != DEFAULT_NOTE_BOARD:
+            menu.add_command(label="Удалить доску", command=lambda: self._delete_note_board(board_id))
+        menu.tk_popup(event.x_root, event.y_root)
+
+    def _rename_note_board(self, board_id):
+        def rename(name):
+            self.app.note_boards[board_id]["name"] = name
+            self.update_note_board_display()
+            self.app.save_config(show_message=False, sections=("notes",))
+        self._board_name_dialog("Переименование доски", self.app.note_boards[board_id]["name"], rename)
+
+    def _delete_note_board(self, board_id):
+        app = self.app
+        name = app.note_boards[board_id]["name"]
+        if not app._show_messagebox("askyesno", "Удаление доски",
+                                    f"Удалить доску '{name}'? Её заметки перейдут на доску '{app.note_boards[DEFAULT_NOTE_BOARD]['name']}'."):
+            return
+        for record in app.note_records.values():
+            if record.get('board') == board_id:
+                record['board'] = DEFAULT_NOTE_BOARD
+        del app.note_boards[board_id]
+        self.switch_note_board(DEFAULT_NOTE_BOARD if app.active_note_board == board_id else app.active_note_board)
+        app.save_config(show_message=False, sections=("notes",))
+
+    def _board_name_dialog(self, title, initial_name, on_accept):
+        app = self.app
+        dialog = tk.Toplevel(app.master)
+        dialog.title(title)
+        app.center_window(dialog)
+        dialog.transient(app.master)
+        dialog.grab_set()
+
+        tk.Label(dialog, text="Название доски:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
+        name_entry = tk.Entry(dialog)
+        name_entry.grid(row=0, column=1, padx=5, pady=5, sticky=tk.EW)
+        name_entry.insert(0, initial_name)
+        name_entry.focus_set()
+
+        def accept():
+            name = name_entry.get().strip()
+            if not name:
+                app._show_messagebox("warning", "Предупреждение", "Название доски не может быть пустым.")
+                return
+            dialog.destroy()
+            on_accept(name)
+
+        tk.Button(dialog, text="ОК", command=accept).grid(row=1, column=0, columnspan=2, padx=5, pady=5)
+        dialog.bind("<Return>", lambda event: accept())
+        dialog.bind("<Escape>", lambda event: dialog.destroy())
+        dialog.columnconfigure(1, weight=1)
+        dialog.wait_window()
@@ -1,32 +1,65 @@
 
 # module_notes.py
 
-from pnsc_utils import tk, ttk, filedialog, messagebox, colorchooser, os, Image, ImageTk, HAS_PILLOW, tkFont, uuid
+from pnsc_utils import tk, ttk, filedialog, messagebox, colorchooser, os, ImageTk, HAS_PILLOW, tkFont, uuid
+from module_records import NoteRecord
+from module_note_blobs import NOTE_BLOB_KEY, load_note_text
 
 class NoteWidget:
-    """Виджет заметки, перетаскиваемый и изменяемый в размере."""
+    """
+    Виджет заметки, перетаскиваемый и изменяемый в размере.
+    Виджеты Tk строятся, только пока заметка видна (app.notes_viewport вызывает realize/unrealize);
+    вне видимой области заметка нарисована на холсте заготовкой: прямоугольник и название.
+    """
+    _font_families = None # Список шрифтов один на все заметки
+
     def __init__(self, app_instance, canvas, note_id, note_data):
         self.app = app_instance
         self.canvas = canvas
         self.note_id = note_id
-        self.data = note_data
-
-        # Установка дефолтных значений, если их нет
-        self.data.setdefault('text', 'Новая заметка')
-        self.data.setdefault('x', 10)
-        self.data.setdefault('y', 10)
-        self.data.setdefault('width', 200)
-        self.data.setdefault('height', 150)
-        self.data.setdefault('bg_color', '#ffffcc')
-        self.data.setdefault('text_color', '#000000')
-        self.data.setdefault('font_size', 10)
-        self.data.setdefault('font_family', 'Arial')
-        self.data.setdefault('bg_image', '')
-        self.data.setdefault('note_name', 'Заметка')
-
-        self.available_fonts = sorted(tkFont.families())
+        # Значения по умолчанию заполнены при загрузке конфига (module_config_schema.normalize_notes),
+        # изменения полей заметки попадают в журнал изменений модели приложения.
+        # Запись заметки из app.note_records используется как есть: виджет лишь показывает её на доске
+        if isinstance(note_data, NoteRecord):
+            self.data = note_data
+        else:
+            self.data = NoteRecord(note_data, object_id=note_id, log=app_instance.model_changes)
+
+        self.frame = None
+        self.canvas_item = None
+        self.placeholder_items = ()
+        self.bg_image_tk = None
+        self.bg_image_tk_id = None
+        # Номер правки текста: растёт при каждом изменении виджета, а текст снимается
+        # из виджета только при сохранении и только если номер сменился (sync_text)
+        self.text_revision = 0
+        self._synced_revision = 0
+        app_instance.notes_viewport.add(self)
+
+    @property
+    def available_fonts(self):
+        if NoteWidget._font_families is None:
+            NoteWidget._font_families = sorted(tkFont.families())
+        return NoteWidget._font_families
+
+    @property
+    def is_realized(self):
+        return self.frame is not None
+
+    def has_focus(self, focus_widget):
+        """Фокус ввода внутри заметки: её виджеты не убираются, даже если она ушла из вида."""
+        return focus_widget is not None and self.frame is not None and str(focus_widget).startswith(str(self.frame))
+
+    def realize(self):
+        """Строит виджеты заметки вместо заготовки на холсте."""
+        if self.frame is not None:
+            return
+        self._delete_placeholder()
         if self.data['font_family'] not in self.available_fonts:
             self.data['font_family'] = 'Arial'
+        # Большой текст хранится отдельно (module_note_blobs) и читается, только когда заметку видно
+        load_note_text(self.app.current_config_path, self.data)
+        canvas = self.canvas
 
         self.frame = tk.Frame(canvas, bd=2, relief="raised", bg=self.data['bg_color'])
         
@@ -50,7 +83,9 @@ class NoteWidget:
                                  bd=0, highlightthickness=0)
         self.text_area.pack(side=tk.LEFT, fill="both", expand=True)
         self.text_area.insert(tk.END, self.data['text'])
-        self.text_area.bind("<KeyRelease>", self._on_text_change)
+        self.text_area.edit_modified(False)
+        self.text_area.bind("<<Modified>>", self._on_text_modified)
+        self.text_area.bind("<FocusOut>", lambda e: self.sync_text())
 
         self.text_scrollbar = tk.Scrollbar(self.text_container_frame, command=self.text_area.yview)
         self.text_scrollbar.pack(side=tk.RIGHT, fill="y")
@@ -61,78 +96,152 @@ class NoteWidget:
                                                 anchor=tk.NW,
                                                 width=self.data['width'],
                                                 height=self.data['height'])
-        
-        self.bg_image_tk = None
 
         self._bind_drag_events()
         self._bind_resize_events()
         self._apply_styles()
 
-    def _on_text_change(self, event=None):
-        self.data['text'] = self.text_area.get("1.0", tk.END).strip()
-        self.app.save_config(show_message=False)
+    def unrealize(self):
+        """Убирает виджеты заметки и рисует на их месте заготовку (текст уже сохранён в data)."""
+        if self.frame is not None:
+            self._remove_widgets()
+        self._draw_placeholder()
+
+    def destroy(self):
+        """Удаляет заметку с холста целиком."""
+        self._remove_widgets()
+        self._delete_placeholder()
+        self.app.notes_viewport.remove(self.note_id)
+
+    def _remove_widgets(self):
+        self.sync_text()
+        self.app.event_coalescer.cancel(("note_drag", self.note_id))
+        self.app.event_coalescer.cancel(("note_resize", self.note_id))
+        self.app.note_images.cancel(self.note_id)
+        if self.bg_image_tk_id:
+            self.canvas.delete(self.bg_image_tk_id)
+        self.bg_image_tk_id = None
+        self.bg_image_tk = None
+        if self.canvas_item:
+            self.canvas.delete(self.canvas_item)
+        self.canvas_item = None
+        if self.frame is not None:
+            self.frame.destroy()
+        self.frame = None
+
+    def _draw_placeholder(self):
+        self._delete_placeholder()
+        x, y = self.data['x'], self.data['y']
+        width, height = self.data['width'], self.data['height']
+        tag = f"note_placeholder_{self.note_id}"
+        self.placeholder_items = (
+            self.canvas.create_rectangle(x, y, x + width, y + height, fill=self.data['bg_color'],
+                                         outline="#a0a0a0", tags=("note_placeholder", tag)),
+            self.canvas.create_text(x + 7, y + 4, text=self.data['note_name'], anchor=tk.NW, width=max(1, width - 14),
+                                    fill=self.data['text_color'], tags=("note_placeholder", tag)),
+        )
+
+    def _delete_placeholder(self):
+        for item in self.placeholder_items:
+            self.canvas.delete(item)
+        self.placeholder_items = ()
+
+    def _on_text_modified(self, event=None):
+        # Флаг изменения сбрасывается, чтобы <<Modified>> пришло и при следующей правке
+        if not self.text_area.edit_modified():
+            return
+        self.text_area.edit_modified(False)
+        self.text_revision += 1
+        self.app.save_scheduler.add_pending(("note_text", self.note_id), self.sync_text)
+
+    def sync_text(self):
+        """Переносит текст из виджета в data и журнал, если он правился с прошлого снятия."""
+        if self.frame is None or self.text_revision == self._synced_revision:
+            return
+        self._synced_revision = self.text_revision
+        text = self.text_area.get("1.0", tk.END).strip()
+        if text != self.data['text']:
+            self.data['text'] = text
+            if NOTE_BLOB_KEY in self.data:
+                del self.data[NOTE_BLOB_KEY] # Текст не загрузился из хранилища, но заменён новым
+            self.app.record_change("note_text", note_id=self.note_id, text=text)
+
+    def _on_geometry_change(self, event=None):
+        # Положение и размер пишутся в журнал, без перезаписи всего конфига
+        geometry = {key: self.data[key] for key in ('x', 'y', 'width', 'height')}
+        self.app.record_change("note_geometry", note_id=self.note_id, geometry=geometry)
 
     def _bind_drag_events(self):
-        self._drag_data = {"x": 0, "y": 0}
-        self.title_bar.bind("<Button-1>", self._on_drag_start)
-        self.title_bar.bind("<B1-Motion>", self._on_drag_motion)
-        self.title_bar.bind("<ButtonRelease-1>", lambda e: self.app.save_config(show_message=False))
-        self.title_label.bind("<Button-1>", self._on_drag_start)
-        self.title_label.bind("<B1-Motion>", self._on_drag_motion)
-        self.title_label.bind("<ButtonRelease-1>", lambda e: self.app.save_config(show_message=False))
+        self._drag_data = {}
+        for widget in (self.title_bar, self.title_label):
+            widget.bind("<Button-1>", self._on_drag_start)
+            widget.bind("<B1-Motion>", lambda e: self.app.event_coalescer.post(("note_drag", self.note_id), self._apply_drag, e))
+            widget.bind("<ButtonRelease-1>", self._on_drag_end)
 
     def _on_drag_start(self, event):
-        self._drag_data["x"] = event.x
-        self._drag_data["y"] = event.y
-
-    def _on_drag_motion(self, event):
-        delta_x = event.x - self._drag_data["x"]
-        delta_y = event.y - self._drag_data["y"]
-        x1, y1 = self.canvas.coords(self.canvas_item)
-        new_x = x1 + delta_x
-        new_y = y1 + delta_y
-        canvas_width = self.canvas.winfo_width()
-        canvas_height = self.canvas.winfo_height()
-        self.frame.update_idletasks()
-        note_width = self.frame.winfo_width()
-        note_height = self.frame.winfo_height()
-        new_x = max(0, min(new_x, canvas_width - note_width))
-        new_y = max(0, min(new_y, canvas_height - note_height))
+        # Геометрия доски и заметки запоминается на весь жест, а не запрашивается на каждое движение мыши
+        self._drag_data = {"x_root": event.x_root, "y_root": event.y_root, "x": self.data['x'], "y": self.data['y'],
+                           "view_x": self.canvas.canvasx(0), "view_y": self.canvas.canvasy(0),
+                           "canvas_width": self.canvas.winfo_width(), "canvas_height": self.canvas.winfo_height()}
+
+    def _apply_drag(self, event):
+        drag = self._drag_data
+        if not drag or self.frame is None:
+            return
+        new_x = drag["x"] + event.x_root - drag["x_root"]
+        new_y = drag["y"] + event.y_root - drag["y_root"]
+        # Заметка остаётся в видимой части доски (доска может быть прокручена)
+        new_x = max(0, drag["view_x"], min(new_x, drag["view_x"] + drag["canvas_width"] - self.data['width']))
+        new_y = max(0, drag["view_y"], min(new_y, drag["view_y"] + drag["canvas_height"] - self.data['height']))
         self.canvas.coords(self.canvas_item, new_x, new_y)
         self.data['x'] = new_x
         self.data['y'] = new_y
-        if hasattr(self, 'bg_image_tk_id') and self.bg_image_tk_id:
+        if self.bg_image_tk_id:
             self.canvas.coords(self.bg_image_tk_id, new_x, new_y)
+        self.app.notes_viewport.update_bounds(self)
+
+    def _on_drag_end(self, event):
+        self.app.event_coalescer.flush(("note_drag", self.note_id))
+        self._drag_data = {}
+        self._on_geometry_change(event)
 
     def _bind_resize_events(self):
         self._resize_handle = tk.Frame(self.frame, bg="gray", width=10, height=10, cursor="sizing")
         self._resize_handle.place(relx=1.0, rely=1.0, anchor=tk.SE)
-        self._resize_data = {"x": 0, "y": 0, "width": 0, "height": 0}
+        self._resize_data = {}
         self._resize_handle.bind("<Button-1>", self._on_resize_start)
-        self._resize_handle.bind("<B1-Motion>", self._on_resize_motion)
-        self._resize_handle.bind("<ButtonRelease-1>", lambda e: self.app.save_config(show_message=False))
+        self._resize_handle.bind("<B1-Motion>", lambda e: self.app.event_coalescer.post(("note_resize", self.note_id), self._apply_resize, e))
+        self._resize_handle.bind("<ButtonRelease-1>", self._on_resize_end)
 
     def _on_resize_start(self, event):
-        self._resize_data["x"] = event.x
-        self._resize_data["y"] = event.y
-        self._resize_data["width"] = self.data['width']
-        self._resize_data["height"] = self.data['height']
-
-    def _on_resize_motion(self, event):
-        delta_w = event.x - self._resize_data["x"]
-        delta_h = event.y - self._resize_data["y"]
+        # Отсчёт от экранных координат: ручка сама сдвигается вместе с углом заметки
+        self._resize_data = {"x_root": event.x_root, "y_root": event.y_root,
+                             "width": self.data['width'], "height": self.data['height']}
+
+    def _apply_resize(self, event):
+        resize = self._resize_data
+        if not resize or self.frame is None:
+            return
         min_width = 100
         min_height = 50
-        new_width = max(min_width, self._resize_data["width"] + delta_w)
-        new_height = max(min_height, self._resize_data["height"] + delta_h)
+        new_width = max(min_width, resize["width"] + event.x_root - resize["x_root"])
+        new_height = max(min_height, resize["height"] + event.y_root - resize["y_root"])
         self.data['width'] = new_width
         self.data['height'] = new_height
         self.canvas.itemconfig(self.canvas_item, width=new_width, height=new_height)
-        self.frame.update_idletasks()
-        self._resize_handle.place(relx=1.0, rely=1.0, anchor=tk.SE)
-        self._apply_styles()
-
-    def _apply_styles(self):
+        self._apply_styles(preview=True)
+        self.app.notes_viewport.update_bounds(self)
+
+    def _on_resize_end(self, event=None):
+        self.app.event_coalescer.flush(("note_resize", self.note_id))
+        self._resize_data = {}
+        self._update_bg_image() # Размер выбран: качественное масштабирование фона в рабочем потоке
+        self._on_geometry_change(event)
+
+    def _apply_styles(self, preview=False):
+        if self.frame is None:
+            self._draw_placeholder() # Заметка вне видимой области: обновляется только заготовка
+            return
         self.frame.config(bg=self.data['bg_color'])
         self.title_bar.config(bg=self.data['bg_color'])
         self.title_label.config(bg=self.data['bg_color'], fg=self.data['text_color'], text=self.data['note_name'])
@@ -141,28 +250,7 @@ class NoteWidget:
         self.text_area.config(bg=self.data['bg_color'], fg=self.data['text_color'],
                               font=(self.data['font_family'], self.data['font_size']))
         
-        if hasattr(self, 'bg_image_tk_id') and self.bg_image_tk_id:
-            self.canvas.delete(self.bg_image_tk_id)
-            self.bg_image_tk_id = None
-            self.bg_image_tk = None
-
-        if HAS_PILLOW and self.data['bg_image'] and os.path.exists(self.data['bg_image']):
-            try:
-                img = Image.open(self.data['bg_image'])
-                note_width = self.data['width']
-                note_height = self.data['height']
-                img = img.resize((note_width, note_height), Image.LANCZOS) 
-                self.bg_image_tk = ImageTk.PhotoImage(img)
-                x_note, y_note = self.canvas.coords(self.canvas_item)
-                self.bg_image_tk_id = self.canvas.create_image(x_note, y_note, 
-                                                               image=self.bg_image_tk, 
-                                                               anchor=tk.NW,
-                                                               tags=(f"note_bg_{self.note_id}"))
-                self.canvas.tag_lower(self.bg_image_tk_id, self.canvas_item)
-                self.canvas.coords(self.bg_image_tk_id, x_note, y_note)
-            except Exception as e:
-                self.app._show_messagebox("warning", "Ошибка изображения", f"Не удалось загрузить изображение: {e}. Будет использован цвет фона.")
-                self.data['bg_image'] = ''
+        self._update_bg_image(preview)
         
         self.canvas.itemconfig(self.canvas_item, width=self.data['width'], height=self.data['height'])
         if hasattr(self, '_resize_handle'):
@@ -172,6 +260,51 @@ class NoteWidget:
         if hasattr(self, 'bg_image_tk_id') and self.bg_image_tk_id:
             self.canvas.coords(self.bg_image_tk_id, x_note, y_note)
 
+    def _update_bg_image(self, preview=False):
+        """
+        Фоновое изображение через общий конвейер app.note_images (module_image_pipeline).
+        preview - заметку тянут за угол: изображение быстро пересчитывается из уже декодированного,
+        иначе качественное масштабирование ставится в очередь рабочего потока.
+        """
+        path = self.data['bg_image']
+        if not (HAS_PILLOW and path and os.path.exists(path)):
+            self._set_bg_image(None)
+            return
+        size = (self.data['width'], self.data['height'])
+        if preview:
+            img = self.app.note_images.preview(path, size)
+            if img is not None:
+                self._set_bg_image(img)
+            return
+        self.app.note_images.render(self.note_id, path, size, self._on_bg_image_ready)
+
+    def _on_bg_image_ready(self, img, error):
+        if self.frame is None or not self.frame.winfo_exists():
+            return # Заметку удалили, пока изображение масштабировалось
+        if error is not None:
+            self.app._show_messagebox("warning", "Ошибка изображения", f"Не удалось загрузить изображение: {error}. Будет использован цвет фона.")
+            self.data['bg_image'] = ''
+            img = None
+        self._set_bg_image(img)
+
+    def _set_bg_image(self, img):
+        if img is None:
+            if self.bg_image_tk_id:
+                self.canvas.delete(self.bg_image_tk_id)
+            self.bg_image_tk_id = None
+            self.bg_image_tk = None
+            return
+        self.bg_image_tk = ImageTk.PhotoImage(img)
+        if self.bg_image_tk_id:
+            self.canvas.itemconfig(self.bg_image_tk_id, image=self.bg_image_tk)
+            return
+        x_note, y_note = self.canvas.coords(self.canvas_item)
+        self.bg_image_tk_id = self.canvas.create_image(x_note, y_note,
+                                                       image=self.bg_image_tk,
+                                                       anchor=tk.NW,
+                                                       tags=(f"note_bg_{self.note_id}"))
+        self.canvas.tag_lower(self.bg_image_tk_id, self.canvas_item)
+
     def _make_title_editable(self):
         current_name = self.title_label.cget("text")
         self.title_label.pack_forget()
@@ -196,7 +329,7 @@ class NoteWidget:
         self.edit_entry.destroy()
         self.edit_entry = None
         self.title_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=2)
-        self.app.save_config(show_message=False)
+        self.app.save_config(show_message=False, sections=("notes",))
 
     def show_config_dialog(self):
         dialog = tk.Toplevel(self.app.master)
@@ -249,6 +382,13 @@ class NoteWidget:
         tk.Button(dialog, text="Обзор...", command=lambda: self.app._choose_image(bg_image_var, is_note_bg=True)).grid(row=row, column=2, padx=2, pady=2)
         row += 1
 
+        tk.Label(dialog, text="Доска:").grid(row=row, column=0, padx=5, pady=2, sticky=tk.W)
+        board_ids = list(self.app.note_boards)
+        board_combobox = ttk.Combobox(dialog, values=[self.app.note_boards[b]['name'] for b in board_ids], state="readonly")
+        board_combobox.grid(row=row, column=1, padx=5, pady=2, sticky=tk.EW)
+        board_combobox.current(board_ids.index(self.app.note_board_of(self.data)))
+        row += 1
+
         def apply_changes():
             self.data['note_name'] = note_name_var.get().strip() or 'Заметка'
             self.data['bg_color'] = bg_color_var.get()
@@ -258,7 +398,10 @@ class NoteWidget:
             self.data['bg_image'] = bg_image_var.get()
 
             self._apply_styles()
-            self.app.save_config(show_message=False)
+            board_id = board_ids[board_combobox.current()]
+            if board_id != self.app.note_board_of(self.data):
+                self.app.move_note_to_board(self.note_id, board_id) # С активной доски заметка пропадает
+            self.app.save_config(show_message=False, sections=("notes",))
             dialog.destroy()
 
         save_button = tk.Button(dialog, text="Применить", command=apply_changes)
@@ -281,17 +424,16 @@ class NoteWidget:
         image_var.set('')
         self.data['bg_image'] = ''
         self._apply_styles()
-        self.app.save_config(show_message=False)
+        self.app.save_config(show_message=False, sections=("notes",))
 
     def _delete_note(self, dialog):
         if self.app._show_messagebox("askyesno", "Удаление заметки", "Вы уверены, что хотите удалить эту заметку?"):
-            self.canvas.delete(self.canvas_item)
-            if hasattr(self, 'bg_image_tk_id') and self.bg_image_tk_id:
-                self.canvas.delete(self.bg_image_tk_id)
             del self.app.notes[self.note_id]
-            self.app.save_config(show_message=False)
+            del self.app.note_records[self.note_id]
+            self.app.model_changes.record("note", self.note_id, "remove")
+            self.app.save_config(show_message=False, sections=("notes",))
             dialog.destroy()
-            self.frame.destroy()
+            self.destroy()
 
 # --- Менеджер заметок для интеграции в PNSc ---
 
@@ -303,8 +445,9 @@ class NoteManager:
         note_id = str(uuid.uuid4())
         note_data = {
             'text': 'Новая заметка',
-            'x': 10,
-            'y': 10,
+            # Новая заметка появляется в видимой части доски, даже если доска прокручена
+            'x': int(self.app.notes_canvas.canvasx(0)) + 10,
+            'y': int(self.app.notes_canvas.canvasy(0)) + 10,
             'width': 200,
             'height': 150,
             'bg_color': '#ffffcc',
@@ -312,17 +455,34 @@ class NoteManager:
             'font_size': 10,
             'font_family': 'Arial',
             'bg_image': '',
-            'note_name': f'Заметка {len(self.app.notes) + 1}'
+            'note_name': f'Заметка {len(self.app.notes) + 1}',
+            'board': self.app.active_note_board
         }
-        note_widget = NoteWidget(self.app, self.app.notes_canvas, note_id, note_data)
-        self.app.notes[note_id] = note_widget
-        self.app.save_config(show_message=False)
-        self.app.notes_canvas.config(scrollregion=self.app.notes_canvas.bbox("all"))
+        self._add_note(note_id, note_data)
+        self.app.save_config(show_message=False, sections=("notes",))
+
+    def _add_note(self, note_id, note_data):
+        """Добавляет запись заметки; виджет строится, только если заметка на активной доске."""
+        record = NoteRecord(note_data, object_id=note_id, log=self.app.model_changes)
+        self.app.note_records[note_id] = record
+        if self.app.note_board_of(record) == self.app.active_note_board:
+            self.app.notes[note_id] = NoteWidget(self.app, self.app.notes_canvas, note_id, record)
+        self.app.model_changes.record("note", note_id, "add")
+
+    def _destroy_note_widget(self, note_id):
+        note_widget = self.app.notes.pop(note_id, None)
+        if note_widget is not None:
+            note_widget.destroy()
+        self.app.note_records.pop(note_id, None)
+        self.app.model_changes.record("note", note_id, "remove")
 
     def clear_notes(self):
-        for note_id, note_widget in list(self.app.notes.items()):
-            if hasattr(note_widget, 'bg_image_tk_id') and note_widget.bg_image_tk_id:
-                self.app.notes_canvas.delete(note_widget.bg_image_tk_id)
-            self.app.notes_canvas.delete(note_widget.canvas_item)
-            note_widget.frame.destroy()
-            del self.app.notes[note_id]
+        for note_id in list(self.app.note_records):
+            self._destroy_note_widget(note_id)
+
+    def reload_note(self, note_id, note_data):
+        """Пересоздаёт одну заметку по данным, изменённым вне приложения (None - заметка удалена)."""
+        if note_id in self.app.note_records:
+            self._destroy_note_widget(note_id)
+        if note_data is not None:
+            self._add_note(note_id, note_data)
@@ -0,0 +1,144 @@
+
+# module_notes_viewport.py
+#
+# Доска заметок с отрисовкой только видимой части. Полноценные виджеты (Frame, Text, Scrollbar...)
+# есть только у заметок, которые пересекают видимую область холста с запасом NOTES_VIEWPORT_MARGIN;
+# остальные заметки нарисованы заготовками на самом холсте (NoteWidget.realize/unrealize).
+# Границы заметок хранятся здесь же, поэтому область прокрутки считается по ним без bbox("all").
+# Доску можно прокручивать полосами прокрутки и колесом мыши (Shift - по горизонтали)
+# и перетаскивать мышью за свободное место.
+
+from pnsc_utils import NOTES_VIEWPORT_MARGIN
+
+
+class NotesViewport:
+    """Следит за видимой областью холста заметок и строит или убирает виджеты заметок."""
+
+    def __init__(self, canvas, xscrollbar=None, yscrollbar=None, margin=NOTES_VIEWPORT_MARGIN):
+        self.canvas = canvas
+        self.margin = margin
+        self.notes = {} # note_id -> NoteWidget
+        self._bounds = {} # note_id -> (x1, y1, x2, y2)
+        self._extent = (0, 0) # Правая и нижняя граница всех заметок
+        self._refresh_id = None
+        self.xscrollbar = xscrollbar
+        self.yscrollbar = yscrollbar
+        if xscrollbar is not None:
+            xscrollbar.config(command=self.xview)
+            canvas.config(xscrollcommand=xscrollbar.set)
+        if yscrollbar is not None:
+            yscrollbar.config(command=self.yview)
+            canvas.config(yscrollcommand=yscrollbar.set)
+        canvas.bind("<Configure>", lambda e: self.update_scroll_region(), add="+")
+        # Перетаскивание доски за свободное место (вложенные окна заметок эти события не передают холсту)
+        canvas.bind("<ButtonPress-1>", lambda e: canvas.scan_mark(e.x, e.y))
+        canvas.bind("<B1-Motion>", self._on_pan)
+        canvas.bind("<MouseWheel>", self._on_mousewheel)
+        canvas.bind("<Shift-MouseWheel>", lambda e: self._scroll("x", -1 if e.delta > 0 else 1))
+        canvas.bind("<Button-4>", lambda e: self._scroll("y", -1))
+        canvas.bind("<Button-5>", lambda e: self._scroll("y", 1))
+
+    # --- Заметки ---
+
+    def add(self, note):
+        """Регистрирует заметку и сразу строит её виджеты, если она видна."""
+        self.notes[note.note_id] = note
+        self.update_bounds(note)
+        if self._intersects(self._bounds[note.note_id], self.visible_rect()):
+            note.realize()
+        else:
+            note.unrealize()
+
+    def remove(self, note_id):
+        self.notes.pop(note_id, None)
+        if self._bounds.pop(note_id, None) is not None:
+            self._extent = (max((b[2] for b in self._bounds.values()), default=0),
+                            max((b[3] for b in self._bounds.values()), default=0))
+            self.update_scroll_region()
+
+    def update_bounds(self, note):
+        """Запоминает положение и размер заметки (после перемещения или изменения размера)."""
+        data = note.data
+        bounds = (data['x'], data['y'], data['x'] + data['width'], data['y'] + data['height'])
+        old_bounds = self._bounds.get(note.note_id)
+        self._bounds[note.note_id] = bounds
+        if bounds[2] > self._extent[0] or bounds[3] > self._extent[1]:
+            self._extent = (max(self._extent[0], bounds[2]), max(self._extent[1], bounds[3]))
+        elif old_bounds is not None and (old_bounds[2] >= self._extent[0] or old_bounds[3] >= self._extent[1]):
+            # Крайняя заметка сдвинулась внутрь: граница пересчитывается по сохранённым границам
+            self._extent = (max(b[2] for b in self._bounds.values()), max(b[3] for b in self._bounds.values()))
+        else:
+            return
+        self.update_scroll_region()
+
+    def clear(self):
+        self.notes.clear()
+        self._bounds.clear()
+        self._extent = (0, 0)
+        self.update_scroll_region()
+
+    # --- Видимая область ---
+
+    def visible_rect(self):
+        x1, y1 = self.canvas.canvasx(0), self.canvas.canvasy(0)
+        return (x1 - self.margin, y1 - self.margin,
+                x1 + self.canvas.winfo_width() + self.margin, y1 + self.canvas.winfo_height() + self.margin)
+
+    @staticmethod
+    def _intersects(a, b):
+        return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+    def update_scroll_region(self):
+        """Область прокрутки - все заметки и не меньше окна холста; вызывает и пересчёт видимых заметок."""
+        width = max(self._extent[0] + self.margin, self.canvas.winfo_width())
+        height = max(self._extent[1] + self.margin, self.canvas.winfo_height())
+        self.canvas.config(scrollregion=(0, 0, width, height))
+        self.schedule_refresh()
+
+    def schedule_refresh(self):
+        if self._refresh_id is None:
+            self._refresh_id = self.canvas.after_idle(self.refresh)
+
+    def refresh(self):
+        """Строит виджеты заметок, вошедших в видимую область, и убирает у вышедших."""
+        self._refresh_id = None
+        rect = self.visible_rect()
+        focus = self.canvas.focus_get()
+        for note_id, note in list(self.notes.items()):
+            visible = self._intersects(self._bounds[note_id], rect)
+            if visible and not note.is_realized:
+                note.realize()
+            elif not visible and note.is_realized and not note.has_focus(focus):
+                note.unrealize()
+
+    # --- Прокрутка ---
+
+    def xview(self, *args):
+        self.canvas.xview(*args)
+        self.schedule_refresh()
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self.schedule_refresh()
+
+    def scroll_to(self, note_id):
+        """Прокручивает доску так, чтобы заметка оказалась у левого верхнего угла, и сразу строит её виджеты."""
+        bounds = self._bounds.get(note_id)
+        if bounds is None:
+            return
+        self.update_scroll_region()
+        x1, y1, x2, y2 = (float(v) for v in self.canvas.cget("scrollregion").split())
+        self.canvas.xview_moveto(max(0, bounds[0] - 10) / ((x2 - x1) or 1))
+        self.canvas.yview_moveto(max(0, bounds[1] - 10) / ((y2 - y1) or 1))
+        self.refresh()
+
+    def _scroll(self, axis, units):
+        (self.canvas.xview_scroll if axis == "x" else self.canvas.yview_scroll)(units, "units")
+        self.schedule_refresh()
+
+    def _on_mousewheel(self, event):
+        self._scroll("y", -1 if event.delta > 0 else 1)
+
+    def _on_pan(self, event):
+        self.canvas.scan_dragto(event.x, event.y, gain=1)
+        self.schedule_refresh()
@@ -0,0 +1,238 @@
+
+# module_records.py
+#
+# Компактные записи для кнопок, заметок, работ и таймеров. Вместо словаря на каждый объект
+# поля хранятся в __slots__, а ключи, которых нет в схеме, - в отдельном словаре extra.
+# Записи поддерживают интерфейс словаря (data['x'], get, items, update, in ...), поэтому
+# менеджеры и виджеты работают с ними как раньше. В JSON-словари они превращаются только
+# при записи на диск (module_config_storage.snapshot_config_data).
+#
+# Сравнение памяти: python module_records.py
+
+import sys
+import tracemalloc
+
+from module_config_schema import BUTTON_DEFAULTS, BUTTON_GRID_KEYS, NOTE_DEFAULTS
+
+_MISSING = object()
+
+BUTTON_FIELDS = tuple(BUTTON_DEFAULTS) + ("color",) + BUTTON_GRID_KEYS
+NOTE_FIELDS = tuple(NOTE_DEFAULTS)
+JOB_FIELDS = ("job_id", "timestamp", "device_name", "device_type", "work_type",
+              "time_worked", "declared_time", "author", "note")
+TIMER_FIELDS = ("device_name", "device_type", "work_type", "declared_time", "start_time", "elapsed_time",
+                "is_running", "pause_time", "total_paused_duration", "widget", "status_label",
+                "is_countdown", "duration", "completed", "blink_enabled", "blink_color", "blink_state")
+
+
+class Record:
+    """Запись с полями в __slots__ и интерфейсом словаря. Незаполненное поле - отсутствующий ключ."""
+
+    __slots__ = ("_extra",)
+    FIELDS = ()
+    _FIELD_SET = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._FIELD_SET = frozenset(cls.FIELDS)
+
+    def __init__(self, data=()):
+        self._extra = None
+        for key, value in dict(data).items():
+            self._assign(key, value)
+
+    def _assign(self, key, value):
+        if key in self._FIELD_SET:
+            object.__setattr__(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def _remove(self, key):
+        if key in self._FIELD_SET and hasattr(self, key):
+            object.__delattr__(self, key)
+        elif self._extra and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in self._FIELD_SET:
+            return getattr(self, key, default)
+        return self._extra.get(key, default) if self._extra else default
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._assign(key, value)
+
+    def __delitem__(self, key):
+        self._remove(key)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def items(self):
+        items = []
+        for field in self.FIELDS:
+            value = getattr(self, field, _MISSING)
+            if value is not _MISSING:
+                items.append((field, value))
+        if self._extra:
+            items.extend(self._extra.items())
+        return items
+
+    def keys(self):
+        return [key for key, _ in self.items()]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.items())
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        del self[key]
+        return value
+
+    def clear(self):
+        for key in self.keys():
+            del self[key]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class TrackedRecord(Record):
+    """Запись объекта модели: изменения полей попадают в ChangeLog (см. module_data_model)."""
+
+    __slots__ = ("object_id", "parent_id", "_log")
+    KIND = None
+
+    def __init__(self, data=(), object_id=None, parent_id=None, log=None):
+        super().__init__(data)
+        self.object_id = object_id
+        self.parent_id = parent_id
+        self._log = log
+
+    def _changed(self, fields):
+        if self._log is not None:
+            self._log.record(self.KIND, self.object_id, "update", fields, self.parent_id)
+
+    def __setitem__(self, key, value):
+        old = self.get(key, _MISSING)
+        self._assign(key, value)
+        if old is _MISSING or old is not value and old != value:
+            self._changed((key,))
+
+    def __delitem__(self, key):
+        self._remove(key)
+        self._changed((key,))
+
+
+class ButtonRecord(TrackedRecord):
+    KIND = "button"
+    FIELDS = BUTTON_FIELDS
+    __slots__ = FIELDS
+
+
+class NoteRecord(TrackedRecord):
+    KIND = "note"
+    FIELDS = NOTE_FIELDS
+    __slots__ = FIELDS
+
+    def attach_text(self, text):
+        """Подставляет текст, прочитанный из хранилища текстов (module_note_blobs), вместо превью.
+        Содержимое заметки не меняется, поэтому в журнал изменений ничего не пишется."""
+        self._assign("text", text)
+        if self._extra and "text_blob" in self._extra:
+            self._remove("text_blob")
+
+
+class TimerRecord(TrackedRecord):
+    KIND = "timer"
+    FIELDS = TIMER_FIELDS
+    __slots__ = FIELDS
+
+
+class JobRecord(Record):
+    """Выполненная работа. Изменения работ отмечает хранилище работ (module_job_store)."""
+
+    FIELDS = JOB_FIELDS
+    __slots__ = FIELDS
+
+
+# --- СРАВНЕНИЕ ПАМЯТИ ---
+
+def _traced_size(build):
+    """Объём памяти (байт), который занимает результат build(), по данным tracemalloc."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+def compare_memory(config_data):
+    """Память под кнопки, заметки и работы конфига: словари против записей. Значения полей общие в обоих случаях."""
+    samples = {
+        "ButtonRecord": (ButtonRecord, [b for tab in config_data["tabs"].values() for b in tab.get("buttons", {}).values()]),
+        "NoteRecord": (NoteRecord, list(config_data["notes"].values())),
+        "JobRecord": (JobRecord, config_data["completed_jobs"]),
+    }
+    results = []
+    for name, (record_class, items) in samples.items():
+        dict_bytes = _traced_size(lambda: [dict(item) for item in items])
+        record_bytes = _traced_size(lambda: [record_class(item) for item in items])
+        results.append({"record": name, "count": len(items), "dict_bytes": dict_bytes, "record_bytes": record_bytes})
+    return results
+
+
+if __name__ == "__main__":
+    # Использование: python module_records.py [путь_к_конфигу]
+    if len(sys.argv) > 1:
+        from module_config_storage import load_config_file, read_tab_buttons
+        from module_config_schema import normalize_config
+        data = load_config_file(sys.argv[1])
+        for tab_id, tab in data.get("tabs", {}).items():
+            if "buttons" not in tab:
+                tab["buttons"] = read_tab_buttons(sys.argv[1], tab_id)
+        normalize_config(data, "SystemButtonFace")
+        data.setdefault("completed_jobs", [])
+    else:
+        from pnsc_benchmark import SIZES, make_synthetic_config
+        data = make_synthetic_config(**SIZES["large"])
+    print(f"{'Запись':<16}{'Объектов':>10}{'dict, КБ':>12}{'Запись, КБ':>12}{'Экономия':>10}")
+    for row in compare_memory(data):
+        saving = 1 - row["record_bytes"] / row["dict_bytes"] if row["dict_bytes"] else 0
+        print(f"{row['record']:<16}{row['count']:>10}{row['dict_bytes'] / 1024:>12.0f}"
+              f"{row['record_bytes'] / 1024:>12.0f}{saving:>10.0%}")
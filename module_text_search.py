@@ -0,0 +1,213 @@
+
+# module_text_search.py
+#
+# Полнотекстовый поиск по заметкам (текст и название) и полю ТЕКСТ. Обратный индекс
+# "слово -> документы" обновляется по журналу изменений модели (ChangeLog): при поиске
+# переиндексируются только заметки, изменённые с прошлого поиска. Последнее слово запроса
+# ищется по началу слова (поиск по мере ввода). Найденное место показывается и подсвечивается.
+
+import re
+import bisect
+
+from pnsc_utils import tk
+from module_note_blobs import NOTE_BLOB_KEY, note_text
+
+TOKEN_RE = re.compile(r"\w+")
+MATCH_TAG = "search_match"
+TEXT_AREA_DOC = ("text_area", None)
+
+
+def tokenize(text):
+    """Слова текста без учёта регистра (буквы любых алфавитов, цифры и _)."""
+    return TOKEN_RE.findall(text.casefold())
+
+
+class InvertedIndex:
+    """Обратный индекс: для каждого слова - множество документов, в которых оно встречается."""
+
+    def __init__(self):
+        self._postings = {} # слово -> {doc_id}
+        self._doc_tokens = {} # doc_id -> frozenset слов
+        self._sorted_tokens = [] # Все слова по алфавиту: поиск по началу слова через bisect
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    def update(self, doc_id, text):
+        """Переиндексирует документ: меняются только списки слов, которые в нём появились или исчезли."""
+        new_tokens = frozenset(tokenize(text))
+        old_tokens = self._doc_tokens.get(doc_id, frozenset())
+        for token in old_tokens - new_tokens:
+            self._discard(token, doc_id)
+        for token in new_tokens - old_tokens:
+            docs = self._postings.get(token)
+            if docs is None:
+                docs = self._postings[token] = set()
+                bisect.insort(self._sorted_tokens, token)
+            docs.add(doc_id)
+        self._doc_tokens[doc_id] = new_tokens
+
+    def remove(self, doc_id):
+        for token in self._doc_tokens.pop(doc_id, ()):
+            self._discard(token, doc_id)
+
+    def _discard(self, token, doc_id):
+        docs = self._postings[token]
+        docs.discard(doc_id)
+        if not docs:
+            del self._postings[token]
+            del self._sorted_tokens[bisect.bisect_left(self._sorted_tokens, token)]
+
+    def _prefix_docs(self, prefix):
+        docs = set()
+        # Слова с этим началом идут в отсортированном списке подряд: от bisect до первого несовпадения
+        for i in range(bisect.bisect_left(self._sorted_tokens, prefix), len(self._sorted_tokens)):
+            token = self._sorted_tokens[i]
+            if not token.startswith(prefix):
+                break
+            docs |= self._postings[token]
+        return docs
+
+    def search(self, query):
+        """Документы, в которых есть все слова запроса (последнее - по началу слова)."""
+        tokens = tokenize(query)
+        if not tokens:
+            return set()
+        candidates = [self._postings.get(token, set()) for token in tokens[:-1]]
+        candidates.append(self._prefix_docs(tokens[-1]))
+        candidates.sort(key=len)
+        return set.intersection(*candidates) if candidates[0] else set()
+
+
+def highlight_matches(text_widget, query):
+    """Подсвечивает в виджете Text слова запроса (с начала слова) и прокручивает к первому совпадению."""
+    text_widget.tag_remove(MATCH_TAG, "1.0", tk.END)
+    text_widget.tag_configure(MATCH_TAG, background="#ffd54f")
+    first = None
+    count = tk.IntVar(text_widget)
+    for token in set(tokenize(query)):
+        start = "1.0"
+        while True:
+            # \m - начало слова в регулярных выражениях Tcl; слова запроса экранировать не нужно (\w+)
+            start = text_widget.search(r"\m" + token, start, stopindex=tk.END, regexp=True, nocase=True, count=count)
+            if not start or not count.get():
+                break
+            end = f"{start}+{count.get()}c"
+            text_widget.tag_add(MATCH_TAG, start, end)
+            if first is None or text_widget.compare(start, "<", first):
+                first = start
+            start = end
+    if first is not None:
+        text_widget.see(first)
+
+
+class TextSearchManager:
+    """Окно поиска по заметкам и полю ТЕКСТ; индекс догоняет изменения модели перед каждым поиском."""
+
+    def __init__(self, app):
+        self.app = app
+        self._index = InvertedIndex()
+        self._revision = None
+        self._text_area_content = None
+
+    def search_notes(self, query):
+        """Результаты поиска: TEXT_AREA_DOC и ("note", id заметки), заметки по названию."""
+        self._sync_index()
+        docs = self._index.search(query)
+        notes = sorted((doc for doc in docs if doc != TEXT_AREA_DOC),
+                       key=lambda doc: self.app.note_records[doc[1]]['note_name'].casefold())
+        return ([TEXT_AREA_DOC] if TEXT_AREA_DOC in docs else []) + notes
+
+    def _sync_index(self):
+        app = self.app
+        app.save_scheduler.run_pending() # Правки, ещё не снятые из виджетов заметок
+        change_set = app.model_changes.changes_since(self._revision)
+        self._revision = change_set.revision
+        if change_set.full_rebuild:
+            self._index = InvertedIndex()
+            self._text_area_content = None
+            for note_id in app.note_records: # Заметки всех досок, а не только показанной
+                self._index_note(note_id)
+        else:
+            for change in change_set:
+                if change.kind != "note":
+                    continue
+                if change.op == "remove" or change.object_id not in app.note_records:
+                    self._index.remove(("note", change.object_id))
+                elif change.op == "add" or {"text", "note_name", NOTE_BLOB_KEY} & set(change.fields):
+                    self._index_note(change.object_id)
+        content = app.text_area.get("1.0", "end-1c")
+        if content != self._text_area_content:
+            self._text_area_content = content
+            self._index.update(TEXT_AREA_DOC, content)
+
+    def _index_note(self, note_id):
+        data = self.app.note_records[note_id]
+        try:
+            # Незагруженный большой текст читается из хранилища, в заметку он не подставляется
+            text = note_text(self.app.current_config_path, data)
+        except OSError:
+            text = data['text']
+        self._index.update(("note", note_id), f"{data['note_name']}\n{text}")
+
+    def show_search_result(self, doc, query):
+        """Показывает найденную заметку (или поле ТЕКСТ) и подсвечивает совпадения."""
+        app = self.app
+        if doc == TEXT_AREA_DOC:
+            highlight_matches(app.text_area, query)
+            app.text_area.focus_set()
+            return
+        note_id = doc[1]
+        if note_id not in app.note_records:
+            return
+        board_id = app.note_board_of(app.note_records[note_id])
+        if board_id != app.active_note_board:
+            app.switch_note_board(board_id)
+        app.notes_viewport.scroll_to(note_id)
+        note_widget = app.notes[note_id]
+        if note_widget.is_realized:
+            highlight_matches(note_widget.text_area, query)
+
+    def open_search_dialog(self):
+        app = self.app
+        dialog = tk.Toplevel(app.master)
+        dialog.title("Поиск по заметкам")
+        app.center_window(dialog)
+        dialog.transient(app.master)
+
+        query_var = tk.StringVar()
+        query_entry = tk.Entry(dialog, textvariable=query_var)
+        query_entry.grid(row=0, column=0, padx=5, pady=5, sticky=tk.EW)
+        status_label = tk.Label(dialog, text="", anchor=tk.W)
+        status_label.grid(row=1, column=0, padx=5, sticky=tk.EW)
+        results_list = tk.Listbox(dialog, height=15, width=60)
+        results_list.grid(row=2, column=0, padx=5, pady=5, sticky=tk.NSEW)
+        results = []
+
+        def run_search(*args):
+            results[:] = self.search_notes(query_var.get())
+            results_list.delete(0, tk.END)
+            for doc in results:
+                if doc == TEXT_AREA_DOC:
+                    results_list.insert(tk.END, "Поле ТЕКСТ")
+                else:
+                    record = app.note_records[doc[1]]
+                    board_name = app.note_boards[app.note_board_of(record)]['name']
+                    results_list.insert(tk.END, f"{record['note_name']}  [{board_name}]")
+            status_label.config(text=f"Найдено: {len(results)}" if query_var.get().strip() else "")
+
+        def open_result(event=None):
+            selection = results_list.curselection()
+            if not selection and results:
+                selection = (0,)
+            if selection:
+                self.show_search_result(results[selection[0]], query_var.get())
+
+        query_var.trace_add("write", run_search)
+        results_list.bind("<<ListboxSelect>>", open_result)
+        results_list.bind("<Double-Button-1>", open_result)
+        dialog.bind("<Return>", open_result)
+        dialog.bind("<Escape>", lambda event: dialog.destroy())
+        dialog.columnconfigure(0, weight=1)
+        dialog.rowconfigure(2, weight=1)
+        query_entry.focus_set()
@@ -6,6 +6,8 @@ import os
 import sys
 
 class TimerWorkTableManager:
+    # Таймеры (app.active_timers) живут только в памяти и в конфиг не входят: их изменения ничего
+    # не сохраняют. На диск попадают лишь работы, записанные при остановке таймера (job_store.add).
     def __init__(self, app):
         self.app = app
         # Путь к звуковому файлу при срабатывании обратного таймера:
@@ -17,6 +19,8 @@ class TimerWorkTableManager:
         self.blink_interval = 500
         # Словарь для хранения after-id для мигания, чтобы можно было отменять
         self._blink_jobs = {}
+        # Таблица работ и ревизия модели (app.model_changes), с которой она синхронизирована
+        self._work_table_synced = None
 
     # Вспомогательная функция: проиграть звук (кроссплатформенно пытается разными способами)
     def _play_sound(self):
@@ -98,7 +102,7 @@ class TimerWorkTableManager:
                     self.app.device_types.sort()
                     device_type_combo['values'] = self.app.device_types
                     device_type_var.set(new_type)
-                    self.app.save_config(show_message=False)
+                    self._record_types()
                     new_type_dialog.destroy()
                 elif new_type in self.app.device_types:
                     self.app._show_messagebox("warning", "Предупреждение", "Такой тип устройства уже существует.")
@@ -140,7 +144,7 @@ class TimerWorkTableManager:
                     self.app.work_types.sort()
                     work_type_combo['values'] = self.app.work_types
                     work_type_var.set(new_type)
-                    self.app.save_config(show_message=False)
+                    self._record_types()
                     new_type_dialog.destroy()
                 elif new_type in self.app.work_types:
                     self.app._show_messagebox("warning", "Предупреждение", "Такой тип работ уже существует.")
@@ -267,7 +271,6 @@ class TimerWorkTableManager:
                 "blink_state": False                # внутреннее состояние мигания (true/false)
             }
             self.create_timer_widget(timer_id, self.app.active_timers[timer_id])
-            self.app.save_config(show_message=False)
             dialog.destroy()
 
         start_button = tk.Button(dialog, text="Старт", command=start_timer)
@@ -311,7 +314,6 @@ class TimerWorkTableManager:
                 if td["widget"]:
                     td["widget"].destroy()
                 del self.app.active_timers[tid]
-                self.app.save_config(show_message=False) # Сохраняем состояние после удаления
                 self.app.timers_list_frame.update_idletasks()
                 self.app.timers_canvas.config(scrollregion=self.app.timers_canvas.bbox("all"))
                 return
@@ -353,7 +355,6 @@ class TimerWorkTableManager:
         else:
             # Для основного таймера — прежнее поведение: остановить и записать работу
             self.stop_timer(timer_id)
-        self.app.save_config(show_message=False) # Сохраняем изменение состояния таймера
 
     def toggle_timer_pause(self, timer_id):
         # ПКМ: если завершён — обратный таймер удаляется (обработано в create_timer_widget);
@@ -396,7 +397,6 @@ class TimerWorkTableManager:
             self._cancel_blink(timer_id)
             self.update_timer_display(timer_id) # Сразу обновляем дисплей после возобновления
             self.app._show_messagebox("info", "Таймер", f"Таймер для '{td['device_name']}' возобновлен.")
-        self.app.save_config(show_message=False) # Сохраняем изменение состояния таймера
 
     def update_timer_display(self, timer_id):
         if timer_id not in self.app.active_timers:
@@ -445,7 +445,6 @@ class TimerWorkTableManager:
                         self._start_blink(timer_id, "red") # Начинаем мигать красным
                         self._play_sound() # Проигрываем звуковой сигнал
                         # Данные никуда не записываются (по условию для обратных таймеров)
-                        self.app.save_config(show_message=False) # Сохраняем состояние завершения
                         return # Прекращаем дальнейшее обновление для этого таймера
                 else:
                     # Основной таймер: прошедшее время
@@ -471,13 +470,12 @@ class TimerWorkTableManager:
 
         td = self.app.active_timers[timer_id]
         
-        # Если это обратный таймер, не записываем его в completed_jobs, просто удаляем виджет.
+        # Если это обратный таймер, не записываем его в таблицу работ, просто удаляем виджет.
         if td.get("is_countdown"):
             self._cancel_blink(timer_id)
             if td["widget"]:
                 td["widget"].destroy()
             del self.app.active_timers[timer_id]
-            self.app.save_config(show_message=False)
             self.app.timers_list_frame.update_idletasks()
             self.app.timers_canvas.config(scrollregion=self.app.timers_canvas.bbox("all"))
             return
@@ -502,7 +500,7 @@ class TimerWorkTableManager:
             "author": self.app.global_author,
             "note": ""  # Добавляем пустое поле "примечание" при создании записи из таймера
         }
-        self.app.completed_jobs.append(job_entry)
+        self.app.job_store.add(job_entry)
 
         self._cancel_blink(timer_id) # Отменяем мигание, если было
         if td["widget"]:
@@ -511,7 +509,6 @@ class TimerWorkTableManager:
         del self.app.active_timers[timer_id]
         
         self.app.update_work_table_display()
-        self.app.save_config(show_message=False)
         self.app.timers_list_frame.update_idletasks()
         self.app.timers_canvas.config(scrollregion=self.app.timers_canvas.bbox("all"))
 
@@ -528,7 +525,6 @@ class TimerWorkTableManager:
             else:
                 self.stop_timer(timer_id) # Обычная остановка для основного
         
-        self.app.save_config(show_message=False) # Сохраняем состояние после массовой остановки
         self.app.timers_list_frame.update_idletasks()
         self.app.timers_canvas.config(scrollregion=self.app.timers_canvas.bbox("all"))
         if show_message and active_timers_copy:
@@ -604,27 +600,29 @@ class TimerWorkTableManager:
                     pass # Игнорируем ошибки, если виджет уже удален
             td["blink_state"] = False
 
-    def treeview_sort_column(self, tree, col, reverse):
-        l = [(tree.set(k, col), k) for k in tree.get_children('')]
-        
-        def convert_value(val, col_name):
-            if "мин" in col_name:
-                try:
-                    return float(val.replace(',', '.')) if val else 0.0
-                except ValueError:
-                    return 0.0
-            elif "Время завершения" in col_name:
+    @staticmethod
+    def _sort_key_for_column(val, col_name):
+        """Ключ сортировки значения ячейки таблицы работ по заголовку столбца."""
+        if "мин" in col_name:
+            try:
+                return float(val.replace(',', '.')) if val else 0.0
+            except ValueError:
+                return 0.0
+        elif "Время завершения" in col_name:
+            try:
+                return datetime.fromisoformat(val) # Используем fromisoformat для лучшего парсинга
+            except ValueError:
+                # Fallback для старых версий python или других форматов
                 try:
-                    return datetime.fromisoformat(val) # Используем fromisoformat для лучшего парсинга
+                    return datetime.strptime(val, '%Y-%m-%d %H:%M:%S')
                 except ValueError:
-                    # Fallback для старых версий python или других форматов
-                    try:
-                        return datetime.strptime(val, '%Y-%m-%d %H:%M:%S')
-                    except ValueError:
-                        return datetime.min
-            return val.lower()
+                    return datetime.min
+        return val.lower()
 
-        l.sort(key=lambda t: convert_value(t[0], tree.heading(col, 'text')), reverse=reverse)
+    def treeview_sort_column(self, tree, col, reverse):
+        l = [(tree.set(k, col), k) for k in tree.get_children('')]
+        col_name = tree.heading(col, 'text')
+        l.sort(key=lambda t: self._sort_key_for_column(t[0], col_name), reverse=reverse)
 
         for index, (val, k) in enumerate(l):
             tree.move(k, '', index)
@@ -724,40 +722,62 @@ class TimerWorkTableManager:
         dialog.wait_window()
 
     def update_work_table_display(self):
-        if hasattr(self.app, 'work_table_tree') and self.app.work_table_tree and self.app.work_table_tree.winfo_exists():
-            for item in self.app.work_table_tree.get_children():
-                self.app.work_table_tree.delete(item)
-            
-            sorted_jobs = sorted(self.app.completed_jobs, key=lambda x: x.get('timestamp', 0), reverse=True)
-            
-            for job in sorted_jobs:
-                timestamp_str = datetime.fromtimestamp(job.get('timestamp', time.time())).strftime('%Y-%m-%d %H:%M:%S')
-                
-                time_worked_sec = job.get('time_worked', 0)
-                time_worked_min = time_worked_sec / 60.0
-                time_worked_str = f"{time_worked_min:.2f}"
-                
-                declared_time_sec = job.get('declared_time', 0)
-                declared_time_min = declared_time_sec / 60.0 if declared_time_sec > 0 else 0
-                declared_time_str = f"{declared_time_min:.2f}" if declared_time_min > 0 else ''
+        tree = getattr(self.app, 'work_table_tree', None)
+        if not tree or not tree.winfo_exists():
+            return
+        # Таблица уже заполнена: применяем только изменения работ с прошлого обновления
+        model_changes = getattr(self.app, 'model_changes', None)
+        if model_changes is not None and self._work_table_synced is not None and self._work_table_synced[0] is tree:
+            changes = model_changes.changes_since(self._work_table_synced[1])
+        else:
+            changes = None
+        if changes is None or changes.full_rebuild:
+            for item in tree.get_children():
+                tree.delete(item)
 
-                job_id = job.get('job_id', str(uuid.uuid4()))
+            sorted_jobs = self.app.job_store.iter_jobs(order_by="timestamp", descending=True)
 
-                self.app.work_table_tree.insert("", "end", iid=job_id, values=(
-                    timestamp_str,
-                    job.get("device_name", ""),
-                    job.get("device_type", ""),
-                    job.get("work_type", ""),
-                    time_worked_str,
-                    declared_time_str,
-                    job.get("author", "")
-                ))
+            for job in sorted_jobs:
+                job_id = job.get('job_id', str(uuid.uuid4()))
+                tree.insert("", "end", iid=job_id, values=self._work_table_row(job))
+        else:
+            for change in changes.of_kind("job"):
+                job = self.app.job_store.get(change.object_id) if change.op != "remove" else None
+                if job is None:
+                    if tree.exists(change.object_id):
+                        tree.delete(change.object_id)
+                elif tree.exists(change.object_id):
+                    tree.item(change.object_id, values=self._work_table_row(job))
+                else:
+                    # Новые работы - самые свежие, таблица по умолчанию отсортирована по убыванию времени
+                    tree.insert("", 0, iid=change.object_id, values=self._work_table_row(job))
+        if model_changes is not None:
+            self._work_table_synced = (tree, model_changes.revision)
+
+    @staticmethod
+    def _work_table_row(job):
+        timestamp_str = datetime.fromtimestamp(job.get('timestamp', time.time())).strftime('%Y-%m-%d %H:%M:%S')
+
+        time_worked_sec = job.get('time_worked', 0)
+        time_worked_min = time_worked_sec / 60.0
+        time_worked_str = f"{time_worked_min:.2f}"
+
+        declared_time_sec = job.get('declared_time', 0)
+        declared_time_min = declared_time_sec / 60.0 if declared_time_sec > 0 else 0
+        declared_time_str = f"{declared_time_min:.2f}" if declared_time_min > 0 else ''
+
+        return (
+            timestamp_str,
+            job.get("device_name", ""),
+            job.get("device_type", ""),
+            job.get("work_type", ""),
+            time_worked_str,
+            declared_time_str,
+            job.get("author", "")
+        )
 
     def _find_job_by_id(self, job_id):
-        for job in self.app.completed_jobs:
-            if job.get('job_id') == job_id:
-                return job
-        return None
+        return self.app.job_store.get(job_id)
 
     def open_job_editor_dialog(self, parent_dialog, job_data=None):
         is_editing = job_data is not None
@@ -853,13 +873,12 @@ class TimerWorkTableManager:
             }
             
             if is_editing:
-                job_data.update(new_job_data)
+                self.app.job_store.update(job_data.get("job_id"), new_job_data)
             else:
                 new_job_data["job_id"] = str(uuid.uuid4())
                 new_job_data["timestamp"] = time.time()
-                self.app.completed_jobs.append(new_job_data)
+                self.app.job_store.add(new_job_data)
 
-            self.app.save_config(show_message=False)
             self.app.update_work_table_display()
             dialog.destroy()
 
@@ -885,8 +904,7 @@ class TimerWorkTableManager:
         if job_to_delete and self.app._show_messagebox("askyesno", "Подтверждение удаления", 
                                                    f"Вы уверены, что хотите удалить запись о работе '{job_to_delete['device_name']}'?"):
             
-            self.app.completed_jobs.remove(job_to_delete)
-            self.app.save_config(show_message=False)
+            self.app.job_store.delete(job_id_to_delete)
             self.app.update_work_table_display()
 
     def edit_selected_job(self, parent_dialog):
@@ -904,7 +922,7 @@ class TimerWorkTableManager:
             self.open_job_editor_dialog(parent_dialog, job_data=job_data)
 
     def export_work_table_to_csv(self):
-        if not self.app.completed_jobs:
+        if not self.app.job_store.count():
             self.app._show_messagebox("warning", "Экспорт", "Нет данных для экспорта.")
             return
 
@@ -923,7 +941,7 @@ class TimerWorkTableManager:
                 header = ["Время завершения", "Устройство", "Тип устройства", "Тип работ", "Время работы (мин)", "Заявленное время (мин)", "Автор", "Примечание"]
                 writer.writerow(header)
 
-                for job in self.app.completed_jobs:
+                for job in self.app.job_store.iter_jobs():
                     timestamp_str = datetime.fromtimestamp(job.get('timestamp', time.time())).strftime('%Y-%m-%d %H:%M:%S')
                     time_worked_min = job.get('time_worked', 0) / 60.0
                     declared_time_min = job.get('declared_time', 0) / 60.0 if job.get('declared_time', 0) > 0 else 0
@@ -945,6 +963,10 @@ class TimerWorkTableManager:
         except Exception as e:
             self.app._show_messagebox("error", "Ошибка экспорта", f"Произошла ошибка при экспорте: {e}")
 
+    def _record_types(self):
+        # Переименование, добавление и удаление типов пишутся в журнал одной записью
+        self.app.record_change("types_set", device_types=self.app.device_types, work_types=self.app.work_types)
+
     def open_manage_types_dialog(self):
         dialog = tk.Toplevel(self.app.master)
         dialog.title("Управление типами")
@@ -1110,7 +1132,8 @@ class TimerWorkTableManager:
         def finalize_changes():
             self.app.work_types[:] = temp_work_types
             self.app.device_types[:] = temp_device_types
-            self.app.save_config(show_message=True)
+            self._record_types()
+            self.app._show_messagebox("info", "Управление типами", "Типы устройств и работ сохранены.")
 
             dialog.destroy()
 
@@ -0,0 +1,266 @@
+
+# pnsc_benchmark.py
+#
+# Бенчмарк слоя данных без открытия окон: загрузка (с диска, из кэша и снимка быстрого запуска)
+# и сохранение конфига, поиск работы по id, ключ сортировки таблицы работ и фильтр плавающего виджета
+# на синтетических конфигах разного размера.
+#
+# Использование:
+#   python pnsc_benchmark.py                                # все размеры, результат в stdout (JSON)
+#   python pnsc_benchmark.py --sizes small,medium -o run.json
+#   python pnsc_benchmark.py -o new.json --compare old.json # сравнение с прошлым запуском
+
+import gc
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+import statistics
+from datetime import datetime
+from types import SimpleNamespace
+
+from pnsc_utils import CONFIG_CODEC, CONFIG_GZIP
+from module_config_codec import HAS_ORJSON
+from module_config_storage import write_config, load_config_file, snapshot_config_data, read_tab_buttons
+from module_config_sections import select_config_sections
+from module_config_cache import ConfigCache, read_warm_start, write_warm_start
+from module_job_store import JsonJobStore, SqliteJobStore
+from module_timers_worktable import TimerWorkTableManager
+# floating_widget печатает предупреждение об отсутствии Pillow - оно не должно попасть в JSON на stdout
+with contextlib.redirect_stdout(sys.stderr):
+    from floating_widget import filter_buttons
+
+# Размеры синтетических конфигов: вкладки × кнопки на вкладке, заметки, выполненные работы
+SIZES = {
+    "small": {"tabs": 5, "buttons_per_tab": 20, "notes": 50, "jobs": 1000},
+    "medium": {"tabs": 20, "buttons_per_tab": 100, "notes": 200, "jobs": 20000},
+    "large": {"tabs": 50, "buttons_per_tab": 200, "notes": 500, "jobs": 100000},
+}
+# Число поисков работы по id в одном замере
+JOB_LOOKUPS = 1000
+# Отношение нового времени к старому, начиная с которого замер считается регрессией
+REGRESSION_THRESHOLD = 1.2
+
+
+def make_synthetic_config(tabs, buttons_per_tab, notes, jobs, seed=0):
+    """Синтетический конфиг той же структуры, что сохраняет PNSc."""
+    rnd = random.Random(seed)
+    words = ["драйвер", "принтер", "сеть", "пароль", "ошибка", "обновление", "диск", "почта", "отчёт", "замена"]
+    device_types = ["ПК", "Ноутбук", "Принтер", "МФУ", "Монитор"]
+    work_types = ["Ремонт", "Диагностика", "Установка ПО", "Чистка", "Замена"]
+    authors = ["Иванов", "Петров", "Сидоров"]
+
+    config_tabs = {}
+    for t in range(tabs):
+        buttons = {}
+        for b in range(buttons_per_tab):
+            buttons[f"button-{t}-{b}"] = {
+                "text": f"Кнопка {b} {rnd.choice(words)}",
+                "output": " ".join(rnd.choice(words) for _ in range(30)),
+                "color": "#f0f0f0", "text_color": "#000000", "font_size": 10,
+                "font_family": "Arial", "font_style": "normal", "new_line": True,
+                "clear_text": False, "icon": "",
+                "x": (b % 10) * 110, "y": (b // 10) * 40, "width": 100, "height": 30,
+                "snap_to_grid": True, "grid_size_x": 10, "grid_size_y": 10,
+            }
+        config_tabs[f"tab-{t}"] = {"name": f"Вкладка {t}", "buttons": buttons,
+                                   "snap_to_grid": True, "grid_size_x": 10, "grid_size_y": 10}
+
+    config_notes = {
+        f"note-{n}": {
+            "text": " ".join(rnd.choice(words) for _ in range(80)),
+            "x": rnd.randint(0, 2000), "y": rnd.randint(0, 2000), "width": 200, "height": 150,
+            "bg_color": "#ffffcc", "text_color": "#000000", "font_size": 10, "font_family": "Arial",
+            "bg_image": "", "note_name": f"Заметка {n}",
+        }
+        for n in range(notes)
+    }
+
+    start = 1700000000
+    completed_jobs = [
+        {
+            "job_id": f"job-{j}",
+            "device_name": f"Устройство {rnd.randint(1, 500)}",
+            "device_type": rnd.choice(device_types),
+            "work_type": rnd.choice(work_types),
+            "time_worked": rnd.uniform(60, 7200),
+            "declared_time": rnd.choice([0, 600, 1800]),
+            "timestamp": start + j * 60,
+            "author": rnd.choice(authors),
+            "note": "",
+        }
+        for j in range(jobs)
+    ]
+
+    return {
+        "tabs": config_tabs,
+        "notes": config_notes,
+        "device_types": device_types,
+        "work_types": work_types,
+        "completed_jobs": completed_jobs,
+        "text_area_content": "",
+        "global_author": authors[0],
+    }
+
+
+def measure(func, repeat):
+    """Выполняет func repeat раз, возвращает лучшее и медианное время в мс.
+    Как и timeit, на время замера отключает сборщик мусора, чтобы паузы GC не искажали результат."""
+    times = []
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append((time.perf_counter() - start) * 1000)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {"best_ms": round(min(times), 3), "median_ms": round(statistics.median(times), 3), "runs": repeat}
+
+
+def _work_table_rows(jobs):
+    """Значения ячеек таблицы работ в том виде, в каком их сортирует treeview_sort_column."""
+    return [
+        (datetime.fromtimestamp(job["timestamp"]).strftime('%Y-%m-%d %H:%M:%S'),
+         f"{job['time_worked'] / 60.0:.2f}",
+         job["device_name"])
+        for job in jobs
+    ]
+
+
+def run_size(size_name, params, repeat, work_dir):
+    config_data = make_synthetic_config(**params)
+    results = {}
+
+    # --- Конфиг: сохранение всех секций, одной секции и загрузка ---
+    config_path = os.path.join(work_dir, size_name)
+    write_config(config_path, snapshot_config_data(config_data))
+    results["load_config"] = measure(lambda: load_config_file(config_path), repeat)
+    # Возврат к недавнему конфигу через кэш: отпечаток файлов вместо чтения и разбора
+    cache, loaded = ConfigCache(), load_config_file(config_path)
+    results["switch_config_cached"] = measure(lambda: cache.put(config_path, loaded) or cache.take(config_path), repeat)
+    write_warm_start(config_path, loaded)
+    results["load_config_warm_start"] = measure(lambda: read_warm_start(config_path), repeat)
+    # Кнопки вкладки читаются при первом открытии, а не вместе с конфигом
+    results["load_tab_buttons"] = measure(lambda: read_tab_buttons(config_path, next(iter(config_data["tabs"]))), repeat)
+    results["save_config_notes_section"] = measure(
+        lambda: write_config(config_path, snapshot_config_data(select_config_sections(config_data, ("notes",)))), repeat)
+    results["save_config_full"] = measure(
+        lambda: write_config(config_path, snapshot_config_data(config_data)), repeat)
+
+    # --- Поиск работы по id (как при двойном клике и удалении в таблице работ) ---
+    jobs = config_data["completed_jobs"]
+    rnd = random.Random(1)
+    lookup_ids = [rnd.choice(jobs)["job_id"] for _ in range(JOB_LOOKUPS)]
+
+    def lookups(manager):
+        for job_id in lookup_ids:
+            manager._find_job_by_id(job_id)
+
+    json_store = JsonJobStore(jobs, lambda op, **fields: None)
+    json_manager = TimerWorkTableManager(SimpleNamespace(job_store=json_store))
+    results[f"find_job_by_id_json_x{JOB_LOOKUPS}"] = measure(lambda: lookups(json_manager), repeat)
+
+    sqlite_store = SqliteJobStore(os.path.join(work_dir, f"{size_name}.jobs.sqlite3"), reset=True)
+    sqlite_store.import_jobs(jobs)
+    sqlite_manager = TimerWorkTableManager(SimpleNamespace(job_store=sqlite_store))
+    results[f"find_job_by_id_sqlite_x{JOB_LOOKUPS}"] = measure(lambda: lookups(sqlite_manager), repeat)
+    sqlite_store.close()
+
+    # --- Ключ сортировки таблицы работ ---
+    rows = _work_table_rows(jobs)
+    sort_key = TimerWorkTableManager._sort_key_for_column
+    for column, index in (("Время завершения", 0), ("Время работы (мин)", 1), ("Устройство", 2)):
+        results[f"work_table_sort[{column}]"] = measure(
+            lambda: sorted(rows, key=lambda row: sort_key(row[index], column)), repeat)
+
+    # --- Фильтр плавающего виджета ---
+    tabs_data = {tid: {"name": tab["name"], "buttons": tab["buttons"]} for tid, tab in config_data["tabs"].items()}
+    results["floating_filter[empty]"] = measure(lambda: filter_buttons(tabs_data, ""), repeat)
+    results["floating_filter[принтер]"] = measure(lambda: filter_buttons(tabs_data, "Принтер"), repeat)
+
+    return {"params": params, "benchmarks": results}
+
+
+def run_benchmarks(size_names, repeat):
+    work_dir = tempfile.mkdtemp(prefix="pnsc_bench_")
+    try:
+        sizes = {name: run_size(name, SIZES[name], repeat, work_dir) for name in size_names}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "codec": CONFIG_CODEC + ("+gzip" if CONFIG_GZIP else ""),
+            "orjson": HAS_ORJSON,
+            "repeat": repeat,
+        },
+        "sizes": sizes,
+    }
+
+
+def compare_results(old, new, threshold=REGRESSION_THRESHOLD):
+    """Печатает отношение времени нового запуска к старому. Возвращает список регрессий."""
+    regressions = []
+    print(f"{'Замер':<48}{'Было, мс':>12}{'Стало, мс':>12}{'Отношение':>12}", file=sys.stderr)
+    for size_name, size_result in new["sizes"].items():
+        old_benchmarks = old.get("sizes", {}).get(size_name, {}).get("benchmarks", {})
+        for name, result in size_result["benchmarks"].items():
+            if name not in old_benchmarks:
+                continue
+            before, after = old_benchmarks[name]["best_ms"], result["best_ms"]
+            ratio = after / before if before else float("inf")
+            mark = ""
+            if ratio > threshold:
+                regressions.append(f"{size_name}/{name}")
+                mark = "  <-- регрессия"
+            print(f"{size_name + '/' + name:<48}{before:>12.3f}{after:>12.3f}{ratio:>12.2f}{mark}", file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк слоя данных PNSc (без GUI)")
+    parser.add_argument("--sizes", default=",".join(SIZES), help=f"размеры через запятую: {', '.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=5, help="число повторов каждого замера")
+    parser.add_argument("-o", "--output", help="файл для результатов в JSON (по умолчанию stdout)")
+    parser.add_argument("--compare", help="JSON прошлого запуска для сравнения")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="отношение времени, начиная с которого замер считается регрессией")
+    args = parser.parse_args(argv)
+
+    size_names = [name.strip() for name in args.sizes.split(",") if name.strip()]
+    unknown = [name for name in size_names if name not in SIZES]
+    if unknown:
+        parser.error(f"неизвестные размеры: {', '.join(unknown)}")
+
+    results = run_benchmarks(size_names, args.repeat)
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            old_results = json.load(f)
+        regressions = compare_results(old_results, results, args.threshold)
+        if regressions:
+            print(f"Регрессии: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,28 @@
 
 # pnsc_main.py
 
-from pnsc_utils import tk, ttk, filedialog, messagebox, colorchooser, uuid, os, json, time, datetime, tkFont, Image, ImageTk, HAS_PILLOW, CONTROL_ICONS
+from pnsc_utils import tk, ttk, filedialog, messagebox, colorchooser, uuid, os, json, time, datetime, tkFont, Image, ImageTk, HAS_PILLOW, CONTROL_ICONS, BACKUP_INTERVAL_MS
 from module_notes import NoteWidget, NoteManager
 from module_buttons_tabs import ButtonWidget, ButtonTabManager
 from module_timers_worktable import TimerWorkTableManager
+from module_config_storage import SaveScheduler, snapshot_config_data, load_config_file, import_legacy_config, read_tab_buttons
+from module_config_sections import is_sectioned_config, resolve_config_path, select_config_sections
+from module_config_journal import ConfigJournal, journal_record_key
+from module_job_store import JsonJobStore, open_job_store
+from module_data_model import ChangeLog, TabMap, TimerMap
+from module_config_cache import ConfigCache, config_signature, read_warm_start, write_warm_start
+from module_config_schema import CONFIG_SCHEMA_VERSION, normalize_config
+from module_config_backup import ConfigBackups
+from module_config_watcher import ConfigReloadManager
+from module_config_merge import LocalChangeTracker, merge_config_data
+from module_config_index import update_config_index, read_config_index, recent_config_names, describe_config
+from module_config_bundle import export_bundle, import_bundle
+from module_image_pipeline import NoteImagePipeline
+from module_notes_viewport import NotesViewport
+from module_text_search import TextSearchManager
+from module_event_coalescer import EventCoalescer
+from module_note_blobs import load_note_texts
+from module_note_boards import NoteBoardManager, normalize_note_boards, DEFAULT_NOTE_BOARD
 
 # Импортируем плавающий виджет
 try:
@@ -38,8 +56,13 @@ class PNSc:
         self.config_dir = "configs"
         self.current_config_path = None
         self.current_config_name = None
-        self.tabs = {}
-        self.notes = {}
+        self.model_changes = ChangeLog() # Журнал изменений вкладок, кнопок, заметок, работ и таймеров
+        self.tabs = self._new_tab_map()
+        self.notes = {} # Виджеты заметок активной доски
+        self.note_records = {} # Записи заметок всех досок
+        self.note_boards, self.active_note_board = normalize_note_boards(None), DEFAULT_NOTE_BOARD
+        self.note_images = NoteImagePipeline(self.master) # Фоны заметок: кэш и масштабирование в фоне
+        self.event_coalescer = EventCoalescer(self.master) # Перетаскивание, изменение размера и <Configure> - раз за кадр
         self.selected_tab_id = None
         self.default_button_color = "SystemButtonFace"
         self.active_button_widgets = {} 
@@ -51,6 +74,21 @@ class PNSc:
         # Экземпляр плавающего виджета
         self.floating_widget_instance = None
 
+        # Отложенное фоновое сохранение конфига и журнал мелких изменений
+        self.config_journal = None
+        self.config_cache = ConfigCache() # Недавние конфиги в памяти для быстрого переключения
+        self.config_watcher = None # Наблюдение за файлами конфига (start_config_watch)
+        # Конфиг в общей папке могут менять другие экземпляры PNSc: запись сливается с их изменениями
+        self.local_changes = LocalChangeTracker(self.model_changes)
+        self._merge_reload_pending = False
+        self.save_scheduler = SaveScheduler(self.master, self._collect_config_data, on_error=self._on_background_save_error,
+                                            journal_func=lambda: self.config_journal, on_written=self._on_config_written,
+                                            merge_func=merge_config_data, changes_func=self.local_changes.take,
+                                            index_func=update_config_index)
+        # Резервные копии конфига пишутся в фоне: по расписанию и перед опасными операциями
+        self.config_backups = ConfigBackups(); self._backup_state = None
+        if BACKUP_INTERVAL_MS: self.master.after(BACKUP_INTERVAL_MS, self._scheduled_backup)
+
         # --- ИНИЦИАЛИЗАЦИЯ МЕНЕДЖЕРОВ (МИКСИНОВ) ---
         self._setup_managers()
 
@@ -70,12 +108,13 @@ class PNSc:
         # --- Инициализация данных ---
         self.device_types = []
         self.work_types = []
-        self.active_timers = {}
-        self.completed_jobs = []
+        self.active_timers = TimerMap(log=self.model_changes)
+        self.job_store = JsonJobStore([], self.record_change, self.model_changes) # Выполненные работы (в конфиге или в SQLite)
         self.work_table_tree = None
 
         self.update_tab_display()
         self.load_default_config_if_needed()
+        self.start_config_watch()
         
     def _load_ico_icon(self):
         app_icon_path_ico = CONTROL_ICONS.get("main_app_icon_ico")
@@ -87,7 +126,8 @@ class PNSc:
 
     def _setup_managers(self):
         # Создаем менеджеры. ButtonTabManager создается один раз здесь для миксина.
-        managers = [NoteManager(self), ButtonTabManager(self), TimerWorkTableManager(self)]
+        managers = [NoteManager(self), ButtonTabManager(self), TimerWorkTableManager(self), ConfigReloadManager(self),
+                    TextSearchManager(self), NoteBoardManager(self)]
         
         for manager in managers:
             for name in dir(manager):
@@ -101,6 +141,8 @@ class PNSc:
         self.filemenu.add_command(label="Сохранить конфиг", command=self.save_config)
         self.filemenu.add_command(label="Сохранить конфиг как...", command=self.save_config_as)
         self.filemenu.add_command(label="Загрузить конфиг", command=self.load_config_dialog)
+        self.filemenu.add_command(label="Экспорт пакета конфига...", command=self.export_config_bundle)
+        self.filemenu.add_command(label="Импорт пакета конфига...", command=self.import_config_bundle)
         self.filemenu.add_separator()
         self.filemenu.add_checkbutton(label="Показывать диалоговые окна", onvalue=True, offvalue=False, variable=self.show_dialogs_var)
         self.filemenu.add_separator()
@@ -125,15 +167,25 @@ class PNSc:
         self.work_table_button = self._create_control_button(self.top_toolbar, "Таблица работ", self.open_work_table_dialog, "work_table")
         self.work_table_button.pack(side=tk.LEFT, padx=5, pady=5)
 
+        self.search_button = self._create_control_button(self.top_toolbar, "Поиск", self.open_search_dialog, "search")
+        self.search_button.pack(side=tk.LEFT, padx=5, pady=5)
+        self.master.bind("<Control-f>", lambda e: self.open_search_dialog())
+
     def _setup_main_layout(self):
         self.main_vertical_pane = ttk.PanedWindow(self.master, orient=tk.VERTICAL)
         self.main_vertical_pane.pack(fill="both", expand=True, padx=5, pady=5)
 
         self.notes_frame_container = tk.Frame(self.main_vertical_pane, bg="#f8f8f8", bd=2, relief="groove")
         self.main_vertical_pane.add(self.notes_frame_container, weight=1)
+        self.note_boards_bar = tk.Frame(self.notes_frame_container, bg="#e0e0e0"); self.note_boards_bar.pack(side=tk.TOP, fill="x")
+        notes_yscroll = tk.Scrollbar(self.notes_frame_container, orient=tk.VERTICAL); notes_yscroll.pack(side=tk.RIGHT, fill="y")
+        notes_xscroll = tk.Scrollbar(self.notes_frame_container, orient=tk.HORIZONTAL); notes_xscroll.pack(side=tk.BOTTOM, fill="x")
         self.notes_canvas = tk.Canvas(self.notes_frame_container, bg="#f8f8f8", highlightthickness=0)
         self.notes_canvas.pack(fill="both", expand=True)
+        # Виджеты строятся только для видимых заметок, остальные рисуются заготовками
+        self.notes_viewport = NotesViewport(self.notes_canvas, notes_xscroll, notes_yscroll)
         self.notes_frame_container.bind("<Configure>", self._on_notes_frame_configure)
+        self.update_note_board_display()
 
         self.tabs_container_frame = tk.Frame(self.main_vertical_pane, bg="#e0e0e0")
         self.main_vertical_pane.add(self.tabs_container_frame, weight=3)
@@ -207,6 +259,7 @@ class PNSc:
         self.text_scrollbar.pack(side=tk.RIGHT, fill="y", padx=(0,5), pady=5)
         self.text_area["yscrollcommand"] = self.text_scrollbar.set
         self.text_area.bind("<Button-3>", self.show_text_area_context_menu)
+        self.text_area.bind("<<Modified>>", self._on_text_area_modified)
 
     # --- МЕТОДЫ УПРАВЛЕНИЯ ПЛАВАЮЩИМ ВИДЖЕТОМ ---
     def toggle_floating_widget(self):
@@ -288,16 +341,31 @@ class PNSc:
         if self._show_messagebox("askyesno", "Выход", "Вы хотите сохранить конфиг перед выходом?"):
             self.save_config()
         
+        self.backup_config("stop_all_timers") # Копия до остановки таймеров и записи работ
         self.stop_all_timers()
+        # Гарантированно дописываем отложенные автосохранения перед выходом
+        error = self.save_scheduler.shutdown()
+        if error:
+            self._show_messagebox("error", "Ошибка", f"Не удалось сохранить: {error}")
+        elif self.current_config_path:
+            self._write_warm_start()
+        self.job_store.close()
+        if self.config_watcher: self.config_watcher.stop()
+        self.config_backups.shutdown()
+        self.note_images.shutdown()
         self.master.destroy()
 
     def _get_first_tab_id(self):
         return list(self.tabs.keys())[0] if self.tabs else None
 
     def _on_notes_frame_configure(self, event):
-        self.notes_canvas.config(scrollregion=self.notes_canvas.bbox("all"))
+        # По сохранённым границам заметок, без bbox("all"), не чаще раза за кадр
+        self.event_coalescer.post("notes_frame_configure", lambda e: self.notes_viewport.update_scroll_region(), event)
 
     def _on_timers_frame_configure(self, event):
+        self.event_coalescer.post("timers_frame_configure", self._update_timers_scroll_region, event)
+
+    def _update_timers_scroll_region(self, event=None):
         self.timers_canvas.config(scrollregion=self.timers_canvas.bbox("all"))
 
     def _on_timers_canvas_configure(self, event):
@@ -334,7 +402,7 @@ class PNSc:
 
         def save_author():
             self.global_author = author_entry.get().strip()
-            self.save_config(show_message=False)
+            self.save_config(show_message=False, sections=("user",))
             dialog.destroy()
 
         tk.Button(dialog, text="Сохранить", command=save_author).grid(row=1, column=0, columnspan=2, padx=5, pady=5)
@@ -362,33 +430,117 @@ class PNSc:
         def save_new_config():
             config_name = name_entry.get().strip()
             if not config_name: return
+            self.backup_config("create_config")
+            self._flush_pending_save()
             self.current_config_name = config_name
-            self.current_config_path = os.path.join(self.config_dir, f"{config_name}.json")
-            self.tabs = {}; self.notes = {}; self.completed_jobs = []
-            self.clear_notes(); self.update_tab_display(); self.save_config()
+            self.current_config_path = os.path.join(self.config_dir, config_name)
+            self.config_journal = ConfigJournal(self.current_config_path, reset=True)
+            self.tabs = self._new_tab_map(); self._open_job_store({}, reset=True)
+            self.clear_notes(); self.load_note_boards({})
+            self.model_changes.invalidate(); self._mark_config_synced(config_signature(self.current_config_path))
+            self.update_tab_display(); self.save_config()
             dialog.destroy()
         
         tk.Button(dialog, text="Создать", command=save_new_config).grid(row=1, column=0, columnspan=2, padx=5, pady=5)
         dialog.wait_window()
 
-    def save_config(self, show_message=True):
-        if not self.current_config_path:
-            self.save_config_as()
-            return
-        notes_data_for_save = {nid: nw.data for nid, nw in self.notes.items()}
+    def _collect_config_data(self, sections=None):
+        """Снимает копию изменённых секций конфига в потоке Tk для фоновой записи."""
+        if not self.current_config_path: return None
+        self.save_scheduler.run_pending() # Текст правленых заметок снимается из виджетов только сейчас
         config_data = {
-            "tabs": self.tabs, "notes": notes_data_for_save,
+            "tabs": self.tabs, "button_color": self.default_button_color, "notes": self.note_records,
+            "note_boards": self.note_boards, "active_note_board": self.active_note_board,
             "device_types": self.device_types, "work_types": self.work_types,
-            "completed_jobs": self.completed_jobs,
             "text_area_content": self.text_area.get("1.0", tk.END).strip(),
-            "global_author": self.global_author 
+            "global_author": self.global_author, "schema_version": CONFIG_SCHEMA_VERSION
         }
+        self.job_store.export_to_config(config_data)
+        return self.current_config_path, snapshot_config_data(select_config_sections(config_data, sections))
+
+    def save_config(self, show_message=True, sections=None):
+        if not self.current_config_path:
+            self.save_config_as()
+            return
+        # Автосохранения только помечают секции изменёнными (None - все): запись уходит в фоновый поток
+        self.save_scheduler.mark_dirty(sections)
+        if not show_message: return
+        error = self.save_scheduler.flush()
+        if error:
+            self._show_messagebox("error", "Ошибка", f"Не удалось сохранить: {error}")
+        else:
+            self._show_messagebox("info", "Сохранение", "Конфиг сохранен.")
+
+    def record_change(self, op, **fields):
+        """Записывает мелкое изменение в журнал конфига вместо перезаписи всего файла."""
+        if self.config_journal is None:
+            self.save_config(show_message=False)
+            return
+        record = snapshot_config_data(dict(fields, op=op))
+        self.save_scheduler.add_record(journal_record_key(record), record)
+
+    def _new_tab_map(self, tabs=()):
+        """Вкладки с загрузкой кнопок из текущего конфига по требованию."""
+        return TabMap(tabs, log=self.model_changes,
+                      loader=lambda tab_id: read_tab_buttons(self.current_config_path, tab_id, self.tabs.get(tab_id),
+                                                            self.default_button_color))
+
+    def _open_job_store(self, config_data, reset=False):
+        """Открывает хранилище работ текущего конфига вместо предыдущего."""
+        self.job_store.close()
+        self.job_store = open_job_store(self.current_config_path, config_data, self.record_change, reset=reset,
+                                        changes=self.model_changes)
+
+    def _on_text_area_modified(self, event=None):
+        if not self.text_area.edit_modified(): return
+        self.text_area.edit_modified(False)
+        if self.current_config_path: self.save_config(show_message=False, sections=("text_area",))
+
+    def _flush_pending_save(self):
+        """Дописывает отложенные изменения текущего конфига (перед сменой пути конфига)."""
+        error = self.save_scheduler.flush()
+        if error: self._show_messagebox("error", "Ошибка", f"Не удалось сохранить: {error}")
+        elif self.current_config_path: self.config_cache.put(*self._collect_config_data())
+
+    def _write_warm_start(self):
+        """Снимок конфига для быстрого следующего запуска (конфиг уже целиком записан на диск)."""
         try:
-            with open(self.current_config_path, "w", encoding="utf-8") as f:
-                json.dump(config_data, f, indent=4, ensure_ascii=False)
-            if show_message: self._show_messagebox("info", "Сохранение", "Конфиг сохранен.")
+            write_warm_start(*self._collect_config_data())
         except Exception as e:
-            self._show_messagebox("error", "Ошибка", f"Не удалось сохранить: {e}")
+            print(f"Ошибка записи снимка быстрого запуска: {e}")
+
+    def backup_config(self, reason):
+        """Ставит в очередь резервную копию текущего конфига (см. module_config_backup)."""
+        if not self.current_config_path: return
+        path, config_data = self._collect_config_data()
+        self._backup_state = self._config_change_state()
+        self.config_backups.backup(path, config_data, reason, getattr(self.job_store, "db_path", None))
+
+    def _config_change_state(self):
+        return self.current_config_path, self.model_changes.revision, self.save_scheduler.generation
+
+    def _scheduled_backup(self):
+        # Конфиг не менялся с прошлой копии: снимок данных даже не собирается
+        if self._config_change_state() != self._backup_state: self.backup_config("schedule")
+        self.master.after(BACKUP_INTERVAL_MS, self._scheduled_backup)
+
+    def _mark_config_synced(self, signature):
+        """Данные в памяти совпадают с файлами конфига (отпечаток signature снят до их чтения)."""
+        self.local_changes.mark_synced()
+        self.save_scheduler.set_synced(self.current_config_path, signature)
+
+    def _on_config_written(self, merged=False, written=None):
+        # В записанный конфиг попали изменения другого экземпляра: применяем их, когда запись закончена
+        if merged: self._merge_reload_pending = True
+        if self._merge_reload_pending and self.save_scheduler.is_idle():
+            self._merge_reload_pending = False
+            self.reload_config_changes()
+        # Свои записи - не внешние изменения: принимается отпечаток, снятый сразу после записи, а не текущий
+        path = self.current_config_path
+        if self.config_watcher and path in (written or {}): self.config_watcher.accept("config", path, written[path])
+
+    def _on_background_save_error(self, error):
+        self._show_messagebox("error", "Ошибка", f"Не удалось сохранить: {error}")
 
     def save_config_as(self):
         dialog = tk.Toplevel(self.master)
@@ -400,8 +552,16 @@ class PNSc:
         def perform_save_as():
             name = name_entry.get().strip()
             if name:
+                self._flush_pending_save()
+                path = os.path.join(self.config_dir, name)
+                if path != self.current_config_path:
+                    self.tabs.load_all() # Кнопки невыгруженных вкладок остаются только в старом конфиге
+                    load_note_texts(self.current_config_path, self.note_records.values()) # И большие тексты заметок
+                    self.config_journal = ConfigJournal(path, reset=True)
+                    self.job_store.relocate(path)
                 self.current_config_name = name
-                self.current_config_path = os.path.join(self.config_dir, f"{name}.json")
+                self.current_config_path = path
+                self._mark_config_synced(config_signature(path))
                 self.save_config()
                 dialog.destroy()
         
@@ -409,50 +569,102 @@ class PNSc:
         dialog.wait_window()
 
     def load_config_dialog(self):
-        configs = [f.replace(".json", "") for f in os.listdir(self.config_dir) if f.endswith('.json')]
+        # Конфиги по давности использования, сведения о них - из индекса, без чтения самих конфигов
+        index = read_config_index(self.config_dir)
+        configs = recent_config_names(self.config_dir, index)
         if not configs: return
         dialog = tk.Toplevel(self.master)
         config_var = tk.StringVar(value=configs[0])
-        ttk.Combobox(dialog, textvariable=config_var, values=configs).pack(padx=10, pady=10)
+        combo = ttk.Combobox(dialog, textvariable=config_var, values=configs); combo.pack(padx=10, pady=10)
+        info_label = tk.Label(dialog, text=describe_config(index.get(configs[0])), justify=tk.LEFT); info_label.pack(padx=10)
+        combo.bind("<<ComboboxSelected>>", lambda e: info_label.config(text=describe_config(index.get(config_var.get()))))
 
         def perform_load():
+            self._flush_pending_save()
             self.current_config_name = config_var.get()
-            self.current_config_path = os.path.join(self.config_dir, f"{self.current_config_name}.json")
+            self.current_config_path = resolve_config_path(self.config_dir, self.current_config_name)
             self.load_config()
             dialog.destroy()
 
         tk.Button(dialog, text="Загрузить", command=perform_load).pack(pady=5)
         dialog.wait_window()
 
+    def export_config_bundle(self):
+        """Пакет конфига с изображениями для переноса на другое рабочее место (module_config_bundle)."""
+        if not self.current_config_path: return
+        bundle_path = filedialog.asksaveasfilename(defaultextension=".zip", initialfile=f"{self.current_config_name}.zip",
+                                                   filetypes=[("Пакет конфига PNSc", "*.zip")])
+        if not bundle_path: return
+        self._flush_pending_save()
+        try:
+            path, config_data = self._collect_config_data()
+            count, missing = export_bundle(path, bundle_path, config_data, getattr(self.job_store, "db_path", None))
+        except Exception as e:
+            self._show_messagebox("error", "Ошибка", f"Не удалось экспортировать: {e}")
+            return
+        message = f"Пакет сохранен, изображений: {count}."
+        if missing: message += f"\nНе найдены файлы ({len(missing)}): " + ", ".join(missing[:5])
+        self._show_messagebox("info", "Экспорт", message)
+
+    def import_config_bundle(self):
+        bundle_path = filedialog.askopenfilename(filetypes=[("Пакет конфига PNSc", "*.zip")])
+        if not bundle_path: return
+        try:
+            config_path = import_bundle(bundle_path, self.config_dir)
+        except Exception as e:
+            self._show_messagebox("error", "Ошибка", f"Не удалось импортировать: {e}")
+            return
+        self._flush_pending_save()
+        self.current_config_name = os.path.basename(config_path)
+        self.current_config_path = config_path
+        self.load_config()
+
     def load_config(self):
         if not self.current_config_path: return
         try:
-            with open(self.current_config_path, "r", encoding="utf-8") as f:
-                config_data = json.load(f)
-            self.tabs = config_data.get("tabs", {})
-            self.clear_notes()
-            for nid, data in config_data.get("notes", {}).items():
-                self.notes[nid] = NoteWidget(self, self.notes_canvas, nid, data)
+            signature = config_signature(self.current_config_path) # До чтения: чужая запись во время чтения не потеряется
+            # Порядок: недавний конфиг из памяти, снимок быстрого запуска, чтение файлов конфига
+            config_data = (self.config_cache.take(self.current_config_path)
+                           or read_warm_start(self.current_config_path)
+                           or load_config_file(self.current_config_path))
+            # Однофайловый конфиг старого формата переводится в каталог с отдельными секциями
+            config_imported = not is_sectioned_config(self.current_config_path)
+            if config_imported: self.current_config_path = import_legacy_config(self.current_config_path)
+            # Значения по умолчанию заполняются один раз для конфига старой версии схемы
+            config_normalized = normalize_config(config_data, self.default_button_color)
+            self.tabs = self._new_tab_map(config_data.get("tabs", {}))
+            self.clear_notes(); self.load_note_boards(config_data) # Виджеты - только для заметок активной доски
             self.device_types = config_data.get("device_types", [])
             self.work_types = config_data.get("work_types", [])
-            self.completed_jobs = config_data.get("completed_jobs", [])
+            self._open_job_store(config_data)
             self.global_author = config_data.get("global_author", "") 
             self.text_area.delete("1.0", tk.END)
             self.text_area.insert(tk.END, config_data.get("text_area_content", ""))
+            self.text_area.edit_modified(False) # Загрузка текста - не правка пользователя, секция не пересохраняется
+            self.config_journal = ConfigJournal(self.current_config_path, reset=config_imported)
+            self.model_changes.invalidate() # Представления перестраиваются по новому конфигу целиком
+            self._mark_config_synced(config_signature(self.current_config_path) if config_imported else signature)
+            # После нормализации, переноса работ в SQLite или импорта конфиг пересохраняется целиком
+            if config_normalized or self.job_store.migrated or config_imported: self.save_config(show_message=False)
             self.update_tab_display()
             self.update_work_table_display()
+            update_config_index(self.current_config_path, config_data, opened=True)
         except Exception as e:
+            self.config_journal = None
             self._show_messagebox("error", "Ошибка", f"Не удалось загрузить: {e}")
 
     def load_default_config_if_needed(self):
-        configs = [f for f in os.listdir(self.config_dir) if f.endswith('.json')]
+        configs = recent_config_names(self.config_dir) # Первым идёт последний использованный конфиг
         if configs:
-            self.current_config_path = os.path.join(self.config_dir, configs[0])
-            self.current_config_name = configs[0].replace(".json", "")
+            self.current_config_path = resolve_config_path(self.config_dir, configs[0])
+            self.current_config_name = configs[0]
             self.load_config()
         else:
             self.current_config_name = "default"
-            self.current_config_path = os.path.join(self.config_dir, "default.json")
+            self.current_config_path = os.path.join(self.config_dir, "default")
+            self.config_journal = ConfigJournal(self.current_config_path, reset=True)
+            self._open_job_store({}, reset=True)
+            self._mark_config_synced(config_signature(self.current_config_path))
             self.save_config(show_message=False)
 
     def treeview_sort_column(self, tree, col, reverse):
@@ -1,10 +1,28 @@
 
 # pnsc_main.py
 
-from pnsc_utils import tk, ttk, filedialog, messagebox, colorchooser, uuid, os, json, time, datetime, tkFont, Image, ImageTk, HAS_PILLOW, CONTROL_ICONS
+from pnsc_utils import tk, ttk, filedialog, messagebox, colorchooser, uuid, os, json, time, datetime, tkFont, Image, ImageTk, HAS_PILLOW, CONTROL_ICONS, BACKUP_INTERVAL_MS
 from module_notes import NoteWidget, NoteManager
 from module_buttons_tabs import ButtonWidget, ButtonTabManager
 from module_timers_worktable import TimerWorkTableManager
+from module_config_storage import SaveScheduler, snapshot_config_data, load_config_file, import_legacy_config, read_tab_buttons
+from module_config_sections import is_sectioned_config, resolve_config_path, list_config_names, select_config_sections
+from module_config_journal import ConfigJournal, journal_record_key
+from module_job_store import JsonJobStore, open_job_store
+from module_data_model import ChangeLog, TabMap, TimerMap
+from module_config_cache import ConfigCache, config_signature, read_warm_start, write_warm_start
+from module_config_schema import CONFIG_SCHEMA_VERSION, normalize_config
+from module_config_backup import ConfigBackups
+from module_config_watcher import ConfigReloadManager
+from module_config_merge import LocalChangeTracker, merge_config_data
+from module_config_index import update_config_index, read_config_index, recent_config_names, describe_config
+from module_config_bundle import export_bundle, import_bundle
+from module_image_pipeline import NoteImagePipeline
+from module_notes_viewport import NotesViewport
+from module_text_search import TextSearchManager
+from module_event_coalescer import EventCoalescer
+from module_note_blobs import load_note_texts
+from module_note_boards import NoteBoardManager, normalize_note_boards, DEFAULT_NOTE_BOARD
 
 class PNSc:
     def __init__(self, master):
@@ -36,8 +54,17 @@ class PNSc:
         self.config_dir = "configs"
         self.current_config_path = None
         self.current_config_name = None
-        self.tabs = {}
+        self.model_changes = ChangeLog() # Журнал изменений вкладок, кнопок, заметок, работ и таймеров
+        self.tabs = self._new_tab_map()
+        # Записи заметок всех досок; виджеты (self.notes) строятся только для заметок активной доски
+        self.note_records = {}
         self.notes = {}
+        self.note_boards = normalize_note_boards(None)
+        self.active_note_board = DEFAULT_NOTE_BOARD
+        # Фоновые изображения заметок: декодированные файлы в кэше, качественное масштабирование в рабочем потоке
+        self.note_images = NoteImagePipeline(self.master)
+        # Частые события мыши и <Configure> копятся и применяются не чаще раза за кадр (~60 Гц)
+        self.event_coalescer = EventCoalescer(self.master)
         self.selected_tab_id = None
         self.default_button_color = "SystemButtonFace"
         self.active_button_widgets = {} 
@@ -46,6 +73,25 @@ class PNSc:
         self.edit_mode_active = tk.BooleanVar(value=False)
         self.control_icons = {}
 
+        # Отложенное фоновое сохранение конфига и журнал мелких изменений
+        self.config_journal = None
+        self.config_cache = ConfigCache() # Недавние конфиги в памяти для быстрого переключения
+        self.config_watcher = None # Наблюдение за файлами конфига (start_config_watch)
+        # Один конфиг в общей папке могут открыть несколько экземпляров PNSc: запись идёт под
+        # блокировкой и сливается с изменениями других экземпляров по id записей (module_config_merge)
+        self.local_changes = LocalChangeTracker(self.model_changes)
+        self._merge_reload_pending = False
+        self.save_scheduler = SaveScheduler(self.master, self._collect_config_data, on_error=self._on_background_save_error,
+                                            journal_func=lambda: self.config_journal, on_written=self._on_config_written,
+                                            merge_func=merge_config_data, changes_func=self.local_changes.take,
+                                            index_func=update_config_index)
+        # Резервные копии конфига (configs/.backups/) пишутся в фоновом потоке:
+        # по расписанию и перед операциями, которые заменяют или останавливают данные
+        self.config_backups = ConfigBackups()
+        self._backup_state = None # Состояние конфига на момент последней копии (_config_change_state)
+        if BACKUP_INTERVAL_MS:
+            self.master.after(BACKUP_INTERVAL_MS, self._scheduled_backup)
+
         # --- ИНИЦИАЛИЗАЦИЯ МЕНЕДЖЕРОВ (МИКСИНОВ) ---
         # Мы динамически добавляем методы менеджеров в главный класс
         self._setup_managers()
@@ -66,12 +112,14 @@ class PNSc:
         # --- Инициализация данных ---
         self.device_types = []
         self.work_types = []
-        self.active_timers = {}
-        self.completed_jobs = []
+        self.active_timers = TimerMap(log=self.model_changes)
+        self.job_store = JsonJobStore([], self.record_change, self.model_changes) # Выполненные работы (в конфиге или в SQLite)
         self.work_table_tree = None
 
         self.update_tab_display()
         self.load_default_config_if_needed()
+        # Изменения файлов конфига вне приложения применяются без перезагрузки всего конфига
+        self.start_config_watch()
         
     def _load_ico_icon(self):
         """Загружает ICO иконку как запасной вариант."""
@@ -87,7 +135,8 @@ class PNSc:
     def _setup_managers(self):
         """Динамически добавляет методы из модулей в класс PNSc."""
         
-        managers = [NoteManager(self), ButtonTabManager(self), TimerWorkTableManager(self)]
+        managers = [NoteManager(self), ButtonTabManager(self), TimerWorkTableManager(self), ConfigReloadManager(self),
+                    TextSearchManager(self), NoteBoardManager(self)]
         
         for manager in managers:
             for name in dir(manager):
@@ -102,6 +151,8 @@ class PNSc:
         self.filemenu.add_command(label="Сохранить конфиг", command=self.save_config)
         self.filemenu.add_command(label="Сохранить конфиг как...", command=self.save_config_as)
         self.filemenu.add_command(label="Загрузить конфиг", command=self.load_config_dialog)
+        self.filemenu.add_command(label="Экспорт пакета конфига...", command=self.export_config_bundle)
+        self.filemenu.add_command(label="Импорт пакета конфига...", command=self.import_config_bundle)
         self.filemenu.add_separator()
         self.filemenu.add_checkbutton(label="Показывать диалоговые окна", onvalue=True, offvalue=False, variable=self.show_dialogs_var)
         self.filemenu.add_separator()
@@ -127,6 +178,11 @@ class PNSc:
         self.work_table_button = self._create_control_button(self.top_toolbar, "Таблица работ", self.open_work_table_dialog, "work_table")
         self.work_table_button.pack(side=tk.LEFT, padx=5, pady=5)
 
+        # Поиск по тексту и названиям заметок и по полю ТЕКСТ (индекс обновляется по журналу изменений)
+        self.search_button = self._create_control_button(self.top_toolbar, "Поиск", self.open_search_dialog, "search")
+        self.search_button.pack(side=tk.LEFT, padx=5, pady=5)
+        self.master.bind("<Control-f>", lambda e: self.open_search_dialog())
+
     def _setup_main_layout(self):
         self.main_vertical_pane = ttk.PanedWindow(self.master, orient=tk.VERTICAL)
         self.main_vertical_pane.pack(fill="both", expand=True, padx=5, pady=5)
@@ -134,9 +190,20 @@ class PNSc:
         # Верхняя часть: Заметки
         self.notes_frame_container = tk.Frame(self.main_vertical_pane, bg="#f8f8f8", bd=2, relief="groove")
         self.main_vertical_pane.add(self.notes_frame_container, weight=1)
+        # Кнопки досок заметок (module_note_boards) - над холстом, как кнопки вкладок
+        self.note_boards_bar = tk.Frame(self.notes_frame_container, bg="#e0e0e0")
+        self.note_boards_bar.pack(side=tk.TOP, fill="x")
+        # Доска заметок больше окна: полосы прокрутки, колесо мыши и перетаскивание за свободное место
+        notes_yscroll = tk.Scrollbar(self.notes_frame_container, orient=tk.VERTICAL)
+        notes_yscroll.pack(side=tk.RIGHT, fill="y")
+        notes_xscroll = tk.Scrollbar(self.notes_frame_container, orient=tk.HORIZONTAL)
+        notes_xscroll.pack(side=tk.BOTTOM, fill="x")
         self.notes_canvas = tk.Canvas(self.notes_frame_container, bg="#f8f8f8", highlightthickness=0)
         self.notes_canvas.pack(fill="both", expand=True)
+        # Полноценные виджеты есть только у заметок в видимой области (module_notes_viewport)
+        self.notes_viewport = NotesViewport(self.notes_canvas, notes_xscroll, notes_yscroll)
         self.notes_frame_container.bind("<Configure>", self._on_notes_frame_configure)
+        self.update_note_board_display()
 
         # Средняя часть: Вкладки с кнопками
         self.tabs_container_frame = tk.Frame(self.main_vertical_pane, bg="#e0e0e0")
@@ -212,6 +279,7 @@ class PNSc:
         self.text_area["yscrollcommand"] = self.text_scrollbar.set
 
         self.text_area.bind("<Button-3>", self.show_text_area_context_menu)
+        self.text_area.bind("<<Modified>>", self._on_text_area_modified)
 
 
     # --- УТИЛИТЫ И КОНФИГ (ОСТАЮТСЯ В ГЛАВНОМ КЛАССЕ) ---
@@ -283,7 +351,19 @@ class PNSc:
         if self._show_messagebox("askyesno", "Выход", "Вы хотите сохранить конфиг перед выходом?"):
             self.save_config()
         
+        self.backup_config("stop_all_timers") # Копия до остановки таймеров и записи работ
         self.stop_all_timers()
+        # Гарантированно дописываем отложенные автосохранения перед выходом
+        error = self.save_scheduler.shutdown()
+        if error:
+            self._show_messagebox("error", "Ошибка сохранения", f"Не удалось сохранить конфиг: {error}")
+        elif self.current_config_path:
+            self._write_warm_start()
+        self.job_store.close()
+        if self.config_watcher:
+            self.config_watcher.stop()
+        self.config_backups.shutdown()
+        self.note_images.shutdown()
         self.master.destroy()
 
     def _get_first_tab_id(self):
@@ -292,9 +372,13 @@ class PNSc:
         return None
 
     def _on_notes_frame_configure(self, event):
-        self.notes_canvas.config(scrollregion=self.notes_canvas.bbox("all"))
+        # По сохранённым границам заметок, без bbox("all"), не чаще раза за кадр
+        self.event_coalescer.post("notes_frame_configure", lambda e: self.notes_viewport.update_scroll_region(), event)
 
     def _on_timers_frame_configure(self, event):
+        self.event_coalescer.post("timers_frame_configure", self._update_timers_scroll_region, event)
+
+    def _update_timers_scroll_region(self, event=None):
         self.timers_canvas.config(scrollregion=self.timers_canvas.bbox("all"))
 
     def _on_timers_canvas_configure(self, event):
@@ -334,7 +418,7 @@ class PNSc:
         def save_author():
             new_author = author_entry.get().strip()
             self.global_author = new_author
-            self.save_config(show_message=False)
+            self.save_config(show_message=False, sections=("user",))
             self._show_messagebox("info", "Сохранение", f"Имя автора сохранено: {new_author}")
             dialog.destroy()
 
@@ -374,24 +458,30 @@ class PNSc:
                 self._show_messagebox("warning", "Предупреждение", "Имя конфига не может быть пустым.")
                 return
 
-            potential_path = os.path.join(self.config_dir, f"{config_name}.json")
-            if os.path.exists(potential_path):
+            potential_path = os.path.join(self.config_dir, config_name)
+            if config_name in list_config_names(self.config_dir):
                 if not self._show_messagebox("askyesno", "Подтверждение", f"Конфиг '{config_name}' уже существует. Перезаписать?"):
                     return
 
+            # Дальше текущие вкладки, заметки и таймеры заменяются: сначала снимаем резервную копию
+            self.backup_config("create_config")
+            self._flush_pending_save()
             self.current_config_name = config_name
             self.current_config_path = potential_path
+            self.config_journal = ConfigJournal(potential_path, reset=True)
 
-            self.tabs = {}
-            self.notes = {}
+            self.tabs = self._new_tab_map()
             self.device_types = []
             self.work_types = []
-            self.completed_jobs = []
+            self._open_job_store({}, reset=True)
             self.global_author = "" 
             self.stop_all_timers() 
-            self.active_timers = {}
+            self.active_timers = TimerMap(log=self.model_changes)
 
             self.clear_notes()
+            self.load_note_boards({}) # Новый конфиг начинается с одной основной доски
+            self.model_changes.invalidate()
+            self._mark_config_synced(config_signature(potential_path))
             self.update_tab_display()
             self.update_work_table_display()
             self.save_config()
@@ -404,32 +494,140 @@ class PNSc:
         dialog.columnconfigure(1, weight=1)
         dialog.wait_window()
 
-    def save_config(self, show_message=True):
+    def _collect_config_data(self, sections=None):
+        """Снимает копию изменённых секций конфига в потоке Tk для фоновой записи."""
         if not self.current_config_path:
-            self.save_config_as()
-            return
+            return None
 
-        notes_data_for_save = {}
-        for note_id, note_widget in self.notes.items():
-            notes_data_for_save[note_id] = note_widget.data
-        
+        # Текст заметок, правленых после прошлой записи, снимается из виджетов только сейчас
+        self.save_scheduler.run_pending()
         config_data = {
             "tabs": self.tabs,
-            "notes": notes_data_for_save,
+            "button_color": self.default_button_color, # Цвет, который не записывается в кнопки при CONFIG_SPARSE
+            "notes": self.note_records, # Заметки всех досок, а не только построенные виджеты
+            "note_boards": self.note_boards,
+            "active_note_board": self.active_note_board,
             "device_types": self.device_types,
             "work_types": self.work_types,
-            "completed_jobs": self.completed_jobs,
             "text_area_content": self.text_area.get("1.0", tk.END).strip(),
-            "global_author": self.global_author 
+            "global_author": self.global_author,
+            "schema_version": CONFIG_SCHEMA_VERSION
         }
+        self.job_store.export_to_config(config_data)
+        return self.current_config_path, snapshot_config_data(select_config_sections(config_data, sections))
+
+    def save_config(self, show_message=True, sections=None):
+        if not self.current_config_path:
+            self.save_config_as()
+            return
 
+        # Автосохранения только помечают секции конфига изменёнными (sections=None - все секции):
+        # запись объединяется и уходит в фоновый поток, на диск пишутся только изменённые секции
+        self.save_scheduler.mark_dirty(sections)
+        if not show_message:
+            return
+
+        error = self.save_scheduler.flush()
+        if error:
+            self._show_messagebox("error", "Ошибка сохранения", f"Не удалось сохранить конфиг: {error}")
+        else:
+            self._show_messagebox("info", "Сохранение конфига", f"Конфиг '{self.current_config_name}' сохранен.")
+
+    def record_change(self, op, **fields):
+        """Записывает мелкое изменение (текст заметки, геометрию, работу, типы) в журнал
+        вместо перезаписи всего конфига. Журнал сворачивается в снимок в фоне."""
+        if self.config_journal is None:
+            self.save_config(show_message=False)
+            return
+        record = snapshot_config_data(dict(fields, op=op))
+        self.save_scheduler.add_record(journal_record_key(record), record)
+
+    def _new_tab_map(self, tabs=()):
+        """
+        Вкладки текущего конфига. Кнопки вкладки читаются с диска при первом открытии
+        (read_tab_buttons), поэтому при запуске загружается только список вкладок.
+        """
+        return TabMap(tabs, log=self.model_changes,
+                      loader=lambda tab_id: read_tab_buttons(self.current_config_path, tab_id, self.tabs.get(tab_id),
+                                                            self.default_button_color))
+
+    def _open_job_store(self, config_data, reset=False):
+        """Открывает хранилище работ текущего конфига вместо предыдущего."""
+        self.job_store.close()
+        self.job_store = open_job_store(self.current_config_path, config_data, self.record_change, reset=reset,
+                                        changes=self.model_changes)
+
+    def _on_text_area_modified(self, event=None):
+        if not self.text_area.edit_modified():
+            return
+        self.text_area.edit_modified(False)
+        if self.current_config_path:
+            self.save_config(show_message=False, sections=("text_area",))
+
+    def _flush_pending_save(self):
+        """Дописывает отложенные изменения текущего конфига (перед сменой пути конфига)."""
+        error = self.save_scheduler.flush()
+        if error:
+            self._show_messagebox("error", "Ошибка сохранения", f"Не удалось сохранить конфиг: {error}")
+        elif self.current_config_path:
+            # Записанное состояние остаётся в памяти: при возврате к конфигу он не перечитывается с диска
+            self.config_cache.put(*self._collect_config_data())
+
+    def _write_warm_start(self):
+        """Снимок конфига для быстрого следующего запуска (конфиг уже целиком записан на диск)."""
         try:
-            with open(self.current_config_path, "w", encoding="utf-8") as f:
-                json.dump(config_data, f, indent=4, ensure_ascii=False)
-            if show_message:
-                self._show_messagebox("info", "Сохранение конфига", f"Конфиг '{self.current_config_name}' сохранен.")
+            write_warm_start(*self._collect_config_data())
         except Exception as e:
-            self._show_messagebox("error", "Ошибка сохранения", f"Не удалось сохранить конфиг: {e}")
+            print(f"Ошибка записи снимка быстрого запуска: {e}")
+
+    def backup_config(self, reason):
+        """
+        Ставит в очередь резервную копию текущего конфига. Данные снимаются в потоке Tk,
+        а запись копии, удаление дубликатов и старых копий выполняются в фоне (module_config_backup).
+        """
+        if not self.current_config_path:
+            return
+        path, config_data = self._collect_config_data()
+        self._backup_state = self._config_change_state()
+        db_path = getattr(self.job_store, "db_path", None) # База работ SQLite копируется вместе с конфигом
+        self.config_backups.backup(path, config_data, reason, db_path)
+
+    def _config_change_state(self):
+        """
+        Отпечаток состояния конфига без сбора данных: путь, ревизия модели (ChangeLog)
+        и счётчик изменений, переданных на запись (поле ТЕКСТ, типы, автор не входят в модель).
+        """
+        return self.current_config_path, self.model_changes.revision, self.save_scheduler.generation
+
+    def _scheduled_backup(self):
+        # Если с прошлой копии конфиг не менялся, полный снимок данных в потоке Tk не собирается
+        if self._config_change_state() != self._backup_state:
+            self.backup_config("schedule")
+        self.master.after(BACKUP_INTERVAL_MS, self._scheduled_backup)
+
+    def _mark_config_synced(self, signature):
+        """Данные в памяти совпадают с файлами конфига, отпечаток которых signature снят до их чтения."""
+        self.local_changes.mark_synced()
+        self.save_scheduler.set_synced(self.current_config_path, signature)
+
+    def _on_config_written(self, merged=False, written=None):
+        """
+        Всё сохранённое записано на диск: наблюдатель не должен принять эти записи за внешние изменения.
+        written - отпечатки файлов, снятые сразу после записи: запись другого экземпляра, сделанная
+        между нашей записью и этим вызовом, от них отличается и будет перезагружена.
+        """
+        if merged:
+            # В записанный конфиг попали изменения другого экземпляра PNSc - их нужно показать и у нас
+            self._merge_reload_pending = True
+        if self._merge_reload_pending and self.save_scheduler.is_idle():
+            self._merge_reload_pending = False
+            self.reload_config_changes()
+        path = self.current_config_path
+        if self.config_watcher and written and path in written:
+            self.config_watcher.accept("config", path, written[path])
+
+    def _on_background_save_error(self, error):
+        self._show_messagebox("error", "Ошибка сохранения", f"Не удалось сохранить конфиг: {error}")
 
     def save_config_as(self):
         dialog = tk.Toplevel(self.master)
@@ -451,13 +649,22 @@ class PNSc:
                 self._show_messagebox("warning", "Предупреждение", "Имя конфига не может быть пустым.")
                 return
 
-            potential_path = os.path.join(self.config_dir, f"{config_name}.json")
-            if os.path.exists(potential_path) and potential_path != self.current_config_path:
+            potential_path = os.path.join(self.config_dir, config_name)
+            if config_name in list_config_names(self.config_dir) and potential_path != self.current_config_path:
                  if not self._show_messagebox("askyesno", "Подтверждение", f"Конфиг '{config_name}' уже существует. Перезаписать?"):
                     return
             
+            self._flush_pending_save()
+            if potential_path != self.current_config_path:
+                # Кнопки вкладок, которые ещё не открывались, есть только в файлах старого конфига
+                self.tabs.load_all()
+                # Большие тексты заметок, которые ещё не показывались, тоже лежат только в старом конфиге (blobs/)
+                load_note_texts(self.current_config_path, self.note_records.values())
+                self.config_journal = ConfigJournal(potential_path, reset=True)
+                self.job_store.relocate(potential_path)
             self.current_config_name = config_name
             self.current_config_path = potential_path
+            self._mark_config_synced(config_signature(potential_path))
             self.save_config()
             dialog.destroy()
         
@@ -468,7 +675,10 @@ class PNSc:
         dialog.wait_window()
 
     def load_config_dialog(self):
-        configs = [f.replace(".json", "") for f in os.listdir(self.config_dir) if f.endswith('.json')]
+        # Список по давности использования; сведения о конфигах берутся из индекса configs/.index.json,
+        # поэтому файлы самих конфигов при открытии окна не читаются
+        index = read_config_index(self.config_dir)
+        configs = recent_config_names(self.config_dir, index)
         if not configs:
             self._show_messagebox("warning", "Загрузка конфига", "Нет доступных конфигов для загрузки. Создайте новый.")
             return
@@ -483,6 +693,14 @@ class PNSc:
         config_var = tk.StringVar(value=configs[0] if configs else "")
         config_combo = ttk.Combobox(dialog, textvariable=config_var, values=configs, state="readonly")
         config_combo.grid(row=0, column=1, padx=5, pady=5, sticky=tk.EW)
+
+        info_label = tk.Label(dialog, text=describe_config(index.get(config_var.get())), justify=tk.LEFT, anchor=tk.W)
+        info_label.grid(row=1, column=0, columnspan=2, padx=5, pady=5, sticky=tk.EW)
+
+        def show_config_info(event=None):
+            info_label.config(text=describe_config(index.get(config_var.get())))
+
+        config_combo.bind("<<ComboboxSelected>>", show_config_info)
         
         def perform_load():
             selected_config_name = config_var.get()
@@ -490,76 +708,155 @@ class PNSc:
                 self._show_messagebox("warning", "Загрузка конфига", "Пожалуйста, выберите конфиг.")
                 return
 
+            self._flush_pending_save()
             self.current_config_name = selected_config_name
-            self.current_config_path = os.path.join(self.config_dir, f"{selected_config_name}.json")
+            self.current_config_path = resolve_config_path(self.config_dir, selected_config_name)
             self.load_config()
             dialog.destroy()
 
-        tk.Button(dialog, text="Загрузить", command=perform_load).grid(row=1, column=0, columnspan=2, padx=5, pady=5)
+        tk.Button(dialog, text="Загрузить", command=perform_load).grid(row=2, column=0, columnspan=2, padx=5, pady=5)
         dialog.bind("<Return>", lambda event: perform_load())
         dialog.bind("<Escape>", lambda event: dialog.destroy())
         dialog.columnconfigure(1, weight=1)
         dialog.wait_window()
 
+    def export_config_bundle(self):
+        """
+        Сохраняет текущий конфиг вместе со всеми изображениями кнопок и заметок в один архив
+        для переноса на другое рабочее место (см. module_config_bundle).
+        """
+        if not self.current_config_path:
+            self._show_messagebox("warning", "Экспорт пакета", "Сначала создайте или загрузите конфиг.")
+            return
+        bundle_path = filedialog.asksaveasfilename(
+            defaultextension=".zip",
+            initialfile=f"{self.current_config_name}.zip",
+            filetypes=[("Пакет конфига PNSc", "*.zip")],
+            title="Экспорт пакета конфига"
+        )
+        if not bundle_path:
+            return
+
+        self._flush_pending_save()
+        try:
+            path, config_data = self._collect_config_data()
+            db_path = getattr(self.job_store, "db_path", None) # База работ SQLite попадает в пакет
+            count, missing = export_bundle(path, bundle_path, config_data, db_path)
+        except Exception as e:
+            self._show_messagebox("error", "Ошибка экспорта", f"Не удалось экспортировать пакет: {e}")
+            return
+
+        message = f"Пакет сохранен: {bundle_path}\nИзображений: {count}"
+        if missing:
+            message += f"\nНе найдены файлы изображений ({len(missing)}): " + ", ".join(missing[:5])
+        self._show_messagebox("info", "Экспорт пакета", message)
+
+    def import_config_bundle(self):
+        """Распаковывает пакет конфига в новый конфиг и открывает его."""
+        bundle_path = filedialog.askopenfilename(
+            filetypes=[("Пакет конфига PNSc", "*.zip"), ("All files", "*.*")],
+            title="Импорт пакета конфига"
+        )
+        if not bundle_path:
+            return
+
+        try:
+            config_path = import_bundle(bundle_path, self.config_dir)
+        except Exception as e:
+            self._show_messagebox("error", "Ошибка импорта", f"Не удалось импортировать пакет: {e}")
+            return
+
+        self._flush_pending_save()
+        self.current_config_name = os.path.basename(config_path)
+        self.current_config_path = config_path
+        self.load_config()
+
     def load_config(self):
         if not self.current_config_path:
             self._show_messagebox("error", "Ошибка загрузки", "Путь к конфигу не установлен.")
             return
 
         try:
-            with open(self.current_config_path, "r", encoding="utf-8") as f:
-                config_data = json.load(f)
-
-            self.tabs = config_data.get("tabs", {})
+            # Отпечаток снимается до чтения: запись другого экземпляра во время чтения не потеряется
+            signature = config_signature(self.current_config_path)
+            # Порядок: недавний конфиг из памяти, снимок быстрого запуска, чтение файлов конфига
+            config_data = (self.config_cache.take(self.current_config_path)
+                           or read_warm_start(self.current_config_path)
+                           or load_config_file(self.current_config_path))
+            config_imported = not is_sectioned_config(self.current_config_path)
+            if config_imported:
+                # Однофайловый конфиг старого формата переводится в каталог с отдельными секциями
+                self.current_config_path = import_legacy_config(self.current_config_path)
+            # Значения по умолчанию и job_id заполняются один раз для конфига старой версии схемы
+            config_normalized = normalize_config(config_data, self.default_button_color)
+
+            self.tabs = self._new_tab_map(config_data.get("tabs", {}))
             
             self.clear_notes()
-            notes_data = config_data.get("notes", {})
-            for note_id, data in notes_data.items():
-                note_widget = NoteWidget(self, self.notes_canvas, note_id, data)
-                self.notes[note_id] = note_widget
+            # Записи всех заметок создаются сразу, а NoteWidget - только для заметок активной доски
+            self.load_note_boards(config_data)
 
             self.device_types = config_data.get("device_types", [])
             self.work_types = config_data.get("work_types", [])
-            self.completed_jobs = config_data.get("completed_jobs", [])
-            for job in self.completed_jobs:
-                if 'job_id' not in job:
-                    job['job_id'] = str(uuid.uuid4())
+            self._open_job_store(config_data)
             self.global_author = config_data.get("global_author", "") 
 
             self.text_area.delete("1.0", tk.END)
             self.text_area.insert(tk.END, config_data.get("text_area_content", ""))
+            # Загрузка текста - не правка пользователя: без сброса флага <<Modified>> пометил бы
+            # секцию text_area изменённой, и каждое открытие конфига пересохраняло бы её
+            self.text_area.edit_modified(False)
             
             self.stop_all_timers()
-            self.active_timers = {}
+            self.active_timers = TimerMap(log=self.model_changes)
+
+            self.config_journal = ConfigJournal(self.current_config_path, reset=config_imported)
+            self.model_changes.invalidate() # Представления перестраиваются по новому конфигу целиком
+            if config_imported:
+                signature = config_signature(self.current_config_path)
+            self._mark_config_synced(signature)
+            if config_normalized or self.job_store.migrated or config_imported:
+                # Новые job_id и версия схемы должны попасть в снимок, иначе записи журнала на них не сошлются.
+                # После переноса работ в SQLite конфиг пересохраняется уже без них,
+                # импортированный конфиг записывается по секциям целиком.
+                self.save_config(show_message=False)
 
             self.update_tab_display()
             self.update_work_table_display()
+            update_config_index(self.current_config_path, config_data, opened=True)
             self._show_messagebox("info", "Загрузка конфига", f"Конфиг '{self.current_config_name}' загружен.")
         except FileNotFoundError:
             self._show_messagebox("error", "Ошибка загрузки", f"Файл конфига не найден: {self.current_config_path}")
             self.current_config_path = None
             self.current_config_name = None
+            self.config_journal = None
         except json.JSONDecodeError:
             self._show_messagebox("error", "Ошибка загрузки", f"Некорректный формат файла конфига: {self.current_config_path}")
             self.current_config_path = None
             self.current_config_name = None
+            self.config_journal = None
         except Exception as e:
             self._show_messagebox("error", "Ошибка загрузки", f"Не удалось загрузить конфиг: {e}")
             self.current_config_path = None
             self.current_config_name = None
+            self.config_journal = None
 
     def load_default_config_if_needed(self):
-        configs = [f for f in os.listdir(self.config_dir) if f.endswith('.json')]
+        # При запуске открывается последний использованный конфиг (по индексу конфигов)
+        configs = recent_config_names(self.config_dir)
         if configs:
-            first_config_name = configs[0].replace(".json", "")
-            first_config_path = os.path.join(self.config_dir, configs[0])
+            first_config_name = configs[0]
+            first_config_path = resolve_config_path(self.config_dir, first_config_name)
             
             self.current_config_name = first_config_name
             self.current_config_path = first_config_path
             self.load_config()
         else:
             self.current_config_name = "default"
-            self.current_config_path = os.path.join(self.config_dir, "default.json")
+            self.current_config_path = os.path.join(self.config_dir, "default")
+            self.config_journal = ConfigJournal(self.current_config_path, reset=True)
+            self._open_job_store({}, reset=True)
+            self._mark_config_synced(config_signature(self.current_config_path))
             self.save_config(show_message=False)
             self.update_tab_display()
             
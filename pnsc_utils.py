@@ -30,9 +30,86 @@ CONTROL_ICONS = {
     "create_tab": "icons/add_tab.png",
     "create_button": "icons/add_button.png",
     "edit_mode": "icons/edit.png",
+    "search": "icons/search.png",
     "main_app_icon_png": "icons/pnsc_icon.png", # Основная иконка (PNG)
     "main_app_icon_ico": "icons/pnsc_icon.ico",  # Резервная иконка (ICO для Windows)
     "settings": "icons/123.png",      # Иконка для кнопки настроек NoteWidget
     "note_manager": "icons/123.png", # Иконка для кнопки "Менеджер заметок"
     "clear_notes": "icons/123.png"  # Иконка для кнопки "Очистить все заметки"
-}
\ No newline at end of file
+}
+
+# --- НАСТРОЙКИ СОХРАНЕНИЯ КОНФИГА ---
+# Окно (в мс), в течение которого автосохранения объединяются в одну запись на диск
+SAVE_COALESCE_MS = 1000
+# Размер журнала изменений (в байтах), после которого он сворачивается в новый снимок конфига
+JOURNAL_COMPACT_BYTES = 256 * 1024
+# Где хранить выполненные работы: "json" - в самом конфиге, "sqlite" - в базе configs/<имя>.jobs.sqlite3.
+# При выборе "sqlite" работы из существующих конфигов переносятся в базу при загрузке.
+JOB_STORE_BACKEND = "json"
+# Кодек файлов конфига: "pretty" (JSON с отступами), "compact" (JSON без пробелов),
+# "fast" (orjson, если установлен, иначе compact). Формат при загрузке определяется автоматически.
+CONFIG_CODEC = "fast"
+# Сжимать файлы конфига gzip
+CONFIG_GZIP = False
+# Не записывать поля кнопок, вкладок и заметок, равные значениям по умолчанию
+# (они восстанавливаются при загрузке). Файлы конфига становятся в несколько раз меньше.
+CONFIG_SPARSE = True
+
+# --- КЭШ РАЗОБРАННЫХ КОНФИГОВ (быстрое переключение между конфигами) ---
+# Сколько последних конфигов держать в памяти (0 - кэш отключён)
+CONFIG_CACHE_ENTRIES = 4
+# Предел кэша в байтах по суммарному размеру файлов конфигов на диске
+# (разобранный конфиг в памяти занимает в несколько раз больше)
+CONFIG_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# --- ЗАГРУЗКА ВКЛАДОК ПО ТРЕБОВАНИЮ ---
+# Сколько кнопок держать загруженными в памяти: сверх этого давно не открывавшиеся вкладки выгружаются
+LOADED_TABS_MAX_BUTTONS = 2000
+
+# --- РЕЗЕРВНЫЕ КОПИИ КОНФИГА (configs/.backups/<имя>/) ---
+# Интервал автоматической резервной копии в мс (0 - только перед опасными операциями)
+BACKUP_INTERVAL_MS = 15 * 60 * 1000
+# Сколько последних копий хранить
+BACKUP_KEEP_LAST = 10
+# За сколько последних дней хранить по одной копии (последней за день)
+BACKUP_KEEP_DAYS = 7
+
+# --- НАБЛЮДЕНИЕ ЗА ФАЙЛАМИ КОНФИГА ---
+# Как часто проверять, не изменили ли файлы конфига вне приложения (мс), если не установлен watchdog
+CONFIG_WATCH_INTERVAL_MS = 2000
+
+# --- ОБЩАЯ ПАПКА КОНФИГОВ (несколько экземпляров PNSc) ---
+# Сколько секунд ждать, пока другой экземпляр закончит запись конфига
+CONFIG_LOCK_TIMEOUT_S = 10
+# Папка конфигов лежит на сетевом диске и открыта с нескольких рабочих мест. SQLite в режиме WAL
+# на сетевых файловых системах не работает (общая память -shm видна только одной машине),
+# поэтому база работ (JOB_STORE_BACKEND = "sqlite") открывается с журналом DELETE.
+# Пути Windows вида \\сервер\папка считаются сетевыми и без этой настройки.
+CONFIG_DIR_SHARED = False
+
+# --- ПАКЕТЫ КОНФИГОВ (перенос на другое рабочее место) ---
+# Уменьшать изображения в пакете до наибольшего размера, в котором они показываются (нужен Pillow)
+BUNDLE_PRESCALE_IMAGES = True
+
+# --- ФОНОВЫЕ ИЗОБРАЖЕНИЯ ЗАМЕТОК ---
+# Сколько исходных изображений держать декодированными в памяти
+NOTE_IMAGE_CACHE_SOURCES = 8
+# Наибольшая сторона декодированного изображения: большие фото уменьшаются сразу при чтении
+NOTE_IMAGE_MAX_SIDE = 2048
+
+# --- ДОСКА ЗАМЕТОК ---
+# Запас вокруг видимой области (в пикселях), в котором заметки уже строятся полноценными виджетами.
+# Остальные заметки рисуются на холсте простыми заготовками (прямоугольник и название)
+NOTES_VIEWPORT_MARGIN = 300
+
+# --- ПЕРЕТАСКИВАНИЕ И ИЗМЕНЕНИЕ РАЗМЕРА ---
+# Как часто применять накопленные события мыши и <Configure> (мс): 16 - около 60 кадров в секунду
+EVENT_COALESCE_INTERVAL_MS = 16
+
+# --- БОЛЬШИЕ ТЕКСТЫ ЗАМЕТОК (configs/<имя>/blobs/) ---
+# Текст заметки с этого размера (в символах) хранится в отдельном файле, а в notes.json - ссылка и начало текста
+NOTE_BLOB_MIN_CHARS = 8192
+# Сколько первых символов текста оставлять в notes.json
+NOTE_BLOB_PREVIEW_CHARS = 200
+# Через сколько секунд удалять файлы текстов, на которые больше не ссылается ни одна заметка
+NOTE_BLOB_GC_GRACE_S = 3600
@@ -0,0 +1,8 @@
+# conftest.py
+#
+# Модули PNSc лежат в корне репозитория и импортируются по имени (module_config_storage и т. п.).
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,47 @@
+# test_config_bundle.py
+#
+# Импорт пакетов конфигов: имена из архива не должны выводить файлы за папку конфигов.
+
+import os
+import json
+import zipfile
+
+import pytest
+
+from module_config_bundle import BUNDLE_FORMAT, import_bundle
+
+
+def _bundle(path, name, members=()):
+    with zipfile.ZipFile(path, "w") as bundle:
+        bundle.writestr("bundle.json", json.dumps({"format": BUNDLE_FORMAT, "name": name}))
+        bundle.writestr("config/manifest.json", json.dumps({"format": 3, "journal": None}))
+        for member in members:
+            bundle.writestr(member, "{}")
+    return path
+
+
+@pytest.mark.parametrize("name", ["../escaped", "/abs/escaped", "..", ".hidden", "a\\..\\escaped", "C:escaped"])
+def test_unsafe_config_name_falls_back_to_bundle_file_name(tmp_path, name):
+    config_dir = os.path.join(tmp_path, "configs")
+    os.makedirs(config_dir)
+    bundle_path = _bundle(os.path.join(tmp_path, "перенос.zip"), name)
+
+    config_path = import_bundle(bundle_path, config_dir)
+
+    assert os.path.dirname(os.path.abspath(config_path)) == os.path.abspath(config_dir)
+    assert os.path.basename(config_path) == "перенос"
+    assert not os.path.exists(os.path.join(tmp_path, "escaped"))
+
+
+@pytest.mark.parametrize("member", ["config/../../escaped.json", "config/..\\..\\escaped.json",
+                                    "config/C:escaped.json", "assets/../escaped.json"])
+def test_unsafe_member_is_rejected(tmp_path, member):
+    config_dir = os.path.join(tmp_path, "configs")
+    os.makedirs(config_dir)
+    bundle_path = _bundle(os.path.join(tmp_path, "пакет.zip"), "пакет", [member])
+
+    with pytest.raises(ValueError):
+        import_bundle(bundle_path, config_dir)
+
+    assert os.listdir(config_dir) == [] # Недораспакованный конфиг удалён
+    assert not os.path.exists(os.path.join(tmp_path, "escaped.json"))
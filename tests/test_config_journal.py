@@ -0,0 +1,119 @@
+# test_config_journal.py
+#
+# Журнал изменений конфига: накатывание записей поверх снимка и уплотнение (module_config_journal).
+
+import os
+
+from module_config_journal import ConfigJournal, read_journal_records
+from module_config_storage import load_config_file, write_config
+
+
+def _note_text(note_id, text):
+    return {"op": "note_text", "note_id": note_id, "text": text}
+
+
+def _job_append(job_id):
+    return {"op": "job_append", "job": {"job_id": job_id, "device_name": job_id}}
+
+
+def _base_config():
+    return {"notes": {"n1": {"text": "снимок", "note_name": "n1"}}, "completed_jobs": []}
+
+
+def _write_snapshot(config_path, config_data, journal):
+    """Запись снимка с маркером и уплотнение журнала, как в SaveScheduler."""
+    marker = write_config(config_path, config_data, journal.position())
+    journal.compact(min(marker["offsets"].values()))
+    return marker
+
+
+def test_replay_applies_records_after_snapshot(tmp_path):
+    config_path = os.path.join(tmp_path, "cfg")
+    journal = ConfigJournal(config_path, reset=True)
+    _write_snapshot(config_path, _base_config(), journal)
+    journal.append([_note_text("n1", "из журнала"), _job_append("j1")])
+
+    config_data = load_config_file(config_path)
+
+    assert config_data["notes"]["n1"]["text"] == "из журнала"
+    assert [job["job_id"] for job in config_data["completed_jobs"]] == ["j1"]
+
+
+def test_compaction_drops_records_already_in_snapshot(tmp_path):
+    config_path = os.path.join(tmp_path, "cfg")
+    journal = ConfigJournal(config_path, reset=True)
+    _write_snapshot(config_path, _base_config(), journal)
+    journal.append([_note_text("n1", "v1"), _job_append("j1")])
+    config_data = load_config_file(config_path)
+
+    marker = _write_snapshot(config_path, config_data, journal)
+
+    assert journal.base == min(marker["offsets"].values())
+    assert read_journal_records(config_path, marker) == []
+    journal.append([_note_text("n1", "v2")])
+    config_data = load_config_file(config_path)
+    assert config_data["notes"]["n1"]["text"] == "v2"
+    assert [job["job_id"] for job in config_data["completed_jobs"]] == ["j1"]
+
+
+def test_compaction_keeps_records_of_unwritten_sections(tmp_path):
+    config_path = os.path.join(tmp_path, "cfg")
+    journal = ConfigJournal(config_path, reset=True)
+    _write_snapshot(config_path, _base_config(), journal)
+    journal.append([_note_text("n1", "v1"), _job_append("j1")])
+
+    # Записана только секция notes: запись о работе ещё не вошла в снимок и переживает уплотнение
+    config_data = load_config_file(config_path)
+    _write_snapshot(config_path, {"notes": config_data["notes"]}, journal)
+    journal.append([_job_append("j2")])
+
+    config_data = load_config_file(config_path)
+    assert config_data["notes"]["n1"]["text"] == "v1"
+    assert [job["job_id"] for job in config_data["completed_jobs"]] == ["j1", "j2"]
+
+
+def test_replay_after_compaction_by_another_instance(tmp_path):
+    config_path = os.path.join(tmp_path, "cfg")
+    journal = ConfigJournal(config_path, reset=True)
+    _write_snapshot(config_path, _base_config(), journal)
+    journal.append([_note_text("n1", "v1")])
+    _write_snapshot(config_path, load_config_file(config_path), journal)
+
+    # Второй экземпляр открывает тот же журнал: логические смещения после уплотнения сохраняются
+    other = ConfigJournal(config_path)
+    assert other.journal_id == journal.journal_id
+    assert other.position() == journal.position()
+    other.append([_note_text("n1", "v2"), _job_append("j1")])
+
+    config_data = load_config_file(config_path)
+    assert config_data["notes"]["n1"]["text"] == "v2"
+    assert [job["job_id"] for job in config_data["completed_jobs"]] == ["j1"]
+
+
+def test_replay_stops_at_torn_last_line(tmp_path):
+    config_path = os.path.join(tmp_path, "cfg")
+    journal = ConfigJournal(config_path, reset=True)
+    _write_snapshot(config_path, _base_config(), journal)
+    journal.append([_note_text("n1", "v1")])
+    with open(journal.path, "ab") as f:
+        f.write(b'{"op": "note_text", "note_id": "n1", "te') # Запись оборвалась при аварийном завершении
+
+    assert load_config_file(config_path)["notes"]["n1"]["text"] == "v1"
+
+
+def test_append_after_torn_line_replays(tmp_path):
+    config_path = os.path.join(tmp_path, "cfg")
+    journal = ConfigJournal(config_path, reset=True)
+    _write_snapshot(config_path, _base_config(), journal)
+    journal.append([_note_text("n1", "v1")])
+    with open(journal.path, "ab") as f:
+        f.write(b'{"op": "note_text", "note_id": "n1", "te')
+
+    # Недописанная строка обрезается перед записью, следующие записи не склеиваются с ней
+    ConfigJournal(config_path).append([_note_text("n1", "v2"), _job_append("j1")])
+
+    config_data = load_config_file(config_path)
+    assert config_data["notes"]["n1"]["text"] == "v2"
+    assert [job["job_id"] for job in config_data["completed_jobs"]] == ["j1"]
+    with open(journal.path, "rb") as f:
+        assert all(line.endswith(b"\n") for line in f)
@@ -0,0 +1,113 @@
+# test_config_merge.py
+#
+# Слияние конфига, который одновременно меняют несколько экземпляров PNSc (module_config_merge).
+
+import os
+
+import pytest
+
+from module_config_merge import MERGE_KINDS, merge_config_data, merge_records, run_stress
+from module_config_schema import normalize_config
+from module_config_storage import load_config_file, read_tab_buttons, write_config
+
+
+def _buttons(**texts):
+    return {button_id: {"text": text} for button_id, text in texts.items()}
+
+
+def _notes(**texts):
+    return {note_id: {"text": text, "note_name": note_id} for note_id, text in texts.items()}
+
+
+def _jobs(**names):
+    return [{"job_id": job_id, "device_name": name} for job_id, name in names.items()]
+
+
+def _config(buttons, notes, jobs):
+    config_data = {"tabs": {"t1": {"name": "Вкладка", "buttons": buttons}}, "notes": notes,
+                   "completed_jobs": jobs}
+    normalize_config(config_data, "SystemButtonFace")
+    return config_data
+
+
+def _local(**ops):
+    local = {kind: {} for kind in MERGE_KINDS}
+    local.update(ops)
+    return local
+
+
+@pytest.fixture
+def shared_config(tmp_path):
+    """Конфиг, в котором другой экземпляр изменил x1, удалил x2 и добавил x4 (кнопки, заметки, работы)."""
+    config_path = os.path.join(tmp_path, "shared")
+    write_config(config_path, _config(_buttons(b1="чужая правка", b3="b3", b4="чужая"),
+                                      _notes(n1="чужая правка", n3="n3", n4="чужая"),
+                                      _jobs(j1="чужая правка", j3="j3", j4="чужая")))
+    return config_path
+
+
+def test_merge_records_keeps_both_sides():
+    ours = {"a": 1, "b": 2, "c": 30}
+    theirs = {"a": 1, "c": 3, "d": 4}
+    merged = merge_records(ours, theirs, {"c": "update"})
+    assert merged == {"a": 1, "c": 30, "d": 4} # b удалил другой экземпляр, d он добавил
+
+
+def test_merge_records_local_remove_wins():
+    merged = merge_records({"a": 1}, {"a": 1, "b": 2}, {"b": "remove"})
+    assert merged == {"a": 1}
+
+
+def test_merge_records_unknown_local_changes_prefer_ours():
+    merged = merge_records({"a": 10, "b": 2}, {"a": 1, "c": 3}, None)
+    assert merged == {"a": 10, "b": 2, "c": 3}
+
+
+def test_merge_config_data_concurrent_add_edit_delete(shared_config):
+    # Мы загрузили конфиг до чужой записи: изменили x3, удалили x1 и добавили x5
+    config_data = _config(_buttons(b2="b2", b3="наша правка", b5="наша"),
+                          _notes(n2="n2", n3="наша правка", n5="наша"),
+                          _jobs(j2="j2", j3="наша правка", j5="наша"))
+    local = _local(button={"b1": "remove", "b3": "update", "b5": "add"},
+                   note={"n1": "remove", "n3": "update", "n5": "add"},
+                   job={"j1": "remove", "j3": "update", "j5": "add"})
+
+    assert merge_config_data(shared_config, config_data, local)
+
+    buttons = config_data["tabs"]["t1"]["buttons"]
+    assert set(buttons) == {"b3", "b4", "b5"}
+    assert buttons["b3"]["text"] == "наша правка"
+    assert buttons["b4"]["text"] == "чужая"
+    notes = config_data["notes"]
+    assert set(notes) == {"n3", "n4", "n5"}
+    assert notes["n3"]["text"] == "наша правка"
+    jobs = {job["job_id"]: job for job in config_data["completed_jobs"]}
+    assert set(jobs) == {"j3", "j4", "j5"}
+    assert jobs["j3"]["device_name"] == "наша правка"
+
+
+def test_merge_config_data_without_foreign_changes(tmp_path):
+    config_path = os.path.join(tmp_path, "own")
+    config_data = _config(_buttons(b1="b1"), _notes(n1="n1"), _jobs(j1="j1"))
+    write_config(config_path, config_data)
+    config_data["tabs"]["t1"]["buttons"] = read_tab_buttons(config_path, "t1")
+
+    assert not merge_config_data(config_path, config_data, _local())
+
+
+def test_merge_config_data_skips_unloaded_tabs(shared_config):
+    # Кнопки невыгруженной вкладки не сливаются: её файл на диске остаётся как есть
+    config_data = load_config_file(shared_config)
+    config_data["notes"] = dict(config_data["notes"], n5={"text": "наша", "note_name": "n5"})
+
+    merge_config_data(shared_config, config_data, _local(note={"n5": "add"}))
+
+    assert "buttons" not in config_data["tabs"]["t1"]
+    assert set(read_tab_buttons(shared_config, "t1")) == {"b1", "b3", "b4"}
+    assert set(config_data["notes"]) == {"n1", "n3", "n4", "n5"}
+
+
+def test_save_scheduler_processes_do_not_lose_jobs(tmp_path):
+    lost, total = run_stress(processes=3, jobs_per_process=5, work_dir=str(tmp_path))
+    assert lost == 0
+    assert total == 15
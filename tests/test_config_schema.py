@@ -0,0 +1,64 @@
+# test_config_schema.py
+#
+# Приведение конфига к текущей схеме, в том числе кнопок вкладок, которые не загружены в память.
+
+import os
+import json
+
+import module_config_schema
+from module_config_schema import CONFIG_SCHEMA_VERSION, normalize_config
+from module_config_sections import manifest_path_for, section_file_path, tab_file_path
+from module_config_codec import read_config_file
+from module_config_storage import load_config_file, read_tab_buttons, write_config
+
+
+def _old_config(config_path):
+    """Конфиг по секциям, записанный до версионирования файлов вкладок: кнопка без полей по умолчанию."""
+    os.makedirs(os.path.dirname(tab_file_path(config_path, "t1")))
+    with open(manifest_path_for(config_path), "w", encoding="utf-8") as f:
+        json.dump({"format": 2, "journal": None}, f)
+    with open(section_file_path(config_path, "tabs"), "w", encoding="utf-8") as f:
+        json.dump({"tabs": {"t1": {"name": "Вкладка", "grid_size_x": 5}}}, f)
+    with open(tab_file_path(config_path, "t1"), "w", encoding="utf-8") as f:
+        json.dump({"buttons": {"b1": {"text": "Кнопка"}}}, f)
+
+
+def test_unloaded_tab_buttons_are_migrated_on_read(tmp_path):
+    config_path = os.path.join(tmp_path, "cfg")
+    _old_config(config_path)
+    config_data = load_config_file(config_path)
+    assert normalize_config(config_data, "red")
+    assert "buttons" not in config_data["tabs"]["t1"]
+
+    button = read_tab_buttons(config_path, "t1", config_data["tabs"]["t1"], "red")["b1"]
+
+    assert button["color"] == "red"
+    assert button["grid_size_x"] == 5 # Сетка наследуется от вкладки
+    assert button["width"] == module_config_schema.BUTTON_DEFAULTS["width"]
+
+
+def test_tab_file_records_schema_version(tmp_path):
+    config_path = os.path.join(tmp_path, "cfg")
+    config_data = {"tabs": {"t1": {"name": "Вкладка", "buttons": {"b1": {"text": "Кнопка"}}}}}
+    normalize_config(config_data, "red")
+
+    write_config(config_path, config_data)
+
+    assert read_config_file(tab_file_path(config_path, "t1"))["schema_version"] == CONFIG_SCHEMA_VERSION
+
+
+def test_future_migration_reaches_unloaded_tabs(tmp_path, monkeypatch):
+    config_path = os.path.join(tmp_path, "cfg")
+    config_data = {"tabs": {"t1": {"name": "Вкладка", "buttons": {"b1": {"text": "Кнопка"}}}}}
+    normalize_config(config_data, "red")
+    write_config(config_path, config_data)
+
+    def migrate_buttons_to_v2(buttons, defaults):
+        for button_data in buttons.values():
+            button_data["tooltip"] = button_data["text"]
+
+    monkeypatch.setattr(module_config_schema, "CONFIG_SCHEMA_VERSION", CONFIG_SCHEMA_VERSION + 1)
+    monkeypatch.setattr(module_config_schema, "MIGRATIONS", module_config_schema.MIGRATIONS + (
+        (CONFIG_SCHEMA_VERSION + 1, lambda config_data, button_color: None, migrate_buttons_to_v2),))
+
+    assert read_tab_buttons(config_path, "t1")["b1"]["tooltip"] == "Кнопка"
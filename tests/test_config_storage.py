@@ -0,0 +1,107 @@
+# test_config_storage.py
+#
+# Запись и чтение конфига по секциям, в том числе разреженная запись (CONFIG_SPARSE).
+
+import os
+import copy
+
+import pytest
+
+import module_config_storage
+from module_config_codec import read_config_file
+from module_config_schema import CONFIG_SCHEMA_VERSION, normalize_config
+from module_config_sections import section_file_path, tab_file_path
+from module_config_storage import load_config_file, read_tab_buttons, write_config
+
+BUTTON_COLOR = "SystemButtonFace"
+
+
+def _full_config():
+    config_data = {
+        "tabs": {
+            "t1": {"name": "Основная", "buttons": {
+                "b1": {"text": "По умолчанию"},
+                "b2": {"text": "Своя", "x": 120, "width": 140, "color": "#ff0000", "new_line": True,
+                       "snap_to_grid": False},
+            }},
+            "t2": {"name": "Сетка 20", "grid_size_x": 20, "grid_size_y": 20, "buttons": {
+                "b3": {"text": "Сетка вкладки", "output": "вывод", "font_size": 12},
+            }},
+        },
+        "button_color": BUTTON_COLOR,
+        "notes": {
+            "n1": {"text": "Заметка по умолчанию"},
+            "n2": {"text": "Своя", "x": 300, "bg_color": "#ccffcc", "note_name": "Своя", "board": "b"},
+        },
+        "note_boards": {"b": {"name": "Доска"}},
+        "active_note_board": "b",
+        "completed_jobs": [{"job_id": "j1", "device_name": "Устройство", "time_worked": 61.5}],
+        "device_types": ["Тип"],
+        "work_types": ["Работа"],
+        "text_area_content": "Текст",
+        "global_author": "Автор",
+    }
+    normalize_config(config_data, BUTTON_COLOR)
+    return config_data
+
+
+def _load_with_buttons(config_path):
+    config_data = load_config_file(config_path)
+    for tab_id, tab_data in config_data["tabs"].items():
+        tab_data["buttons"] = read_tab_buttons(config_path, tab_id)
+    return config_data
+
+
+@pytest.mark.parametrize("sparse", [True, False])
+def test_write_load_round_trip(tmp_path, monkeypatch, sparse):
+    monkeypatch.setattr(module_config_storage, "CONFIG_SPARSE", sparse)
+    config_path = os.path.join(tmp_path, "cfg")
+    config_data = _full_config()
+
+    write_config(config_path, copy.deepcopy(config_data))
+
+    loaded = _load_with_buttons(config_path)
+    assert loaded == config_data
+    assert loaded["schema_version"] == CONFIG_SCHEMA_VERSION
+
+
+def test_sparse_files_omit_default_fields(tmp_path, monkeypatch):
+    monkeypatch.setattr(module_config_storage, "CONFIG_SPARSE", True)
+    config_path = os.path.join(tmp_path, "cfg")
+
+    write_config(config_path, _full_config())
+
+    buttons = read_config_file(tab_file_path(config_path, "t1"))["buttons"]
+    assert buttons["b1"] == {"text": "По умолчанию"}
+    assert buttons["b2"]["x"] == 120 and "y" not in buttons["b2"]
+    # Сетка вкладки t2 - значение по умолчанию для её кнопок
+    assert read_config_file(tab_file_path(config_path, "t2"))["buttons"]["b3"] == \
+        {"text": "Сетка вкладки", "output": "вывод", "font_size": 12}
+    notes = read_config_file(section_file_path(config_path, "notes"))["notes"]
+    assert notes["n1"] == {"text": "Заметка по умолчанию"}
+
+
+def test_write_selected_sections_keeps_others(tmp_path):
+    config_path = os.path.join(tmp_path, "cfg")
+    config_data = _full_config()
+    write_config(config_path, copy.deepcopy(config_data))
+
+    write_config(config_path, {"text_area_content": "Новый текст"})
+
+    loaded = _load_with_buttons(config_path)
+    assert loaded["text_area_content"] == "Новый текст"
+    config_data["text_area_content"] = "Новый текст"
+    assert loaded == config_data
+
+
+def test_unloaded_tab_file_is_not_rewritten(tmp_path):
+    config_path = os.path.join(tmp_path, "cfg")
+    write_config(config_path, _full_config())
+    config_data = load_config_file(config_path)
+    config_data["tabs"]["t1"]["name"] = "Переименована"
+
+    write_config(config_path, {"tabs": config_data["tabs"], "button_color": BUTTON_COLOR})
+
+    loaded = _load_with_buttons(config_path)
+    assert loaded["tabs"]["t1"]["name"] == "Переименована"
+    assert set(loaded["tabs"]["t1"]["buttons"]) == {"b1", "b2"}
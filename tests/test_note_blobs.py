@@ -0,0 +1,87 @@
+# test_note_blobs.py
+#
+# Хранилище больших текстов заметок и сборка мусора в нём (module_note_blobs).
+
+import os
+import time
+
+from pnsc_utils import NOTE_BLOB_MIN_CHARS, NOTE_BLOB_PREVIEW_CHARS
+from module_config_schema import normalize_notes
+from module_config_storage import load_config_file, write_config
+from module_note_blobs import (NOTE_BLOB_KEY, blob_path, collect_blob_garbage, load_note_text,
+                               notes_equal, write_blob)
+
+LARGE_TEXT = "Большой текст заметки. " * (NOTE_BLOB_MIN_CHARS // 10)
+OLD = time.time() - 24 * 3600 # Старше любого срока хранения
+
+
+def _notes(**texts):
+    notes = {note_id: {"text": text, "note_name": note_id} for note_id, text in texts.items()}
+    normalize_notes(notes)
+    return notes
+
+
+def _age(path):
+    os.utime(path, (OLD, OLD))
+
+
+def test_large_text_round_trip(tmp_path):
+    config_path = os.path.join(tmp_path, "cfg")
+    write_config(config_path, {"notes": _notes(n1=LARGE_TEXT, n2="короткий")})
+
+    notes = load_config_file(config_path)["notes"]
+
+    assert notes["n1"]["text"] == LARGE_TEXT[:NOTE_BLOB_PREVIEW_CHARS]
+    assert os.path.exists(blob_path(config_path, notes["n1"][NOTE_BLOB_KEY]))
+    assert NOTE_BLOB_KEY not in notes["n2"]
+    assert load_note_text(config_path, notes["n1"])
+    assert notes["n1"]["text"] == LARGE_TEXT and NOTE_BLOB_KEY not in notes["n1"]
+
+
+def test_unloaded_note_is_equal_to_loaded_one(tmp_path):
+    config_path = os.path.join(tmp_path, "cfg")
+    write_config(config_path, {"notes": _notes(n1=LARGE_TEXT)})
+    unloaded = load_config_file(config_path)["notes"]["n1"]
+
+    assert notes_equal(unloaded, _notes(n1=LARGE_TEXT)["n1"])
+    assert not notes_equal(unloaded, _notes(n1=LARGE_TEXT + "!")["n1"])
+
+
+def test_garbage_collection_keeps_referenced_blobs(tmp_path):
+    config_path = os.path.join(tmp_path, "cfg")
+    kept = write_blob(config_path, LARGE_TEXT)
+    orphan = write_blob(config_path, LARGE_TEXT + "удалённая заметка")
+    for digest in (kept, orphan):
+        _age(blob_path(config_path, digest))
+
+    assert collect_blob_garbage(config_path, {kept}) == 1
+
+    assert os.path.exists(blob_path(config_path, kept))
+    assert not os.path.exists(blob_path(config_path, orphan))
+
+
+def test_garbage_collection_keeps_recent_blobs(tmp_path):
+    # Текст мог записать другой экземпляр, notes.json которого ещё не записан
+    config_path = os.path.join(tmp_path, "cfg")
+    recent = write_blob(config_path, LARGE_TEXT)
+
+    assert collect_blob_garbage(config_path, set()) == 0
+    assert os.path.exists(blob_path(config_path, recent))
+
+
+def test_write_config_keeps_blobs_of_unloaded_notes(tmp_path):
+    config_path = os.path.join(tmp_path, "cfg")
+    write_config(config_path, {"notes": _notes(n1=LARGE_TEXT, n2=LARGE_TEXT + "второй")})
+    notes = load_config_file(config_path)["notes"]
+    first, second = notes["n1"][NOTE_BLOB_KEY], notes["n2"][NOTE_BLOB_KEY]
+    for digest in (first, second):
+        _age(blob_path(config_path, digest))
+
+    # Текст n1 не загружался: заметка пишется той же ссылкой, а текст удалённой n2 больше не нужен
+    del notes["n2"]
+    write_config(config_path, {"notes": notes})
+
+    assert os.path.exists(blob_path(config_path, first))
+    assert not os.path.exists(blob_path(config_path, second))
+    reloaded = load_config_file(config_path)["notes"]["n1"]
+    assert load_note_text(config_path, reloaded) and reloaded["text"] == LARGE_TEXT
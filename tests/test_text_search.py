@@ -0,0 +1,36 @@
+# test_text_search.py
+#
+# Обратный индекс поиска по заметкам (module_text_search.InvertedIndex).
+
+from module_text_search import InvertedIndex
+
+
+def test_common_prefix_returns_every_document():
+    index = InvertedIndex()
+    for n in range(1000):
+        index.update(n, f"слово{n:04d} заказ")
+
+    assert len(index.search("слово")) == 1000
+    assert len(index.search("заказ сло")) == 1000
+
+
+def test_all_query_words_must_match():
+    index = InvertedIndex()
+    index.update("a", "Замена экрана, заказ 17")
+    index.update("b", "Замена батареи")
+
+    assert index.search("замена экр") == {"a"}
+    assert index.search("замена") == {"a", "b"}
+    assert index.search("экран батар") == set()
+
+
+def test_update_and_remove_forget_old_words():
+    index = InvertedIndex()
+    index.update("a", "старый текст")
+    index.update("a", "новый текст")
+
+    assert index.search("стар") == set()
+    assert index.search("нов") == {"a"}
+    index.remove("a")
+    assert index.search("текст") == set()
+    assert len(index) == 0